@@ -0,0 +1,68 @@
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from typing import Callable, Iterator
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_address_set import ProxyAddressSet
+
+
+def generate_addresses(count: int) -> Iterator[ProxyAddress]:
+    # 和解析代理源一样逐个产生对象, 约三成是重复地址
+    unique: int = int(count * 0.7)
+    for i in range(count):
+        seed: int = i % unique
+        yield ProxyAddress(
+            scheme=("http", "https")[seed & 1],
+            host=f"{seed >> 16 & 0xFF}.{seed >> 8 & 0xFF}.{seed & 0xFF}.1",
+            port=8080,
+        )
+
+
+def dedup_set(proxy_addresses: Iterator[ProxyAddress]) -> list[ProxyAddress]:
+    # fetch_all_sources 原来的做法
+    return list(set(proxy_addresses))
+
+
+def dedup_bulk(proxy_addresses: Iterator[ProxyAddress]) -> ProxyAddressSet:
+    return ProxyAddressSet(proxy_addresses)
+
+
+def dedup_incremental(proxy_addresses: Iterator[ProxyAddress]) -> ProxyAddressSet:
+    seen: ProxyAddressSet = ProxyAddressSet()
+    for proxy_address in proxy_addresses:
+        seen.add(proxy_address)
+    return seen
+
+
+def measure(name: str, dedup: Callable, count: int) -> None:
+    gc.collect()
+    started: float = time.perf_counter()
+    size: int = len(dedup(generate_addresses(count)))
+    elapsed: float = time.perf_counter() - started
+    gc.collect()
+    tracemalloc.start()
+    result = dedup(generate_addresses(count))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    print(
+        f"{name:<12}数量:{size}\t耗时:{elapsed * 1000:.0f}ms"
+        f"\t常驻内存:{current / 1024 / 1024:.1f}MB\t峰值内存:{peak / 1024 / 1024:.1f}MB"
+    )
+
+
+def main() -> None:
+    count: int = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"输入数量:{count}")
+    measure("set", dedup_set, count)
+    measure("bulk", dedup_bulk, count)
+    measure("incremental", dedup_incremental, count)
+
+
+if __name__ == "__main__":
+    main()
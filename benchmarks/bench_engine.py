@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.failure_reason import FailureReason
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_check_target import ProxyCheckTarget
+from src.models.proxy_server import ProxyServer
+from src.services.proxy_get_check_service import ProxyGetCheckService
+from src.utils.stream import iterate
+
+BODY: bytes = "mb,1,安卓".encode()
+RESPONSE: bytes = (
+    b"HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n"
+    b"Content-Length: %d\r\nConnection: close\r\n\r\n%s" % (len(BODY), BODY)
+)
+
+
+async def fake_proxy(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    # 直接替目标站点作答的 HTTP 代理, 只用来测量检测端的开销;
+    # 每次检测都是新的代理, 所以不保持连接
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(RESPONSE)
+        await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def check(response, proxy_address: ProxyAddress) -> ProxyServer | FailureReason:
+    if response.ok and response.content_type == "text/html":
+        if "mb,1,安卓" in await response.text():
+            return ProxyServer.from_address(proxy_address)
+    return FailureReason.INVALID_DATA
+
+
+async def run(engine: str, proxy_addresses: list[ProxyAddress], workers: int) -> None:
+    tcp_connector = aiohttp.TCPConnector(limit=workers, ssl=False)
+    async with aiohttp.ClientSession(
+        connector=tcp_connector,
+        trace_configs=[ProxyGetCheckService.trace_config()],
+    ) as session:
+        proxy_get_check_service = ProxyGetCheckService(
+            session=session,
+            client_timeout=aiohttp.ClientTimeout(total=10),
+            headers={"User-Agent": "bench"},
+            proxy_check_target=ProxyCheckTarget(
+                website="bench.invalid/m/test.aspx", check=check, scheme="http"
+            ),
+            workers=workers,
+            prescreen=False,
+            engine=engine,
+        )
+        started: float = time.perf_counter()
+        count: int = 0
+        async for _ in proxy_get_check_service.stream_check_proxies(
+            iterate(proxy_addresses)
+        ):
+            count += 1
+        elapsed: float = time.perf_counter() - started
+    print(
+        f"{engine:<8}成功:{count}/{len(proxy_addresses)}\t耗时:{elapsed:.2f}s"
+        f"\t检测/秒:{len(proxy_addresses) / elapsed:.0f}"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--checks", type=int, default=5000)
+    parser.add_argument("--proxies", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=200)
+    parser.add_argument("--base-port", type=int, default=21000)
+    args = parser.parse_args()
+    logging.getLogger("app").disabled = True
+    servers = [
+        await asyncio.start_server(fake_proxy, "127.0.0.1", args.base_port + i)
+        for i in range(args.proxies)
+    ]
+    proxy_addresses: list[ProxyAddress] = [
+        ProxyAddress("http", "127.0.0.1", args.base_port + i % args.proxies)
+        for i in range(args.checks)
+    ]
+    for engine in ("aiohttp", "raw"):
+        await run(engine, proxy_addresses, args.workers)
+    for server in servers:
+        server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.config import Config
+from src.utils.loop_lag import LoopLagMonitor
+
+MESSAGES: tuple[str, ...] = (
+    "成功\thttp://127.0.0.1:{}\ttime:{}",
+    "连接失败\t<class 'OSError'>\tproxy_address:http://127.0.0.1:{}\ttime:{}",
+    "访问超时\t<class 'TimeoutError'>\tproxy_address:http://127.0.0.1:{}\ttime:{}",
+)
+
+
+def sync_log(directory: str, terminal) -> logging.Logger:
+    # 改动前的 Config.init_log: 在事件循环线程上直接写文件和终端
+    log: logging.Logger = logging.getLogger("bench.sync")
+    log.setLevel(logging.DEBUG)
+    formatter = logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+    for handler in (
+        logging.FileHandler(os.path.join(directory, "sync.log"), mode="w"),
+        logging.StreamHandler(terminal),
+    ):
+        handler.setFormatter(formatter)
+        log.addHandler(handler)
+    return log
+
+
+async def run(name: str, log: logging.Logger, lines: int, tasks: int) -> None:
+    monitor: LoopLagMonitor = LoopLagMonitor(interval=0.01)
+    monitor.start()
+    await asyncio.sleep(0.05)
+
+    async def check(index: int) -> None:
+        for i in range(index, lines, tasks):
+            # 模拟一次检测完成后的日志
+            log.info(MESSAGES[i % len(MESSAGES)].format(i % 65536, i % 5000))
+            await asyncio.sleep(0)
+
+    started: float = time.perf_counter()
+    await asyncio.gather(*(check(i) for i in range(tasks)))
+    elapsed: float = time.perf_counter() - started
+    monitor.stop()
+    print(
+        f"{name:<14}日志:{lines}\t耗时:{elapsed:.2f}s\t条/秒:{lines / elapsed:.0f}"
+        f"\t平均延迟:{monitor.average_lag * 1000:.1f}ms"
+        f"\t最大延迟:{monitor.max_lag * 1000:.1f}ms"
+    )
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--tasks", type=int, default=1000)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        # 终端输出也写到文件, 避免刷屏; 真实终端只会更慢
+        with open(os.path.join(directory, "terminal.log"), "w") as terminal:
+            disabled: logging.Logger = logging.getLogger("bench.disabled")
+            disabled.disabled = True
+            await run("不输出日志", disabled, args.lines, args.tasks)
+            await run("同步写入", sync_log(directory, terminal), args.lines, args.tasks)
+            for name, rate in (("队列", 0), ("队列+限速", 20)):
+                log: logging.Logger = Config.init_log(
+                    logging.getLogger(f"bench.{rate}"),
+                    filename=os.path.join(directory, f"queue_{rate}.log"),
+                    stream=terminal,
+                    rate=rate,
+                )
+                await run(name, log, args.lines, args.tasks)
+                Config.stop_log()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
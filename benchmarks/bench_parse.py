@@ -0,0 +1,98 @@
+import asyncio
+import os
+import random
+import re
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_source import ProxySource
+from src.parsers.stream_parse import CHUNK_SIZE, stream_parse
+
+
+class FakeContent:
+    def __init__(self, body: bytes) -> None:
+        self.body = body
+
+    async def iter_chunked(self, size: int):
+        for i in range(0, len(self.body), size):
+            yield self.body[i : i + size]
+
+
+class FakeResponse:
+    ok: bool = True
+    status: int = 200
+    content_type: str = "text/plain"
+
+    def __init__(self, body: bytes) -> None:
+        self.content = FakeContent(body)
+
+    async def text(self) -> str:
+        # aiohttp 会先读取完整的 body 再解码
+        body: bytes = b"".join(
+            [chunk async for chunk in self.content.iter_chunked(CHUNK_SIZE)]
+        )
+        return body.decode()
+
+
+async def regex_parse(
+    response: FakeResponse, proxy_source: ProxySource
+) -> list[ProxyAddress]:
+    # 原 script.py 中 custom_parse 的做法
+    text: str = await response.text()
+    proxy_arr = re.findall(r"(\d{1,3}(?:\.\d{1,3}){3}):(\d+)", text)
+    return [
+        ProxyAddress(scheme=proxy_source.scheme or "http", host=host, port=int(port))
+        for host, port in proxy_arr
+    ]
+
+
+async def count_stream(response: FakeResponse, proxy_source: ProxySource) -> int:
+    count: int = 0
+    async for _ in stream_parse(response, proxy_source):  # type: ignore[arg-type]
+        count += 1
+    return count
+
+
+async def count_regex(response: FakeResponse, proxy_source: ProxySource) -> int:
+    return len(await regex_parse(response, proxy_source))
+
+
+def build_body(lines: int) -> bytes:
+    rng = random.Random(0)
+    return b"".join(
+        f"{rng.randint(1, 223)}.{rng.randint(0, 255)}.{rng.randint(0, 255)}.{rng.randint(1, 254)}:{rng.randint(1, 65535)}\n".encode()
+        for _ in range(lines)
+    )
+
+
+def measure(name: str, func, body: bytes, proxy_source: ProxySource) -> None:
+    started: float = time.perf_counter()
+    count: int = asyncio.run(func(FakeResponse(body), proxy_source))
+    elapsed: float = time.perf_counter() - started
+    tracemalloc.start()
+    asyncio.run(func(FakeResponse(body), proxy_source))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(
+        f"{name:<8}数量:{count}\t耗时:{elapsed * 1000:.0f}ms"
+        f"\t峰值内存:{peak / 1024 / 1024:.1f}MB"
+    )
+
+
+def main() -> None:
+    lines: int = int(sys.argv[1]) if len(sys.argv) > 1 else 300_000
+    body: bytes = build_body(lines)
+    proxy_source: ProxySource = ProxySource(
+        parse=stream_parse, url="bench", scheme="http"
+    )
+    print(f"数据大小:{len(body) / 1024 / 1024:.1f}MB\t行数:{lines}")
+    measure("regex", count_regex, body, proxy_source)
+    measure("stream", count_stream, body, proxy_source)
+
+
+if __name__ == "__main__":
+    main()
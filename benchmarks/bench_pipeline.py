@@ -0,0 +1,222 @@
+import argparse
+import asyncio
+import dataclasses
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from fleet import FORMATS, Fleet, FleetConfig
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_server import ProxyServer
+from src.services.config import Config
+from src.utils.loop_lag import LoopLagMonitor
+from src.utils.stats import percentile
+
+RESULTS: str = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+SCRIPT: str = """
+from script import check_rule
+from src.models.proxy_check_target import ProxyCheckTarget
+from src.models.proxy_source import ProxySource
+from src.models.script import Script
+from src.parsers.stream_parse import stream_parse
+
+script = Script(
+    proxy_sources=[
+        ProxySource(parse=stream_parse, scheme="http", url=url) for url in {urls!r}
+    ],
+    proxy_check_target=ProxyCheckTarget(
+        website="127.0.0.1:{target_port}/m/test.aspx", rule=check_rule
+    ),
+)
+"""
+
+# 越大越好的指标, 其余越小越好
+HIGHER_IS_BETTER: frozenset[str] = frozenset({"checks_per_second", "passed"})
+
+
+class Collector:
+    def __init__(self) -> None:
+        self.checks: int = 0
+        self.latencies: list[float] = []
+        # 每个成功结果出现的时间, 用来计算得到前 N 个可用代理的耗时
+        self.passed_at: list[float] = []
+
+    def observe(
+        self,
+        proxy_address: ProxyAddress,
+        proxy_server: ProxyServer | None,
+        elapsed: float | None,
+    ) -> None:
+        self.checks += 1
+        if proxy_server is not None and elapsed is not None:
+            self.latencies.append(elapsed * 1000)
+            self.passed_at.append(time.perf_counter())
+
+
+def parse_args() -> tuple[argparse.Namespace, list[str]]:
+    parser = argparse.ArgumentParser(
+        description="本地代理源和代理集群上的端到端基准, 其余参数传给 main.py"
+    )
+    parser.add_argument("--proxies", type=int, default=2000, help="代理数量")
+    parser.add_argument("--sources", type=int, default=5, help="代理源数量")
+    parser.add_argument("--source-size", type=int, default=1000, help="每个源的条数")
+    parser.add_argument("--source-format", choices=FORMATS, default="plain")
+    parser.add_argument("--latency", type=float, default=50, help="代理延迟中位数(ms)")
+    parser.add_argument("--dead", type=float, default=0.5, help="拒绝连接的比例")
+    parser.add_argument("--hang", type=float, default=0.02, help="不响应的比例")
+    parser.add_argument("--error", type=float, default=0.1, help="返回 502 的比例")
+    parser.add_argument(
+        "--https", type=float, default=0.2, help="标成 https 导致 SSL 错误的比例"
+    )
+    parser.add_argument(
+        "--subnets", type=int, default=0, help="代理分布的 /24 网段数, 0 表示不分网段"
+    )
+    parser.add_argument(
+        "--first", type=int, default=100, help="统计得到前 N 个可用代理的耗时"
+    )
+    parser.add_argument("--base-port", type=int, default=30000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default=RESULTS, help="结果目录")
+    parser.add_argument("--compare", help="与之前保存的结果比较")
+    return parser.parse_known_args()
+
+
+def commit() -> str:
+    try:
+        head: str = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+        dirty: str = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{head}-dirty" if dirty else head
+
+
+async def bench(fleet: Fleet, main_args: list[str], directory: str, first: int) -> dict:
+    script_path: str = os.path.join(directory, "bench_script.py")
+    with open(script_path, "w") as f:
+        f.write(SCRIPT.format(urls=fleet.source_urls(), target_port=fleet.target_port))
+    args: argparse.Namespace = main.parse_args(
+        [
+            *main_args,
+            "--script",
+            script_path,
+            "--no-health-db",
+            "--no-source-cache",
+        ]
+    )
+    collector: Collector = Collector()
+    monitor: LoopLagMonitor = LoopLagMonitor(interval=0.05)
+    monitor.start()
+    started: float = time.perf_counter()
+    passed: int = await main.run(args, [collector.observe])
+    elapsed: float = time.perf_counter() - started
+    monitor.stop()
+    return {
+        "elapsed": round(elapsed, 3),
+        "checks": collector.checks,
+        "passed": passed,
+        "first_good_s": (
+            round(collector.passed_at[first - 1] - started, 3)
+            if len(collector.passed_at) >= first
+            else None
+        ),
+        "checks_per_second": round(collector.checks / elapsed, 1),
+        "p50_ms": round(percentile(collector.latencies, 50) or 0, 1),
+        "p99_ms": round(percentile(collector.latencies, 99) or 0, 1),
+        # Linux 上 ru_maxrss 的单位是 KB
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "loop_lag_avg_ms": round(monitor.average_lag * 1000, 1),
+        "loop_lag_max_ms": round(monitor.max_lag * 1000, 1),
+    }
+
+
+def compare(metrics: dict, path: str) -> None:
+    with open(path) as f:
+        baseline: dict = json.load(f)
+    print(f"对比\t{path}\tcommit:{baseline['commit']}")
+    for key, value in metrics.items():
+        before = baseline["metrics"].get(key)
+        if not isinstance(value, (int, float)) or not before:
+            continue
+        change: float = (value - before) / before * 100
+        better: bool = (change > 0) == (key in HIGHER_IS_BETTER)
+        print(
+            f"{key:<20}{before:>10}{value:>10}\t{change:+.1f}%"
+            f"\t{'' if abs(change) < 1 else ('更好' if better else '更差')}"
+        )
+
+
+async def run() -> None:
+    bench_args, main_args = parse_args()
+    config: FleetConfig = FleetConfig(
+        proxies=bench_args.proxies,
+        sources=bench_args.sources,
+        source_size=bench_args.source_size,
+        source_format=bench_args.source_format,
+        latency=bench_args.latency,
+        dead=bench_args.dead,
+        hang=bench_args.hang,
+        error=bench_args.error,
+        https=bench_args.https,
+        base_port=bench_args.base_port,
+        seed=bench_args.seed,
+        subnets=bench_args.subnets,
+    )
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    fleet: Fleet = Fleet(config)
+    fleet.start()
+    try:
+        with tempfile.TemporaryDirectory() as directory, open(
+            os.devnull, "w"
+        ) as devnull:
+            Config.init_log(
+                logging.getLogger("app"),
+                filename=os.path.join(directory, "app.log"),
+                stream=devnull,
+            )
+            metrics: dict = await bench(fleet, main_args, directory, bench_args.first)
+            Config.stop_log()
+    finally:
+        fleet.stop()
+    result: dict = {
+        "commit": commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "fleet": dataclasses.asdict(config),
+        "main_args": main_args,
+        "metrics": metrics,
+    }
+    for key, value in metrics.items():
+        print(f"{key:<20}{value}")
+    os.makedirs(bench_args.output, exist_ok=True)
+    path: str = os.path.join(
+        bench_args.output, f"{time.strftime('%Y%m%d-%H%M%S')}-{result['commit']}.json"
+    )
+    with open(path, "w") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"结果已保存\t{path}")
+    if bench_args.compare:
+        compare(metrics, bench_args.compare)
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
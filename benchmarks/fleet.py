@@ -0,0 +1,256 @@
+import asyncio
+import json
+import multiprocessing
+import random
+import resource
+from dataclasses import dataclass
+
+# script.py 中 ckeck 期望的响应: text/html, 长度 11, 包含 "mb,1,安卓"
+TARGET_BODY: bytes = "mb,1,安卓".encode()
+TARGET_RESPONSE: bytes = (
+    b"HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n"
+    b"Content-Length: %d\r\nConnection: close\r\n\r\n%s"
+    % (len(TARGET_BODY), TARGET_BODY)
+)
+BAD_GATEWAY: bytes = (
+    b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+)
+BAD_REQUEST: bytes = (
+    b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"
+)
+FORMATS: tuple[str, ...] = ("plain", "url", "json", "csv")
+
+
+@dataclass
+class FleetConfig:
+    proxies: int = 2000
+    sources: int = 5
+    source_size: int = 1000
+    source_format: str = "plain"
+    latency: float = 50
+    dead: float = 0.5
+    hang: float = 0.02
+    error: float = 0.1
+    https: float = 0.2
+    base_port: int = 30000
+    seed: int = 1
+    # 大于 0 时代理分布在这么多个 /24 网段, 部分网段整段不响应
+    subnets: int = 0
+
+
+@dataclass
+class FleetProxy:
+    port: int
+    behavior: str
+    https: bool
+    host: str = "127.0.0.1"
+
+
+def plan_fleet(config: FleetConfig) -> list[FleetProxy]:
+    rng: random.Random = random.Random(config.seed)
+    # 失效网段和真实的一样整段超时, 其余网段里不再有拒绝连接的代理
+    dead_subnets: list[bool] = [
+        rng.random() < config.dead for _ in range(config.subnets)
+    ]
+    fleet: list[FleetProxy] = []
+    for i in range(config.proxies):
+        roll: float = rng.random()
+        host: str = "127.0.0.1"
+        port: int = config.base_port + i
+        dead_subnet: bool = False
+        if config.subnets:
+            subnet: int = i % config.subnets
+            index: int = i // config.subnets
+            # 127.0.0.0/8 都在本地回环上, 不需要额外配置
+            host = f"127.1.{subnet}.{index % 250 + 1}"
+            port = config.base_port + index // 250
+            dead_subnet = dead_subnets[subnet]
+            roll = config.dead + roll * (1 - config.dead)
+        if dead_subnet:
+            behavior = "hang"
+        elif roll < config.dead:
+            behavior = "dead"
+        elif roll < config.dead + config.hang:
+            behavior = "hang"
+        elif roll < config.dead + config.hang + config.error:
+            behavior = "error"
+        else:
+            behavior = "ok"
+        # 标成 https 的普通 HTTP 代理: 检测时先 SSL 失败, 再用 http 重试
+        fleet.append(FleetProxy(port, behavior, rng.random() < config.https, host))
+    return fleet
+
+
+def format_entry(proxy: FleetProxy, source_format: str) -> str:
+    scheme: str = "https" if proxy.https else "http"
+    if source_format == "url":
+        return f"{scheme}://{proxy.host}:{proxy.port}"
+    if source_format == "json":
+        return json.dumps({"ip": proxy.host, "port": proxy.port, "protocol": scheme})
+    if source_format == "csv":
+        return f"{proxy.host},{proxy.port},{scheme}"
+    return (
+        f"{scheme}://{proxy.host}:{proxy.port}"
+        if proxy.https
+        else f"{proxy.host}:{proxy.port}"
+    )
+
+
+def build_sources(config: FleetConfig, fleet: list[FleetProxy]) -> list[bytes]:
+    # 各个源随机抽样, 互相有重复, 和真实的代理源一样
+    rng: random.Random = random.Random(config.seed + 1)
+    sources: list[bytes] = []
+    for _ in range(config.sources):
+        entries: list[FleetProxy] = rng.choices(fleet, k=config.source_size)
+        if config.subnets:
+            # 真实的代理源里同一网段的地址常常连在一起
+            entries.sort(key=lambda proxy: proxy.host)
+        lines: list[str] = [
+            format_entry(proxy, config.source_format) for proxy in entries
+        ]
+        if config.source_format == "csv":
+            lines.insert(0, "ip,port,protocol")
+        sources.append(("\n".join(lines) + "\n").encode())
+    return sources
+
+
+async def _close(writer: asyncio.StreamWriter) -> None:
+    try:
+        await writer.drain()
+    except ConnectionError:
+        pass
+    writer.close()
+
+
+async def serve_target(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    try:
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(TARGET_RESPONSE)
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+        pass
+    await _close(writer)
+
+
+def proxy_handler(behavior: str, latency: float, target_port: int, rng: random.Random):
+    async def handle(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            first: bytes = await reader.read(1)
+            if first == b"\x16":
+                # TLS 握手发给了普通 HTTP 代理
+                writer.write(BAD_REQUEST)
+                return
+            if behavior == "hang":
+                await reader.read()
+                return
+            request: bytes = first + await reader.readuntil(b"\r\n\r\n")
+            await asyncio.sleep(rng.lognormvariate(0, 0.5) * latency / 1000)
+            if behavior == "error" or request.startswith(b"CONNECT"):
+                writer.write(BAD_GATEWAY)
+                return
+            target_reader, target_writer = await asyncio.open_connection(
+                "127.0.0.1", target_port
+            )
+            target_writer.write(request)
+            writer.write(await target_reader.read())
+            target_writer.close()
+        except (
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            ConnectionError,
+        ):
+            pass
+        finally:
+            await _close(writer)
+
+    return handle
+
+
+async def serve_sources(sources: list[bytes]):
+    async def handle(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            request_line: bytes = await reader.readline()
+            await reader.readuntil(b"\r\n\r\n")
+            # GET /3.txt HTTP/1.1
+            index: str = request_line.split(b" ")[1].strip(b"/").split(b".")[0].decode()
+            if index.isdigit() and int(index) < len(sources):
+                body: bytes = sources[int(index)]
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n"
+                    b"Content-Length: %d\r\nConnection: close\r\n\r\n" % len(body)
+                )
+                writer.write(body)
+            else:
+                writer.write(BAD_REQUEST)
+        except (
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            ConnectionError,
+        ):
+            pass
+        await _close(writer)
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def _run_fleet(config: FleetConfig, ready: multiprocessing.Queue) -> None:
+    fleet: list[FleetProxy] = plan_fleet(config)
+    target = await asyncio.start_server(serve_target, "127.0.0.1", 0)
+    target_port: int = target.sockets[0].getsockname()[1]
+    source_server = await serve_sources(build_sources(config, fleet))
+    rng: random.Random = random.Random(config.seed + 2)
+    servers: list = []
+    for proxy in fleet:
+        # dead 代理不监听端口, 连接会被拒绝
+        if proxy.behavior != "dead":
+            servers.append(
+                await asyncio.start_server(
+                    proxy_handler(proxy.behavior, config.latency, target_port, rng),
+                    proxy.host,
+                    proxy.port,
+                    backlog=1024,
+                )
+            )
+    ready.put((source_server.sockets[0].getsockname()[1], target_port))
+    await asyncio.Event().wait()
+
+
+def run_fleet(config: FleetConfig, ready: multiprocessing.Queue) -> None:
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    asyncio.run(_run_fleet(config, ready))
+
+
+# 在独立进程中运行代理源, 代理和检测目标, 不占用被测进程的事件循环
+class Fleet:
+    def __init__(self, config: FleetConfig) -> None:
+        self.config = config
+        self.source_port: int | None = None
+        self.target_port: int | None = None
+        self._process: multiprocessing.Process | None = None
+
+    def start(self, timeout: float = 60) -> None:
+        context = multiprocessing.get_context("spawn")
+        ready: multiprocessing.Queue = context.Queue()
+        self._process = context.Process(
+            target=run_fleet, args=(self.config, ready), daemon=True
+        )
+        self._process.start()
+        self.source_port, self.target_port = ready.get(timeout=timeout)
+
+    def source_urls(self) -> list[str]:
+        return [
+            f"http://127.0.0.1:{self.source_port}/{i}.txt"
+            for i in range(self.config.sources)
+        ]
+
+    def stop(self) -> None:
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join()
+            self._process = None
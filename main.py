@@ -1,48 +1,323 @@
+import argparse
 import asyncio
 import logging
 import socket
+from contextlib import AsyncExitStack
+from typing import AsyncIterator, Iterable, Sequence
 
 import aiohttp
 
+from src.models.check_deadlines import CheckDeadlines
+from src.models.check_options import CheckOptions
 from src.models.proxy_address import ProxyAddress
 from src.models.proxy_server import ProxyServer
-from src.services.proxy_get_check_service import ProxyGetCheckService
+from src.services.adaptive_limiter import AdaptiveLimiter
+from src.services.adaptive_timeout import AdaptiveTimeout
+from src.services.check_metrics import CheckMetrics
+from src.services.latency_report import LatencyReport
+from src.services.protocol_detector import ProtocolDetector
+from src.services.proxy_get_check_service import CheckObserver, ProxyGetCheckService
+from src.services.proxy_health_store import ProxyHealthStore
+from src.services.proxy_gateway import ProxyGateway
+from src.services.proxy_pool_api import ProxyPoolApi
+from src.services.proxy_pool_index import ProxyPoolIndex
+from src.services.proxy_source_cache import ProxySourceCache
 from src.services.proxy_source_service import ProxySourceService
+from src.services.sharded_check_service import ShardedCheckService
+from src.services.result_sink import ResultSink
+from src.services.subnet_scheduler import SubnetScheduler
 from src.models.script import Script
 from src.services.config import Config
 
 
-async def main():
-    log: logging.Logger = Config.init_log(logging.getLogger("app"))
-    script: Script = Config.load_script("script.py", "script")
+def parse_args(argv: Sequence[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=1000, help="HTTP检测并发数")
+    parser.add_argument("--no-prescreen", action="store_true", help="关闭TCP连接预筛选")
+    parser.add_argument(
+        "--prescreen-workers", type=int, default=500, help="TCP预筛选并发数"
+    )
+    parser.add_argument(
+        "--prescreen-timeout", type=float, default=3, help="TCP预筛选连接超时(秒)"
+    )
+    parser.add_argument(
+        "--health-db", default="proxy_health.db", help="代理健康记录数据库路径"
+    )
+    parser.add_argument(
+        "--no-health-db", action="store_true", help="不读写健康记录,检测全部代理"
+    )
+    parser.add_argument(
+        "--source-cache", default=".source_cache", help="代理源缓存目录"
+    )
+    parser.add_argument(
+        "--no-source-cache", action="store_true", help="不使用代理源缓存"
+    )
+    parser.add_argument(
+        "--only-new", action="store_true", help="只检测代理源中新出现的代理"
+    )
+    parser.add_argument(
+        "--processes", type=int, default=1, help="检测进程数,大于1时按进程分片检测"
+    )
+    parser.add_argument(
+        "--engine",
+        choices=("aiohttp", "raw"),
+        default="aiohttp",
+        help="检测引擎: aiohttp 或基于 asyncio streams 的轻量实现",
+    )
+    parser.add_argument(
+        "--adaptive",
+        action="store_true",
+        help="自动调整检测并发, --workers 作为上限",
+    )
+    parser.add_argument(
+        "--total-timeout", type=float, default=5, help="单次检测总超时(秒)"
+    )
+    parser.add_argument(
+        "--connect-timeout", type=float, default=None, help="检测连接代理超时(秒)"
+    )
+    parser.add_argument(
+        "--first-byte-timeout",
+        type=float,
+        default=None,
+        help="检测首字节超时(秒): 从发起请求(含连接代理)到收到响应头, 两种引擎相同",
+    )
+    parser.add_argument(
+        "--adaptive-timeout",
+        action="store_true",
+        help="按成功检测的延迟分布收紧各阶段超时, 以上超时作为上限",
+    )
+    parser.add_argument(
+        "--timeout-factor", type=float, default=2, help="自适应超时: p95 的倍数"
+    )
+    parser.add_argument(
+        "--detect-protocols",
+        action="store_true",
+        help="按 host:port 去重后识别 HTTP/HTTPS(CONNECT)/SOCKS4/SOCKS5, 检测每种支持的协议",
+    )
+    parser.add_argument(
+        "--debug-sample",
+        type=float,
+        default=0,
+        help="按比例(0~1)记录失败检测的完整异常, 默认只统计失败原因",
+    )
+    parser.add_argument(
+        "--log-json", action="store_true", help="app.log 使用 JSON Lines 格式"
+    )
+    parser.add_argument(
+        "--log-rate",
+        type=float,
+        default=20,
+        help="每种日志每秒最多输出的条数, 0 表示不限速",
+    )
+    parser.add_argument(
+        "--subnet-schedule",
+        action="store_true",
+        help="按 /24 和端口分组, 先检测每组的样本, 优先检测样本可用的组",
+    )
+    parser.add_argument(
+        "--subnet-sample", type=int, default=2, help="子网调度时每组的样本数"
+    )
+    parser.add_argument("--script", default="script.py", help="检测脚本路径")
+    parser.add_argument(
+        "--api-port", type=int, default=0, help="代理池查询接口端口, 0 表示不开启"
+    )
+    parser.add_argument("--api-host", default="127.0.0.1", help="代理池查询接口地址")
+    parser.add_argument(
+        "--gateway-port",
+        type=int,
+        default=0,
+        help="本地转发代理端口, 请求轮换经过已验证的代理, 0 表示不开启",
+    )
+    parser.add_argument(
+        "--keep-serving",
+        action="store_true",
+        help="检测结束后继续提供查询接口和转发代理",
+    )
+    parser.add_argument(
+        "--metrics-interval",
+        type=float,
+        default=0,
+        help="每隔多少秒在日志中输出运行指标, 0 表示不输出; 开启查询接口时指标在 /metrics",
+    )
+    parser.add_argument(
+        "--output",
+        action="append",
+        default=[],
+        help="检测结果文件, 按扩展名选择格式: .ndjson/.jsonl, .csv, .bin; 可重复",
+    )
+    return parser.parse_args(argv)
 
-    tcp_connector = aiohttp.TCPConnector(limit=1000, verify_ssl=False)
+
+async def run(args: argparse.Namespace, observers: Iterable[CheckObserver] = ()) -> int:
+    log: logging.Logger = logging.getLogger("app")
+    script: Script = Config.load_script(args.script, "script")
+
+    tcp_connector = aiohttp.TCPConnector(limit=args.workers, verify_ssl=False)
     client_timeout: aiohttp.ClientTimeout = aiohttp.ClientTimeout(total=5)
     headers = {
         "User-Agent": "Mozilla/5.0 (Linux; Android 10; Pixel 4 XL Build/QD1A.190505.018) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/80.0.3987.149 Mobile Safari/537.36"
     }
 
-    async with aiohttp.ClientSession(connector=tcp_connector) as session:
-        proxy_source_service: ProxySourceService = ProxySourceService(
-            session=session, headers=headers, client_timeout=client_timeout
-        )
-        proxy_addresses: list[ProxyAddress] = (
-            await proxy_source_service.fetch_all_sources(script.proxy_sources)
+    health_store: ProxyHealthStore | None = None
+    if not args.no_health_db:
+        health_store = ProxyHealthStore(
+            args.health_db, by_endpoint=args.detect_protocols
         )
-        proxy_get_check_service: ProxyGetCheckService = ProxyGetCheckService(
+    source_cache: ProxySourceCache | None = None
+    if not args.no_source_cache:
+        source_cache = ProxySourceCache(args.source_cache)
+
+    async with aiohttp.ClientSession(
+        connector=tcp_connector,
+        trace_configs=[ProxyGetCheckService.trace_config()],
+    ) as session:
+        proxy_source_service: ProxySourceService = ProxySourceService(
             session=session,
             headers=headers,
             client_timeout=client_timeout,
-            proxy_check_target=script.proxy_check_target,
+            source_cache=source_cache,
+            only_new=args.only_new,
         )
-
-        proxy_servers: list[ProxyServer] = (
-            await proxy_get_check_service.check_all_proxies(
-                proxy_addresses=proxy_addresses,
-            )
+        proxy_addresses: AsyncIterator[ProxyAddress] = (
+            proxy_source_service.stream_all_sources(script.proxy_sources)
         )
-        log.info(f"成功数量:{len(proxy_servers)}")
+        proxy_get_check_service: ProxyGetCheckService | ShardedCheckService
+        if args.processes > 1:
+            proxy_get_check_service = ShardedCheckService(
+                options=CheckOptions(
+                    script_path=args.script,
+                    headers=headers,
+                    total_timeout=args.total_timeout,
+                    connect_timeout=args.connect_timeout,
+                    first_byte_timeout=args.first_byte_timeout,
+                    adaptive_timeout=args.adaptive_timeout,
+                    timeout_factor=args.timeout_factor,
+                    detect_protocols=args.detect_protocols,
+                    debug_sample=args.debug_sample,
+                    subnet_schedule=args.subnet_schedule,
+                    subnet_sample=args.subnet_sample,
+                    workers=args.workers,
+                    prescreen=not args.no_prescreen,
+                    prescreen_workers=args.prescreen_workers,
+                    prescreen_timeout=args.prescreen_timeout,
+                    engine=args.engine,
+                    adaptive=args.adaptive,
+                ),
+                processes=args.processes,
+                health_store=health_store,
+            )
+        else:
+            deadlines: CheckDeadlines = CheckDeadlines(
+                total=args.total_timeout,
+                connect=args.connect_timeout,
+                first_byte=args.first_byte_timeout,
+            )
+            proxy_get_check_service = ProxyGetCheckService(
+                session=session,
+                headers=headers,
+                client_timeout=client_timeout,
+                proxy_check_target=script.proxy_check_target,
+                workers=args.workers,
+                prescreen=not args.no_prescreen,
+                prescreen_workers=args.prescreen_workers,
+                prescreen_timeout=args.prescreen_timeout,
+                health_store=health_store,
+                engine=args.engine,
+                limiter=(
+                    AdaptiveLimiter(maximum=args.workers) if args.adaptive else None
+                ),
+                deadlines=deadlines,
+                adaptive_timeout=(
+                    AdaptiveTimeout(deadlines, factor=args.timeout_factor)
+                    if args.adaptive_timeout
+                    else None
+                ),
+                detector=(
+                    ProtocolDetector.for_target(
+                        script.proxy_check_target, args.prescreen_timeout
+                    )
+                    if args.detect_protocols
+                    else None
+                ),
+                debug_sample=args.debug_sample,
+                proxy_check_targets=script.proxy_check_targets,
+                scheduler=(
+                    SubnetScheduler(sample_size=args.subnet_sample)
+                    if args.subnet_schedule
+                    else None
+                ),
+            )
+
+        latency_report: LatencyReport = LatencyReport()
+        proxy_get_check_service.observers.append(latency_report.observe)
+        proxy_get_check_service.observers.extend(observers)
+        proxy_pool_index: ProxyPoolIndex = ProxyPoolIndex()
+        proxy_pool_api: ProxyPoolApi | None = None
+        proxy_gateway: ProxyGateway | None = None
+        # 每个资源创建后立即登记清理, 后面的步骤失败时已启动的资源也会关闭
+        async with AsyncExitStack() as exit_stack:
+            if health_store is not None:
+                # 最先登记, 最后关闭, 此时检测和转发代理都已停止写入
+                exit_stack.callback(health_store.close)
+            for path in args.output:
+                result_sink: ResultSink = ResultSink(path)
+                # 等待写入线程结束, 不阻塞事件循环
+                exit_stack.push_async_callback(asyncio.to_thread, result_sink.close)
+                proxy_get_check_service.observers.append(result_sink.observe)
+            check_metrics: CheckMetrics | None = None
+            if args.api_port or args.metrics_interval:
+                check_metrics = CheckMetrics(
+                    proxy_get_check_service,
+                    proxy_source_service,
+                    connector=tcp_connector,
+                    interval=args.metrics_interval,
+                )
+                exit_stack.callback(check_metrics.stop)
+                check_metrics.start()
+            if args.api_port or args.gateway_port:
+                proxy_get_check_service.observers.append(proxy_pool_index.observe)
+            if args.api_port:
+                proxy_pool_api = ProxyPoolApi(
+                    proxy_pool_index,
+                    host=args.api_host,
+                    port=args.api_port,
+                    metrics=check_metrics,
+                )
+                exit_stack.push_async_callback(proxy_pool_api.stop)
+                await proxy_pool_api.start()
+            if args.gateway_port:
+                # 转发中连续失败的代理直接移出代理池并记入健康记录
+                proxy_gateway = ProxyGateway(
+                    proxy_pool_index, host=args.api_host, port=args.gateway_port
+                )
+                proxy_gateway.observers.append(proxy_pool_index.observe)
+                if health_store is not None:
+                    proxy_gateway.observers.append(health_store.observe)
+                exit_stack.push_async_callback(proxy_gateway.stop)
+                await proxy_gateway.start()
+            count: int = 0
+            proxy_server: ProxyServer
+            async for proxy_server in proxy_get_check_service.stream_check_proxies(
+                proxy_addresses
+            ):
+                count += 1
+            log.info(f"成功数量:{count}")
+            latency_report.log_summary()
+            if check_metrics is not None:
+                check_metrics.log_summary()
+            proxy_pool_index.publish()
+            if (proxy_pool_api or proxy_gateway) is not None and args.keep_serving:
+                log.info(f"检测结束,继续提供查询\t数量:{len(proxy_pool_index)}")
+                await asyncio.Event().wait()
+    return count
+
+
+async def main(args: argparse.Namespace):
+    Config.init_log(
+        logging.getLogger("app"), json_lines=args.log_json, rate=args.log_rate
+    )
+    await run(args)
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(parse_args()))
@@ -17,3 +17,6 @@ class EmptyData(AppError): ...
 
 
 class loadConfigError(AppError): ...
+
+
+class ProxyError(AppError): ...
@@ -0,0 +1,11 @@
+from dataclasses import dataclass
+
+from .proxy_address import ProxyAddress
+
+
+@dataclass
+class CachedSource:
+    url: str
+    etag: str | None
+    last_modified: str | None
+    proxy_addresses: set[ProxyAddress]
@@ -0,0 +1,15 @@
+from dataclasses import dataclass
+
+
+# 单位秒, None 表示该阶段不单独限制
+@dataclass(frozen=True, slots=True)
+class CheckDeadlines:
+    total: float
+    connect: float | None = None
+    first_byte: float | None = None
+
+    def __str__(self) -> str:
+        return (
+            f"connect:{self.connect}\tfirst_byte:{self.first_byte}"
+            f"\ttotal:{self.total}"
+        )
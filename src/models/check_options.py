@@ -0,0 +1,22 @@
+from dataclasses import dataclass, field
+
+
+@dataclass
+class CheckOptions:
+    script_path: str
+    headers: dict = field(default_factory=dict)
+    total_timeout: float = 5
+    connect_timeout: float | None = None
+    first_byte_timeout: float | None = None
+    adaptive_timeout: bool = False
+    timeout_factor: float = 2
+    workers: int = 1000
+    prescreen: bool = True
+    prescreen_workers: int = 500
+    prescreen_timeout: float = 3
+    engine: str = "aiohttp"
+    adaptive: bool = False
+    detect_protocols: bool = False
+    debug_sample: float = 0
+    subnet_schedule: bool = False
+    subnet_sample: int = 2
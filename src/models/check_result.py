@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+
+from .failure_reason import FailureReason
+from .proxy_address import ProxyAddress
+from .proxy_server import ProxyServer
+
+
+# 失败时只保留原因代码, 异常详情只在采样调试时记录
+@dataclass(slots=True)
+class CheckResult:
+    proxy_address: ProxyAddress
+    proxy_server: ProxyServer | None = None
+    reason: FailureReason | None = None
+    detail: str | None = None
+
+    @property
+    def ok(self) -> bool:
+        return self.proxy_server is not None
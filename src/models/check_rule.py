@@ -0,0 +1,114 @@
+import re
+from dataclasses import dataclass, field
+
+import aiohttp
+from multidict import CIMultiDict
+
+from .failure_reason import FailureReason
+from .proxy_address import ProxyAddress
+from .proxy_server import ProxyServer
+from .raw_response import RawResponse
+
+DEFAULT_MAX_BODY: int = 64 * 1024
+
+
+# 声明式的检测规则, 代替 ProxyCheckTarget.check 中的协程.
+# statuses 为空时接受 200~399; headers 的值是对响应头值做 search 的正则;
+# contains 和 pattern 直接匹配响应体的字节, 不做解码
+@dataclass(frozen=True, slots=True)
+class CheckRule:
+    statuses: frozenset[int] | None = None
+    content_type: str | None = None
+    content_length: int | None = None
+    headers: dict[str, str] = field(default_factory=dict)
+    contains: tuple[bytes, ...] = ()
+    pattern: bytes | None = None
+    max_body: int | None = None
+
+    def compile(self) -> "CheckMatcher":
+        return CheckMatcher(self)
+
+
+# 编译后的规则: 先看状态码和响应头, 不通过时不读响应体
+class CheckMatcher:
+    __slots__ = (
+        "statuses",
+        "content_type",
+        "content_length",
+        "headers",
+        "contains",
+        "pattern",
+        "max_body",
+    )
+
+    def __init__(self, rule: CheckRule) -> None:
+        self.statuses = rule.statuses
+        self.content_type: str | None = (
+            rule.content_type.lower() if rule.content_type else None
+        )
+        self.content_length = rule.content_length
+        self.headers: tuple[tuple[str, re.Pattern[str]], ...] = tuple(
+            (name, re.compile(pattern)) for name, pattern in rule.headers.items()
+        )
+        self.contains = rule.contains
+        self.pattern: re.Pattern[bytes] | None = (
+            re.compile(rule.pattern) if rule.pattern is not None else None
+        )
+        # 长度已知时只读这么多
+        self.max_body: int = rule.max_body or rule.content_length or DEFAULT_MAX_BODY
+
+    def match_head(self, status: int, headers: CIMultiDict) -> FailureReason | None:
+        if self.statuses is None:
+            if not 200 <= status < 400:
+                return FailureReason.STATUS
+        elif status not in self.statuses:
+            return FailureReason.STATUS
+        if self.content_type is not None:
+            value: str = headers.get("Content-Type", "")
+            if value.split(";", 1)[0].strip().lower() != self.content_type:
+                return FailureReason.CONTENT_TYPE
+        if self.content_length is not None and headers.get("Content-Length") != str(
+            self.content_length
+        ):
+            return FailureReason.INVALID_DATA_LENGTH
+        for name, pattern in self.headers:
+            value = headers.get(name)
+            if value is None or pattern.search(value) is None:
+                return FailureReason.INVALID_DATA
+        return None
+
+    def match_body(self, body: bytes) -> FailureReason | None:
+        if not body and (self.contains or self.pattern is not None):
+            return FailureReason.EMPTY_DATA
+        for needle in self.contains:
+            if needle not in body:
+                return FailureReason.INVALID_DATA
+        if self.pattern is not None and self.pattern.search(body) is None:
+            return FailureReason.INVALID_DATA
+        return None
+
+    async def _read(self, response: aiohttp.ClientResponse | RawResponse) -> bytes:
+        if isinstance(response, RawResponse):
+            return response.body[: self.max_body]
+        body: bytearray = bytearray()
+        while len(body) < self.max_body:
+            chunk: bytes = await response.content.read(self.max_body - len(body))
+            if not chunk:
+                break
+            body += chunk
+        return bytes(body)
+
+    # 和 ProxyCheckTarget.check 的签名相同
+    async def check(
+        self,
+        response: aiohttp.ClientResponse | RawResponse,
+        proxy_address: ProxyAddress,
+    ) -> ProxyServer | FailureReason:
+        reason: FailureReason | None = self.match_head(
+            response.status, response.headers
+        )
+        if reason is None and (self.contains or self.pattern is not None):
+            reason = self.match_body(await self._read(response))
+        if reason is not None:
+            return reason
+        return ProxyServer.from_address(proxy_address)
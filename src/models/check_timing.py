@@ -0,0 +1,17 @@
+import time
+from dataclasses import dataclass, field
+
+
+# dns/connect/tunnel/tls 为各阶段耗时, first_byte/total 从请求开始计算, 单位毫秒
+@dataclass(slots=True)
+class CheckTiming:
+    started: float = field(default_factory=time.perf_counter)
+    dns: float | None = None
+    connect: float | None = None
+    tunnel: float | None = None
+    tls: float | None = None
+    first_byte: float | None = None
+    total: float | None = None
+
+    def elapsed(self, since: float | None = None) -> float:
+        return (time.perf_counter() - (self.started if since is None else since)) * 1000
@@ -0,0 +1,63 @@
+from enum import IntEnum
+from ssl import SSLError
+
+import aiohttp
+
+from ..errors.error import EmptyData, FailedError, ProxyError
+from ..errors.error import TypeError as ContentTypeError
+
+
+class FailureReason(IntEnum):
+    TIMEOUT = 1
+    CONNECT = 2
+    SSL = 3
+    PROXY = 4
+    STATUS = 5
+    CONTENT_TYPE = 6
+    INVALID_DATA = 7
+    INVALID_DATA_LENGTH = 8
+    EMPTY_DATA = 9
+    UNKNOWN_PROTOCOL = 10
+    CHECK = 11
+    UNKNOWN = 12
+
+    @property
+    def message(self) -> str:
+        return _MESSAGES[self]
+
+    @classmethod
+    def from_exception(cls, e: BaseException) -> "FailureReason":
+        # SSLError 是 OSError 的子类, 要先判断
+        if isinstance(e, TimeoutError):
+            return cls.TIMEOUT
+        if isinstance(e, SSLError):
+            return cls.SSL
+        if isinstance(e, OSError):
+            return cls.CONNECT
+        if isinstance(e, (ProxyError, aiohttp.ClientError)):
+            return cls.PROXY
+        if isinstance(e, ContentTypeError):
+            return cls.CONTENT_TYPE
+        if isinstance(e, EmptyData):
+            return cls.EMPTY_DATA
+        if isinstance(e, FailedError):
+            return cls.STATUS
+        if len(str(e)) == 0:
+            return cls.UNKNOWN
+        return cls.CHECK
+
+
+_MESSAGES: dict[FailureReason, str] = {
+    FailureReason.TIMEOUT: "访问超时",
+    FailureReason.CONNECT: "连接失败",
+    FailureReason.SSL: "SSL错误",
+    FailureReason.PROXY: "无效的代理",
+    FailureReason.STATUS: "状态码无效",
+    FailureReason.CONTENT_TYPE: "返回的类型错误",
+    FailureReason.INVALID_DATA: "无效的数据",
+    FailureReason.INVALID_DATA_LENGTH: "无效的数据长度",
+    FailureReason.EMPTY_DATA: "数据为空",
+    FailureReason.UNKNOWN_PROTOCOL: "无法识别协议",
+    FailureReason.CHECK: "检测未通过",
+    FailureReason.UNKNOWN: "未知错误",
+}
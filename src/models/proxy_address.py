@@ -1,11 +1,13 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 
-@dataclass
+@dataclass(slots=True)
 class ProxyAddress:
     scheme: str
     host: str
     port: int
+    # 第一个提供该地址的代理源, 不参与比较
+    source: str | None = field(default=None, compare=False, repr=False)
 
     def __str__(self) -> str:
         return f"{self.scheme}://{self.host}:{self.port}"
@@ -0,0 +1,126 @@
+import heapq
+import socket
+from array import array
+from bisect import bisect_left
+from typing import Iterable, Iterator
+
+from .proxy_address import ProxyAddress
+
+try:
+    import numpy as np
+except ImportError:  # numpy 是可选依赖
+    np = None
+
+# scheme 编码占低 8 位, 端口占 16 位, IPv4 占 32 位
+SCHEMES: tuple[str, ...] = ("http", "https", "socks4", "socks5")
+_SCHEME_CODES: dict[str, int] = {scheme: code for code, scheme in enumerate(SCHEMES)}
+
+
+def pack(proxy_address: ProxyAddress) -> int | None:
+    code: int | None = _SCHEME_CODES.get(proxy_address.scheme)
+    if code is None or not 0 <= proxy_address.port < 65536:
+        return None
+    try:
+        ip: bytes = socket.inet_pton(socket.AF_INET, proxy_address.host)
+    except (OSError, TypeError):
+        return None
+    return (int.from_bytes(ip, "big") << 24) | (proxy_address.port << 8) | code
+
+
+def unpack(value: int) -> ProxyAddress:
+    return ProxyAddress(
+        scheme=SCHEMES[value & 0xFF],
+        host=socket.inet_ntop(socket.AF_INET, (value >> 24).to_bytes(4, "big")),
+        port=(value >> 8) & 0xFFFF,
+    )
+
+
+def _sorted_unique(values: array) -> array:
+    if np is not None:
+        return array("Q", np.unique(np.frombuffer(values, dtype=np.uint64)).tobytes())
+    return array("Q", sorted(set(values)))
+
+
+# IPv4 地址压缩成整数存放在有序 array 中, 其余地址退回普通 set
+class ProxyAddressSet:
+    __slots__ = ("_packed", "_pending", "_others", "merge_size")
+
+    def __init__(
+        self, proxy_addresses: Iterable[ProxyAddress] = (), merge_size: int = 65536
+    ) -> None:
+        self._packed: array = array("Q")
+        self._pending: set[int] = set()
+        self._others: set[ProxyAddress] = set()
+        self.merge_size = merge_size
+        self.update(proxy_addresses)
+
+    def update(self, proxy_addresses: Iterable[ProxyAddress]) -> None:
+        values: array = array("Q", self._packed)
+        values.extend(self._pending)
+        for proxy_address in proxy_addresses:
+            value: int | None = pack(proxy_address)
+            if value is None:
+                self._others.add(proxy_address)
+            else:
+                values.append(value)
+        self._packed = _sorted_unique(values)
+        self._pending.clear()
+
+    def _contains_packed(self, value: int) -> bool:
+        if value in self._pending:
+            return True
+        index: int = bisect_left(self._packed, value)
+        return index < len(self._packed) and self._packed[index] == value
+
+    def _merge(self) -> None:
+        if np is not None:
+            merged = np.concatenate(
+                (
+                    np.frombuffer(self._packed, dtype=np.uint64),
+                    np.fromiter(
+                        self._pending, dtype=np.uint64, count=len(self._pending)
+                    ),
+                )
+            )
+            merged.sort()
+            self._packed = array("Q", merged.tobytes())
+        else:
+            self._packed = array("Q", heapq.merge(self._packed, sorted(self._pending)))
+        self._pending.clear()
+
+    def add(self, proxy_address: ProxyAddress) -> bool:
+        value: int | None = pack(proxy_address)
+        if value is None:
+            if proxy_address in self._others:
+                return False
+            self._others.add(proxy_address)
+            return True
+        if self._contains_packed(value):
+            return False
+        self._pending.add(value)
+        # 待合并部分按已有规模的比例增长, 合并的总开销保持 O(n log n)
+        if len(self._pending) >= max(self.merge_size, len(self._packed) // 4):
+            self._merge()
+        return True
+
+    def __contains__(self, proxy_address: object) -> bool:
+        if not isinstance(proxy_address, ProxyAddress):
+            return False
+        value: int | None = pack(proxy_address)
+        if value is None:
+            return proxy_address in self._others
+        return self._contains_packed(value)
+
+    def __len__(self) -> int:
+        return len(self._packed) + len(self._pending) + len(self._others)
+
+    def __iter__(self) -> Iterator[ProxyAddress]:
+        for value in self._packed:
+            yield unpack(value)
+        for value in list(self._pending):
+            yield unpack(value)
+        yield from list(self._others)
+
+    @property
+    def nbytes(self) -> int:
+        return self._packed.itemsize * len(self._packed)
@@ -1,15 +1,40 @@
 from typing import Awaitable, Callable
 
 import aiohttp
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
+from .check_rule import CheckMatcher, CheckRule
+from .failure_reason import FailureReason
 from .proxy_address import ProxyAddress
 
 from .proxy_server import ProxyServer
+from .raw_response import RawResponse
 
 
 @dataclass
 class ProxyCheckTarget:
     website: str
-    check: Callable[[aiohttp.ClientResponse, ProxyAddress], Awaitable[ProxyServer]]
+    # 检测未通过时返回 FailureReason, 不需要抛出异常; 给出 rule 时可以省略
+    check: (
+        Callable[
+            [aiohttp.ClientResponse | RawResponse, ProxyAddress],
+            Awaitable[ProxyServer | FailureReason],
+        ]
+        | None
+    ) = None
     scheme: str | None = None
+    # 多目标检测时开销小的目标先检测, 失败后不再检测后面的目标
+    cost: int = 0
+    name: str | None = None
+    # 声明式规则, 编译一次; raw 引擎据此在响应头阶段就放弃不通过的响应.
+    # 同时给出 check 时只用 check, 两种引擎的结果一致
+    rule: CheckRule | None = None
+    matcher: CheckMatcher | None = field(default=None, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.check is not None:
+            return
+        if self.rule is None:
+            raise ValueError(f"检测目标缺少 check 或 rule\t{self.website}")
+        self.matcher = self.rule.compile()
+        self.check = self.matcher.check
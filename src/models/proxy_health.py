@@ -0,0 +1,10 @@
+from dataclasses import dataclass
+
+
+@dataclass
+class ProxyHealth:
+    last_check: float
+    ok: bool
+    latency: float | None
+    consecutive_failures: int
+    next_check: float
@@ -3,13 +3,31 @@ from dataclasses import dataclass
 from .proxy_address import ProxyAddress
 
 
-@dataclass
+@dataclass(slots=True)
 class ProxyServer(ProxyAddress):
     response_time: int | None = None
     retry_count: int | None = None
+    dns_time: float | None = None
+    connect_time: float | None = None
+    tunnel_time: float | None = None
+    tls_time: float | None = None
+    first_byte_time: float | None = None
+    # 验证通过的时间, time.time()
+    checked_at: float | None = None
+    # 第 i 位表示通过了第 i 个检测目标, 第 0 位是主目标, 其余按 Script.proxy_check_targets 的顺序
+    capabilities: int = 0
+
+    @classmethod
+    def from_address(cls, proxy_address: ProxyAddress) -> "ProxyServer":
+        return cls(
+            scheme=proxy_address.scheme,
+            host=proxy_address.host,
+            port=proxy_address.port,
+            source=proxy_address.source,
+        )
 
     def __str__(self) -> str:
-        s: str = super().__str__()
+        s: str = ProxyAddress.__str__(self)
         if self.response_time is not None:
             s += str(f"\ttime:{self.response_time}")
         if self.retry_count is not None:
@@ -1,7 +1,7 @@
-from typing import Awaitable, Callable
+from typing import AsyncIterator, Awaitable, Callable
 
 import aiohttp
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from .proxy_address import ProxyAddress
 
@@ -9,12 +9,21 @@ from .proxy_address import ProxyAddress
 @dataclass
 class ProxySource:
     parse: Callable[
-        [aiohttp.ClientResponse, "ProxySource"], Awaitable[list[ProxyAddress]]
+        [aiohttp.ClientResponse, "ProxySource"],
+        Awaitable[list[ProxyAddress]] | AsyncIterator[ProxyAddress],
     ]
 
     url: str
 
     scheme: str | None = None
 
+    # 镜像前缀,空字符串表示直接访问源地址
+    mirrors: list[str] = field(default_factory=lambda: [""])
+
+    def mirror_url(self, mirror: str) -> str:
+        if not mirror:
+            return self.url
+        return f"{mirror.rstrip('/')}/{self.url}"
+
     def __str__(self) -> str:
         return f"scheme:{self.scheme}\turl:{self.url}"
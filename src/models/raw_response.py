@@ -0,0 +1,41 @@
+from dataclasses import dataclass
+
+from multidict import CIMultiDict
+
+
+@dataclass(slots=True)
+class RawResponse:
+    status: int
+    reason: str
+    headers: CIMultiDict
+    body: bytes
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 400
+
+    @property
+    def content_type(self) -> str:
+        value: str = self.headers.get("Content-Type", "application/octet-stream")
+        return value.split(";", 1)[0].strip().lower()
+
+    @property
+    def charset(self) -> str | None:
+        for param in self.headers.get("Content-Type", "").split(";")[1:]:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "charset":
+                return value.strip('"') or None
+        return None
+
+    @property
+    def content_length(self) -> int | None:
+        value: str | None = self.headers.get("Content-Length")
+        if value is None or not value.isdigit():
+            return None
+        return int(value)
+
+    async def read(self) -> bytes:
+        return self.body
+
+    async def text(self, encoding: str | None = None, errors: str = "strict") -> str:
+        return self.body.decode(encoding or self.charset or "utf-8", errors)
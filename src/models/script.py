@@ -1,4 +1,4 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 
 from .proxy_check_target import ProxyCheckTarget
 from .proxy_source import ProxySource
@@ -8,3 +8,5 @@ from .proxy_source import ProxySource
 class Script:
     proxy_sources: list[ProxySource]
     proxy_check_target: ProxyCheckTarget
+    # 主目标通过后再检测的目标, 结果记录在 ProxyServer.capabilities
+    proxy_check_targets: list[ProxyCheckTarget] = field(default_factory=list)
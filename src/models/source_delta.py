@@ -0,0 +1,16 @@
+from dataclasses import dataclass, field
+
+from .proxy_address import ProxyAddress
+
+
+@dataclass
+class SourceDelta:
+    url: str
+    not_modified: bool = False
+    added: list[ProxyAddress] = field(default_factory=list)
+    removed: list[ProxyAddress] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        if self.not_modified:
+            return f"未修改\turl:{self.url}"
+        return f"新增:{len(self.added)}\t移除:{len(self.removed)}\turl:{self.url}"
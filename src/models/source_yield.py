@@ -0,0 +1,18 @@
+from dataclasses import dataclass
+
+
+@dataclass(slots=True)
+class SourceYield:
+    url: str
+    # 代理源给出的地址数, 包括和其他源重复的
+    contributed: int = 0
+    # 去重后由这个源第一个提供的地址数
+    unique: int = 0
+    # 其中检测通过的数量
+    validated: int = 0
+
+    def __str__(self) -> str:
+        return (
+            f"提供:{self.contributed}\t去重后:{self.unique}"
+            f"\t可用:{self.validated}\turl:{self.url}"
+        )
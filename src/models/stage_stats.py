@@ -0,0 +1,60 @@
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+from .failure_reason import FailureReason
+
+
+@dataclass
+class StageStats:
+    name: str
+    passed: int = 0
+    failed: int = 0
+    busy_time: float = 0.0
+    started_at: float | None = None
+    finished_at: float | None = None
+    failures: Counter[FailureReason] = field(default_factory=Counter)
+
+    def record(
+        self, ok: bool, elapsed: float, reason: FailureReason | None = None
+    ) -> None:
+        if self.started_at is None:
+            self.started_at = time.perf_counter() - elapsed
+        if ok:
+            self.passed += 1
+        else:
+            self.failed += 1
+            if reason is not None:
+                self.failures[reason] += 1
+        self.busy_time += elapsed
+        self.finished_at = time.perf_counter()
+
+    def merge(self, other: "StageStats") -> None:
+        self.passed += other.passed
+        self.failed += other.failed
+        self.busy_time += other.busy_time
+        self.failures.update(other.failures)
+        if other.started_at is not None:
+            self.started_at = min(self.started_at or other.started_at, other.started_at)
+        if other.finished_at is not None:
+            self.finished_at = max(self.finished_at or 0, other.finished_at)
+
+    @property
+    def total(self) -> int:
+        return self.passed + self.failed
+
+    @property
+    def wall_time(self) -> float:
+        if self.started_at is None or self.finished_at is None:
+            return 0.0
+        return self.finished_at - self.started_at
+
+    def __str__(self) -> str:
+        average: float = self.busy_time / self.total * 1000 if self.total else 0.0
+        s: str = (
+            f"{self.name}\t通过:{self.passed}\t失败:{self.failed}"
+            f"\t耗时:{self.wall_time:.1f}s\t平均:{average:.0f}ms"
+        )
+        for reason, count in self.failures.most_common():
+            s += f"\t{reason.message}:{count}"
+        return s
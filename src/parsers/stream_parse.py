@@ -0,0 +1,166 @@
+import json
+import logging
+import re
+from typing import AsyncIterable, AsyncIterator, Iterator
+
+import aiohttp
+
+from ..errors.error import EmptyData, FailedError
+from ..errors.error import TypeError as ContentTypeError
+from ..models.proxy_address import ProxyAddress
+from ..models.proxy_source import ProxySource
+
+log = logging.getLogger("app")
+
+SUPPORTED_SCHEMES: frozenset[str] = frozenset({"http", "https"})
+
+CHUNK_SIZE: int = 64 * 1024
+# 单行的最大长度, 超过时按空白切分, 仍然找不到分隔符的整行丢弃
+MAX_LINE: int = 64 * 1024
+CONTENT_TYPES: frozenset[str] = frozenset(
+    {"text/plain", "text/csv", "application/json", "application/x-ndjson"}
+)
+
+_ADDRESS = re.compile(
+    rb"(?:([A-Za-z0-9]+)://)?(?:[^@\s/]+@)?(\d{1,3}(?:\.\d{1,3}){3}):(\d{1,5})"
+)
+_IPV4 = re.compile(rb"\d{1,3}(?:\.\d{1,3}){3}")
+
+
+def _address(scheme: str, host: str, port: int) -> ProxyAddress | None:
+    if scheme not in SUPPORTED_SCHEMES or not 0 < port < 65536:
+        return None
+    return ProxyAddress(scheme=scheme, host=host, port=port)
+
+
+def _parse_json(line: bytes, default_scheme: str) -> ProxyAddress | None:
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    host = data.get("host") or data.get("ip") or data.get("address")
+    port = data.get("port")
+    scheme = data.get("scheme") or data.get("protocol") or data.get("type")
+    if not isinstance(host, str):
+        return None
+    if port is None:
+        # {"address": "1.2.3.4:80"}
+        return parse_line(host.encode(), default_scheme)
+    try:
+        port = int(port)
+    except (TypeError, ValueError):
+        return None
+    if isinstance(scheme, list):
+        scheme = scheme[0] if scheme else None
+    return _address(str(scheme or default_scheme).lower(), host, port)
+
+
+def _parse_csv(line: bytes, default_scheme: str) -> ProxyAddress | None:
+    fields: list[bytes] = [field.strip(b" \t\"'") for field in line.split(b",")]
+    host: bytes | None = None
+    port: bytes | None = None
+    scheme: str = default_scheme
+    for field in fields:
+        if host is None and _IPV4.fullmatch(field):
+            host = field
+        elif host is not None and port is None and field.isdigit():
+            port = field
+        elif field.lower().decode(errors="ignore") in SUPPORTED_SCHEMES:
+            scheme = field.lower().decode()
+    if host is None or port is None:
+        return None
+    return _address(scheme, host.decode(), int(port))
+
+
+def parse_line(line: bytes, default_scheme: str) -> ProxyAddress | None:
+    line = line.strip()
+    if not line:
+        return None
+    if line[0] == 0x7B:  # '{'
+        return _parse_json(line, default_scheme)
+    match = _ADDRESS.search(line)
+    if match is None:
+        if b"," in line:
+            return _parse_csv(line, default_scheme)
+        return None
+    if b"," in line[: match.start()]:
+        return _parse_csv(line, default_scheme)
+    scheme, host, port = match.groups()
+    return _address(
+        scheme.lower().decode() if scheme else default_scheme,
+        host.decode(),
+        int(port),
+    )
+
+
+def parse_lines(data: bytes, default_scheme: str) -> Iterator[ProxyAddress]:
+    if b"{" not in data and b"," not in data:
+        # 纯文本列表直接在整块数据上匹配,不必逐行切分
+        for match in _ADDRESS.finditer(data):
+            scheme, host, port = match.groups()
+            proxy_address: ProxyAddress | None = _address(
+                scheme.lower().decode() if scheme else default_scheme,
+                host.decode(),
+                int(port),
+            )
+            if proxy_address is not None:
+                yield proxy_address
+        return
+    for line in data.split(b"\n"):
+        proxy_address = parse_line(line, default_scheme)
+        if proxy_address is not None:
+            yield proxy_address
+
+
+def _split_end(data: bytes, max_line: int) -> int:
+    end: int = data.rfind(b"\n") + 1
+    if len(data) - end > max_line and b"{" not in data[end:]:
+        # 没有换行的纯文本列表, 在最后一个空白处切开
+        end = max(end, max(data.rfind(sep) for sep in (b" ", b"\t", b"\r")) + 1)
+    return end
+
+
+async def parse_chunks(
+    chunks: AsyncIterable[bytes], default_scheme: str, max_line: int = MAX_LINE
+) -> AsyncIterator[ProxyAddress]:
+    # rest 不超过 max_line, 每块数据只复制常数次
+    rest: bytes = b""
+    skipping: bool = False
+    async for chunk in chunks:
+        if skipping:
+            newline: int = chunk.find(b"\n")
+            if newline < 0:
+                continue
+            chunk = chunk[newline + 1 :]
+            skipping = False
+        data: bytes = rest + chunk
+        end: int = _split_end(data, max_line)
+        rest = data[end:]
+        if len(rest) > max_line:
+            log.warning(f"行过长,已跳过\t长度:{len(rest)}")
+            rest = b""
+            skipping = True
+        for proxy_address in parse_lines(data[:end], default_scheme):
+            yield proxy_address
+    for proxy_address in parse_lines(rest, default_scheme):
+        yield proxy_address
+
+
+async def stream_parse(
+    response: aiohttp.ClientResponse, proxy_source: ProxySource
+) -> AsyncIterator[ProxyAddress]:
+    if not response.ok:
+        raise FailedError(f"状态码无效\tstatus:{response.status}")
+    if response.content_type not in CONTENT_TYPES:
+        raise ContentTypeError(f"返回的类型错误\tcontent_type:{response.content_type}")
+    count: int = 0
+    async for proxy_address in parse_chunks(
+        response.content.iter_chunked(CHUNK_SIZE), proxy_source.scheme or "http"
+    ):
+        count += 1
+        yield proxy_address
+    if count == 0:
+        raise EmptyData(f"获取到的代理池是空的")
+    log.info(f"成功\t数量:{count}\t{proxy_source}")
@@ -0,0 +1,138 @@
+import asyncio
+import logging
+import os
+from collections import deque
+
+from ..utils.loop_lag import LoopLagMonitor
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+log = logging.getLogger("app")
+
+
+def available_fds() -> int | None:
+    if resource is None or not os.path.isdir("/proc/self/fd"):
+        return None
+    soft, _ = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft == resource.RLIM_INFINITY:
+        return None
+    return soft - len(os.listdir("/proc/self/fd"))
+
+
+# AIMD: 每个窗口没有拥塞信号就加性增加并发, 出现拥塞就乘性减小
+class AdaptiveLimiter:
+    def __init__(
+        self,
+        initial: int = 100,
+        minimum: int = 10,
+        maximum: int = 1000,
+        window: int = 100,
+        increase: int = 20,
+        decrease: float = 0.7,
+        tolerance: float = 0.15,
+        max_loop_lag: float = 0.2,
+        fd_reserve: int = 100,
+    ) -> None:
+        self.limit: int = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.window = window
+        self.increase = increase
+        self.decrease = decrease
+        self.tolerance = tolerance
+        self.max_loop_lag = max_loop_lag
+        self.fd_reserve = fd_reserve
+        self.in_flight: int = 0
+        self.peak_in_flight: int = 0
+        self.loop_lag_monitor = LoopLagMonitor()
+        # 大部分代理本来就连不上, 超时率和连接错误率以各自观察到的最低值为基准
+        self.baseline_timeout_ratio: float | None = None
+        self.baseline_error_ratio: float | None = None
+        self._completed: int = 0
+        self._timeouts: int = 0
+        self._errors: int = 0
+        self._waiters: deque[asyncio.Future] = deque()
+
+    async def acquire(self) -> None:
+        self.loop_lag_monitor.start()
+        while self.in_flight >= self.limit:
+            waiter: asyncio.Future = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+                elif waiter.done() and not waiter.cancelled():
+                    # 已被唤醒但任务随后被取消, 把名额让给下一个等待者
+                    self._wake()
+                raise
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        free: int = self.limit - self.in_flight
+        while free > 0 and self._waiters:
+            waiter: asyncio.Future = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                free -= 1
+
+    async def __aenter__(self) -> "AdaptiveLimiter":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.release()
+
+    def record(self, timeout: bool = False, connect_error: bool = False) -> None:
+        self._completed += 1
+        self._timeouts += timeout
+        self._errors += connect_error
+        if self._completed >= self.window:
+            self._adjust()
+
+    def _adjust(self) -> None:
+        timeout_ratio: float = self._timeouts / self._completed
+        error_ratio: float = self._errors / self._completed
+        self._completed = self._timeouts = self._errors = 0
+        if self.baseline_timeout_ratio is None:
+            self.baseline_timeout_ratio = timeout_ratio
+            self.baseline_error_ratio = error_ratio
+        reasons: list[str] = []
+        if timeout_ratio > self.baseline_timeout_ratio + self.tolerance:
+            reasons.append(f"超时率:{timeout_ratio:.2f}")
+        if error_ratio > (self.baseline_error_ratio or 0) + self.tolerance:
+            reasons.append(f"连接错误率:{error_ratio:.2f}")
+        if self.loop_lag_monitor.lag > self.max_loop_lag:
+            reasons.append(f"事件循环延迟:{self.loop_lag_monitor.lag * 1000:.0f}ms")
+        fds: int | None = available_fds()
+        if fds is not None and fds < self.fd_reserve:
+            reasons.append(f"剩余文件描述符:{fds}")
+        # 基准缓慢上移, 避免一次偶然的低值让后面的窗口一直被判为拥塞
+        self.baseline_timeout_ratio = min(
+            timeout_ratio, self.baseline_timeout_ratio + 0.01
+        )
+        self.baseline_error_ratio = min(
+            error_ratio, (self.baseline_error_ratio or 0) + 0.01
+        )
+        previous: int = self.limit
+        if reasons:
+            self.limit = max(self.minimum, int(self.limit * self.decrease))
+        elif self.peak_in_flight >= self.limit:
+            # 只有并发真正用满时才继续加
+            self.limit = min(self.maximum, self.limit + self.increase)
+            self._wake()
+        self.peak_in_flight = self.in_flight
+        if self.limit != previous:
+            log.debug(f"并发上限\t{previous}->{self.limit}\t{' '.join(reasons)}")
+
+    def close(self) -> None:
+        self.loop_lag_monitor.stop()
@@ -0,0 +1,71 @@
+import logging
+
+from ..models.check_deadlines import CheckDeadlines
+from ..models.proxy_address import ProxyAddress
+from ..models.proxy_server import ProxyServer
+from ..utils.stats import LatencyWindow
+
+log = logging.getLogger("app")
+
+
+# 按成功检测的延迟分布收紧各阶段超时: p95 × factor, 不超过配置的上限
+# first_byte 样本和执行的首字节超时口径相同, 都从发起请求算起, 包含连接时间
+class AdaptiveTimeout:
+    def __init__(
+        self,
+        deadlines: CheckDeadlines,
+        q: float = 95,
+        factor: float = 2,
+        minimum: float = 0.5,
+        min_samples: int = 50,
+        window: int = 1000,
+        refresh: int = 50,
+    ) -> None:
+        self.configured = deadlines
+        self.deadlines = deadlines
+        self.q = q
+        self.factor = factor
+        self.minimum = minimum
+        self.min_samples = min_samples
+        self.refresh = refresh
+        self.connect = LatencyWindow(window)
+        self.first_byte = LatencyWindow(window)
+        self.total = LatencyWindow(window)
+        self._pending: int = 0
+
+    def _deadline(self, window: LatencyWindow, limit: float | None) -> float | None:
+        value: float | None = window.percentile(self.q)
+        if value is None or len(window) < self.min_samples:
+            return limit
+        deadline: float = max(self.minimum, value / 1000 * self.factor)
+        return deadline if limit is None else min(limit, deadline)
+
+    def observe(
+        self,
+        proxy_address: ProxyAddress,
+        proxy_server: ProxyServer | None,
+        elapsed: float | None,
+    ) -> None:
+        if proxy_server is None:
+            return
+        if proxy_server.connect_time is not None:
+            self.connect.add(proxy_server.connect_time)
+        if proxy_server.first_byte_time is not None:
+            self.first_byte.add(proxy_server.first_byte_time)
+        if proxy_server.response_time is not None:
+            self.total.add(proxy_server.response_time)
+        self._pending += 1
+        if self._pending >= self.refresh:
+            self._pending = 0
+            self._update()
+
+    def _update(self) -> None:
+        deadlines: CheckDeadlines = CheckDeadlines(
+            total=self._deadline(self.total, self.configured.total)
+            or self.configured.total,
+            connect=self._deadline(self.connect, self.configured.connect),
+            first_byte=self._deadline(self.first_byte, self.configured.first_byte),
+        )
+        if deadlines != self.deadlines:
+            log.debug(f"超时调整\t{deadlines}")
+            self.deadlines = deadlines
@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import time
+from collections import deque
+
+import aiohttp
+
+from .proxy_get_check_service import ProxyGetCheckService
+from .proxy_source_service import ProxySourceService
+from .sharded_check_service import ShardedCheckService
+from ..models.proxy_address import ProxyAddress
+from ..models.proxy_server import ProxyServer
+from ..models.source_yield import SourceYield
+from ..models.stage_stats import StageStats
+from ..utils.loop_lag import LoopLagMonitor
+from ..utils.stats import Histogram
+
+log = logging.getLogger("app")
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+# 运行中的指标: 只读取各服务已有的计数, 热路径上不额外加锁或分配.
+# render() 输出 Prometheus 文本格式, interval 大于 0 时定期写一行日志.
+# 多进程检测时各阶段的统计在子进程中, 检测结束才合并到父进程,
+# 运行中只有检测结果数和代理源产出是实时的
+class CheckMetrics:
+    def __init__(
+        self,
+        proxy_get_check_service: ProxyGetCheckService | ShardedCheckService,
+        proxy_source_service: ProxySourceService | None = None,
+        connector: aiohttp.BaseConnector | None = None,
+        interval: float = 0,
+        window: int = 10,
+    ) -> None:
+        self.proxy_get_check_service = proxy_get_check_service
+        self.proxy_source_service = proxy_source_service
+        self.connector = connector
+        self.interval = interval
+        self.loop_lag_monitor: LoopLagMonitor = LoopLagMonitor()
+        self.passed: int = 0
+        self.failed: int = 0
+        # 每秒一个 (时间, 结果数) 样本, 速率按窗口首尾计算
+        self._samples: deque[tuple[float, int]] = deque(maxlen=window + 1)
+        self._task: asyncio.Task | None = None
+        proxy_get_check_service.observers.append(self.observe)
+
+    def observe(
+        self,
+        proxy_address: ProxyAddress,
+        proxy_server: ProxyServer | None,
+        elapsed: float | None,
+    ) -> None:
+        if proxy_server is None:
+            self.failed += 1
+            return
+        self.passed += 1
+        if self.proxy_source_service is not None:
+            source_yield: SourceYield | None = (
+                self.proxy_source_service.source_yield.get(proxy_server.source)
+            )
+            if source_yield is not None:
+                source_yield.validated += 1
+
+    @property
+    def rate(self) -> float:
+        if len(self._samples) < 2:
+            return 0.0
+        (first_at, first), (last_at, last) = self._samples[0], self._samples[-1]
+        return (last - first) / (last_at - first_at) if last_at > first_at else 0.0
+
+    def _sample(self) -> None:
+        self._samples.append((time.monotonic(), self.passed + self.failed))
+
+    def _stages(self) -> list[StageStats]:
+        stages: list[StageStats] = []
+        if self.proxy_source_service is not None:
+            stages.append(self.proxy_source_service.source_stats)
+        service: ProxyGetCheckService | ShardedCheckService = (
+            self.proxy_get_check_service
+        )
+        if isinstance(service, ProxyGetCheckService) and service.detector is not None:
+            stages.append(service.detector.stats)
+        stages.append(service.prescreen_stats)
+        stages.append(service.check_stats)
+        return stages
+
+    def _connector_usage(self) -> tuple[int, int] | None:
+        # aiohttp 没有公开连接池的占用情况, 读取内部属性, 取不到时不输出
+        acquired = getattr(self.connector, "_acquired", None)
+        conns = getattr(self.connector, "_conns", None)
+        if acquired is None or conns is None:
+            return None
+        return len(acquired), sum(len(idle) for idle in conns.values())
+
+    def render(self) -> str:
+        lines: list[str] = []
+
+        def metric(name: str, kind: str, samples: list[tuple[str, float]]) -> None:
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{name}{labels} {value}" for labels, value in samples)
+
+        service: ProxyGetCheckService | ShardedCheckService = (
+            self.proxy_get_check_service
+        )
+        metric(
+            "proxy_check_results_total",
+            "counter",
+            [('{result="ok"}', self.passed), ('{result="failed"}', self.failed)],
+        )
+        stages: list[StageStats] = self._stages()
+        metric(
+            "proxy_check_stage_total",
+            "counter",
+            [
+                (f'{{stage="{stage.name}",result="ok"}}', stage.passed)
+                for stage in stages
+            ]
+            + [
+                (f'{{stage="{stage.name}",result="failed"}}', stage.failed)
+                for stage in stages
+            ],
+        )
+        metric(
+            "proxy_check_failures_total",
+            "counter",
+            [
+                (
+                    f'{{stage="{stage.name}",reason="{reason.name.lower()}"}}',
+                    count,
+                )
+                for stage in stages
+                for reason, count in sorted(stage.failures.items())
+            ],
+        )
+        metric("proxy_check_rate", "gauge", [("", self.rate)])
+        if isinstance(service, ProxyGetCheckService):
+            metric("proxy_check_started_total", "counter", [("", service.started)])
+            metric("proxy_check_in_flight", "gauge", [("", service.in_flight)])
+            metric(
+                "proxy_check_in_flight_limit", "gauge", [("", service.in_flight_limit)]
+            )
+            histogram: Histogram = service.check_duration
+            buckets: list[tuple[str, float]] = [
+                (f'_bucket{{le="{bound:g}"}}', count)
+                for bound, count in zip(histogram.buckets, histogram.cumulative())
+            ]
+            buckets.append(('_bucket{le="+Inf"}', histogram.count))
+            buckets.append(("_sum", histogram.sum))
+            buckets.append(("_count", histogram.count))
+            metric("proxy_check_duration_seconds", "histogram", buckets)
+        metric("event_loop_lag_seconds", "gauge", [("", self.loop_lag_monitor.lag)])
+        metric(
+            "event_loop_lag_max_seconds",
+            "gauge",
+            [("", self.loop_lag_monitor.max_lag)],
+        )
+        usage: tuple[int, int] | None = self._connector_usage()
+        if usage is not None:
+            metric(
+                "http_connector_connections",
+                "gauge",
+                [('{state="acquired"}', usage[0]), ('{state="idle"}', usage[1])],
+            )
+            metric("http_connector_limit", "gauge", [("", self.connector.limit)])
+        if self.proxy_source_service is not None:
+            yields: list[SourceYield] = list(
+                self.proxy_source_service.source_yield.values()
+            )
+            for name, field in (
+                ("proxy_source_addresses_total", "contributed"),
+                ("proxy_source_unique_total", "unique"),
+                ("proxy_source_validated_total", "validated"),
+            ):
+                metric(
+                    name,
+                    "counter",
+                    [
+                        (
+                            f'{{source="{_label(source_yield.url)}"}}',
+                            getattr(source_yield, field),
+                        )
+                        for source_yield in yields
+                    ],
+                )
+        return "\n".join(lines) + "\n"
+
+    def __str__(self) -> str:
+        s: str = (
+            f"结果:{self.passed + self.failed}\t通过:{self.passed}"
+            f"\t速率:{self.rate:.0f}/s"
+        )
+        service: ProxyGetCheckService | ShardedCheckService = (
+            self.proxy_get_check_service
+        )
+        if isinstance(service, ProxyGetCheckService):
+            s += f"\t并发:{service.in_flight}/{service.in_flight_limit}"
+        usage: tuple[int, int] | None = self._connector_usage()
+        if usage is not None:
+            s += f"\t连接:{usage[0]}/{self.connector.limit}"
+        s += (
+            f"\t事件循环延迟:{self.loop_lag_monitor.lag * 1000:.0f}ms"
+            f"\t最大:{self.loop_lag_monitor.max_lag * 1000:.0f}ms"
+        )
+        return s
+
+    async def _run(self) -> None:
+        next_log: float = time.monotonic() + self.interval
+        while True:
+            await asyncio.sleep(1)
+            self._sample()
+            if self.interval and time.monotonic() >= next_log:
+                log.info(f"指标\t{self}")
+                next_log += self.interval
+
+    def start(self) -> None:
+        if self._task is None:
+            self.loop_lag_monitor.start()
+            self._sample()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+            self.loop_lag_monitor.stop()
+
+    def log_summary(self) -> None:
+        if self.proxy_source_service is None:
+            return
+        for source_yield in sorted(
+            self.proxy_source_service.source_yield.values(),
+            key=lambda source_yield: source_yield.validated,
+            reverse=True,
+        ):
+            log.info(f"代理源产出\t{source_yield}")
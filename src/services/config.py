@@ -1,28 +1,70 @@
+import atexit
 import logging
+import logging.handlers
 import importlib.util
+import queue
+from typing import TextIO
 
 from ..errors.error import loadConfigError
 from ..models.script import Script
+from ..utils.log import JsonLinesFormatter, LoopQueueHandler, RateLimitFilter
 
 
 class Config:
+    log_listener: logging.handlers.QueueListener | None = None
+    log_handler: tuple[logging.Logger, logging.Handler] | None = None
+
     @staticmethod
-    def init_log(log: logging.Logger) -> logging.Logger:
+    def init_log(
+        log: logging.Logger,
+        filename: str = "app.log",
+        stream: TextIO | None = None,
+        json_lines: bool = False,
+        rate: float = 20,
+        burst: int = 100,
+    ) -> logging.Logger:
         log.setLevel(logging.DEBUG)
-
-        file_handler = logging.FileHandler(filename="app.log", mode="w")
-        file_handler.setFormatter(
-            logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
+        formatter: logging.Formatter = (
+            JsonLinesFormatter()
+            if json_lines
+            else logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
         )
 
-        log.addHandler(file_handler)
-        stream_handler = logging.StreamHandler()
+        file_handler = logging.FileHandler(filename=filename, mode="w")
+        file_handler.setFormatter(formatter)
+        stream_handler = logging.StreamHandler(stream)
         stream_handler.setFormatter(
             logging.Formatter("%(asctime)s - %(levelname)s - %(message)s")
         )
-        log.addHandler(stream_handler)
+
+        # 格式化和写入都在后台线程完成, 事件循环只负责入队
+        Config.stop_log()
+        log_queue: queue.SimpleQueue = queue.SimpleQueue()
+        queue_handler = LoopQueueHandler(log_queue)
+        if rate > 0:
+            queue_handler.addFilter(RateLimitFilter(rate=rate, burst=burst))
+        log.addHandler(queue_handler)
+        Config.log_handler = (log, queue_handler)
+        Config.log_listener = logging.handlers.QueueListener(
+            log_queue, file_handler, stream_handler
+        )
+        Config.log_listener.start()
+        atexit.register(Config.stop_log)
         return log
 
+    @staticmethod
+    def stop_log() -> None:
+        # 停止时会先写完队列中剩余的日志
+        if Config.log_handler is not None:
+            log, handler = Config.log_handler
+            log.removeHandler(handler)
+            Config.log_handler = None
+        if Config.log_listener is not None:
+            Config.log_listener.stop()
+            for handler in Config.log_listener.handlers:
+                handler.close()
+            Config.log_listener = None
+
     @staticmethod
     def load_script(path: str, variable_name: str) -> Script:
         try:
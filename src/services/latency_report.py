@@ -0,0 +1,66 @@
+import logging
+from bisect import bisect_left
+
+from ..models.proxy_address import ProxyAddress
+from ..models.proxy_server import ProxyServer
+from ..utils.stats import percentile
+
+log = logging.getLogger("app")
+
+# 直方图桶的上界, 单位毫秒
+BUCKETS: tuple[float, ...] = (100, 200, 500, 1000, 2000, 3000, 5000, float("inf"))
+LABELS: tuple[str, ...] = tuple(
+    f"<={bucket:.0f}ms" if bucket != float("inf") else ">5000ms" for bucket in BUCKETS
+)
+
+
+class LatencyReport:
+    def __init__(self) -> None:
+        self.by_scheme: dict[str, list[float]] = {}
+        self.by_source: dict[str, list[float]] = {}
+
+    def observe(
+        self,
+        proxy_address: ProxyAddress,
+        proxy_server: ProxyServer | None,
+        elapsed: float | None,
+    ) -> None:
+        if proxy_server is None or proxy_server.response_time is None:
+            return
+        self.by_scheme.setdefault(proxy_server.scheme, []).append(
+            proxy_server.response_time
+        )
+        self.by_source.setdefault(proxy_server.source or "unknown", []).append(
+            proxy_server.response_time
+        )
+
+    @staticmethod
+    def histogram(samples: list[float]) -> list[int]:
+        counts: list[int] = [0] * len(BUCKETS)
+        for sample in samples:
+            counts[bisect_left(BUCKETS, sample)] += 1
+        return counts
+
+    @staticmethod
+    def summary(samples: list[float]) -> str:
+        return (
+            f"数量:{len(samples)}\tp50:{percentile(samples, 50):.0f}ms"
+            f"\tp90:{percentile(samples, 90):.0f}ms"
+            f"\tp99:{percentile(samples, 99):.0f}ms"
+        )
+
+    @classmethod
+    def format_histogram(cls, samples: list[float]) -> str:
+        return "\t".join(
+            f"{label}:{count}" for label, count in zip(LABELS, cls.histogram(samples))
+        )
+
+    def log_summary(self) -> None:
+        groups: list[tuple[str, dict[str, list[float]]]] = [
+            ("scheme", self.by_scheme),
+            ("source", self.by_source),
+        ]
+        for name, by_key in groups:
+            for key, samples in sorted(by_key.items()):
+                log.info(f"延迟\t{name}:{key}\t{self.summary(samples)}")
+                log.info(f"延迟分布\t{name}:{key}\t{self.format_histogram(samples)}")
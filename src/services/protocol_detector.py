@@ -0,0 +1,136 @@
+import asyncio
+import dataclasses
+import logging
+from collections import Counter
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable
+from urllib.parse import urlsplit
+
+from ..models.proxy_address import ProxyAddress
+from ..models.proxy_address_set import ProxyAddressSet
+from ..models.proxy_check_target import ProxyCheckTarget
+from ..models.stage_stats import StageStats
+from ..utils.socks import SOCKS5_GREETING, socks4_request
+
+log = logging.getLogger("app")
+
+PROTOCOLS: tuple[str, ...] = ("http", "https", "socks4", "socks5")
+
+
+# 在一个连接上发送 CONNECT, 按代理回应的首字节判断协议族:
+# HTTP 代理回应状态行, 不再建立其他连接; SOCKS 代理回应自己的版本号时
+# 只探测该版本是否允许无认证连接; 直接断开, 超时或无法识别时才探测 SOCKS4/SOCKS5
+class ProtocolDetector:
+    def __init__(
+        self,
+        target_host: str,
+        target_port: int = 443,
+        timeout: float = 3,
+    ) -> None:
+        self.timeout = timeout
+        self.stats = StageStats(name="detect")
+        self.found: Counter[str] = Counter()
+        self._connect_request: bytes = (
+            f"CONNECT {target_host}:{target_port} HTTP/1.1\r\n"
+            f"Host: {target_host}:{target_port}\r\n\r\n"
+        ).encode()
+        self._socks4_request: bytes = socks4_request(target_host, target_port)
+
+    @classmethod
+    def for_target(
+        cls, proxy_check_target: ProxyCheckTarget, timeout: float = 3
+    ) -> "ProtocolDetector":
+        url = urlsplit(f"https://{proxy_check_target.website}")
+        return cls(url.hostname or "", url.port or 443, timeout)
+
+    @staticmethod
+    async def unique_endpoints(
+        proxy_addresses: AsyncIterable[ProxyAddress],
+    ) -> AsyncIterator[ProxyAddress]:
+        # 同一 host:port 只探测一次, 统一 scheme 后去重
+        seen: ProxyAddressSet = ProxyAddressSet()
+        async for proxy_address in proxy_addresses:
+            if seen.add(dataclasses.replace(proxy_address, scheme="http")):
+                yield proxy_address
+
+    async def _exchange(
+        self,
+        host: str,
+        port: int,
+        payload: bytes,
+        read: Callable[[asyncio.StreamReader], Awaitable[bytes]],
+    ) -> bytes | None:
+        # 连接失败返回 None, 连接后被关闭或超时返回已读到的字节
+        try:
+            async with asyncio.timeout(self.timeout):
+                reader, writer = await asyncio.open_connection(host, port)
+        except (OSError, TimeoutError):
+            return None
+        data: bytes = b""
+        try:
+            async with asyncio.timeout(self.timeout):
+                writer.write(payload)
+                data = await read(reader)
+        except asyncio.IncompleteReadError as e:
+            data = e.partial
+        except (OSError, TimeoutError):
+            pass
+        finally:
+            writer.close()
+        return data
+
+    @staticmethod
+    async def _read_status(reader: asyncio.StreamReader) -> bytes:
+        data: bytes = await reader.read(64)
+        # 只有 HTTP 回应需要读到状态码
+        while data.startswith(b"H") and len(data) < 12:
+            chunk: bytes = await reader.read(64)
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    @staticmethod
+    async def _read_reply(reader: asyncio.StreamReader) -> bytes:
+        return await reader.readexactly(2)
+
+    @staticmethod
+    def _http_protocols(head: bytes) -> list[str]:
+        if head[9:12] == b"200":
+            return ["http", "https"]
+        return ["http"]
+
+    async def _socks5(self, host: str, port: int) -> bool:
+        reply = await self._exchange(host, port, SOCKS5_GREETING, self._read_reply)
+        return reply == b"\x05\x00"
+
+    async def _socks4(self, host: str, port: int) -> bool:
+        reply = await self._exchange(host, port, self._socks4_request, self._read_reply)
+        return reply == b"\x00\x5a"
+
+    async def detect(self, host: str, port: int) -> list[str]:
+        head: bytes | None = await self._exchange(
+            host, port, self._connect_request, self._read_status
+        )
+        if head is None:
+            return []
+        if head.startswith(b"HTTP/"):
+            return self._http_protocols(head)
+        if head.startswith(b"\x05"):
+            return ["socks5"] if await self._socks5(host, port) else []
+        if head.startswith(b"\x00"):
+            return ["socks4"] if await self._socks4(host, port) else []
+        # 回应不明确, 再分别探测两种 SOCKS
+        socks4, socks5 = await asyncio.gather(
+            self._socks4(host, port), self._socks5(host, port)
+        )
+        protocols: list[str] = []
+        if socks4:
+            protocols.append("socks4")
+        if socks5:
+            protocols.append("socks5")
+        return protocols
+
+    def summary(self) -> str:
+        return f"{self.stats}\t" + "\t".join(
+            f"{protocol}:{self.found[protocol]}" for protocol in PROTOCOLS
+        )
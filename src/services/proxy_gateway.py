@@ -0,0 +1,467 @@
+import asyncio
+import logging
+import random
+import time
+
+from multidict import CIMultiDict
+
+from .proxy_get_check_service import CheckObserver
+from .proxy_pool_index import ProxyPoolIndex
+from ..errors.error import ProxyError
+from ..models.proxy_address import ProxyAddress
+from ..models.proxy_server import ProxyServer
+from ..utils.socks import SOCKS_SCHEMES, socks_connect
+
+log = logging.getLogger("app")
+
+# 普通 HTTP 请求走 http 代理, CONNECT 隧道走支持隧道的代理
+HTTP_SCHEMES: tuple[str, ...] = ("http",)
+TUNNEL_SCHEMES: tuple[str, ...] = ("https", "socks5", "socks4")
+HOP_BY_HOP: frozenset[str] = frozenset(
+    {"connection", "keep-alive", "proxy-connection", "proxy-authorization", "te"}
+)
+CHUNK_SIZE: int = 64 * 1024
+
+
+class _Head:
+    __slots__ = ("line", "headers")
+
+    def __init__(self, line: str, headers: CIMultiDict) -> None:
+        self.line = line
+        self.headers = headers
+
+    def encode(self, extra: str = "") -> bytes:
+        lines: str = "".join(
+            f"{key}: {value}\r\n"
+            for key, value in self.headers.items()
+            if key.lower() not in HOP_BY_HOP
+        )
+        return f"{self.line}\r\n{lines}{extra}\r\n".encode("latin-1")
+
+
+async def _read_head(reader: asyncio.StreamReader) -> _Head | None:
+    try:
+        data: bytes = await reader.readuntil(b"\r\n\r\n")
+    except asyncio.IncompleteReadError:
+        return None
+    lines: list[str] = data.decode("latin-1").split("\r\n")
+    headers: CIMultiDict = CIMultiDict()
+    for line in lines[1:]:
+        key, sep, value = line.partition(":")
+        if sep:
+            headers.add(key.strip(), value.strip())
+    return _Head(lines[0], headers)
+
+
+async def _copy(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, size: int | None
+) -> None:
+    # size 为 None 时复制到连接关闭
+    while size is None or size > 0:
+        chunk: bytes = await reader.read(
+            CHUNK_SIZE if size is None else min(size, CHUNK_SIZE)
+        )
+        if not chunk:
+            if size is None:
+                return
+            raise asyncio.IncompleteReadError(b"", size)
+        writer.write(chunk)
+        await writer.drain()
+        if size is not None:
+            size -= len(chunk)
+
+
+async def _copy_chunked(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+) -> None:
+    while True:
+        line: bytes = await reader.readuntil(b"\r\n")
+        writer.write(line)
+        size: int = int(line.split(b";")[0], 16)
+        if size == 0:
+            # trailer 直到空行
+            while (line := await reader.readuntil(b"\r\n")) != b"\r\n":
+                writer.write(line)
+            writer.write(line)
+            await writer.drain()
+            return
+        await _copy(reader, writer, size + 2)
+
+
+def _keep_alive(head: _Head, version: str) -> bool:
+    connection: str = head.headers.get("Connection", "").lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+class _Upstream:
+    __slots__ = ("reader", "writer", "idle_since")
+
+    def __init__(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        self.reader = reader
+        self.writer = writer
+        self.idle_since: float = time.monotonic()
+
+    def usable(self, idle_timeout: float) -> bool:
+        return (
+            not self.writer.is_closing()
+            and not self.reader.at_eof()
+            and time.monotonic() - self.idle_since < idle_timeout
+        )
+
+
+# 本地转发代理: 每个请求从已验证的代理池中按延迟加权选出上游代理,
+# 上游出错时换一个重试; 实际流量中连续失败的代理会通知观察者
+# (代理池索引, 健康记录), 不必等到下一轮检测
+class ProxyGateway:
+    def __init__(
+        self,
+        proxy_pool_index: ProxyPoolIndex,
+        host: str = "127.0.0.1",
+        port: int = 8898,
+        timeout: float = 10,
+        attempts: int = 3,
+        candidates: int = 50,
+        max_age: float | None = None,
+        max_failures: int = 2,
+        pool_size: int = 8,
+        idle_timeout: float = 30,
+        max_body: int = 1024 * 1024,
+    ) -> None:
+        self.proxy_pool_index = proxy_pool_index
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.attempts = attempts
+        self.candidates = candidates
+        self.max_age = max_age
+        self.max_failures = max_failures
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.max_body = max_body
+        self.observers: list[CheckObserver] = []
+        # 实际流量中测得的延迟, 单位毫秒
+        self.latency: dict[tuple[str, int], float] = {}
+        self.failures: dict[tuple[str, str, int], int] = {}
+        # 降级时间, 索引快照刷新前也不再选用; 重新检测通过后恢复
+        self.demoted: dict[tuple[str, str, int], float] = {}
+        self._pools: dict[tuple[str, int], list[_Upstream]] = {}
+        self._server: asyncio.Server | None = None
+
+    def _usable(
+        self, proxy_server: ProxyServer, tried: set[tuple[str, str, int]]
+    ) -> bool:
+        key: tuple[str, str, int] = (
+            proxy_server.scheme,
+            proxy_server.host,
+            proxy_server.port,
+        )
+        if key in tried:
+            return False
+        demoted_at: float | None = self.demoted.get(key)
+        return demoted_at is None or demoted_at < (proxy_server.checked_at or 0)
+
+    def _choose(
+        self, schemes: tuple[str, ...], tried: set[tuple[str, str, int]]
+    ) -> ProxyServer | None:
+        candidates: list[ProxyServer] = []
+        for scheme in schemes:
+            candidates.extend(
+                proxy_server
+                for proxy_server in self.proxy_pool_index.query(
+                    scheme, self.candidates, max_age=self.max_age
+                )
+                if self._usable(proxy_server, tried)
+            )
+        if not candidates:
+            return None
+        weights: list[float] = [
+            1
+            / max(
+                1.0,
+                self.latency.get(
+                    (proxy_server.host, proxy_server.port),
+                    proxy_server.response_time or 1000.0,
+                ),
+            )
+            for proxy_server in candidates
+        ]
+        return random.choices(candidates, weights)[0]
+
+    def _succeeded(self, proxy_server: ProxyServer, elapsed: float) -> None:
+        key: tuple[str, int] = (proxy_server.host, proxy_server.port)
+        previous: float | None = self.latency.get(key)
+        self.latency[key] = (
+            elapsed * 1000 if previous is None else previous * 0.8 + elapsed * 200
+        )
+        self.failures.pop(
+            (proxy_server.scheme, proxy_server.host, proxy_server.port), None
+        )
+
+    def _failed(self, proxy_server: ProxyServer, error: BaseException) -> None:
+        key: tuple[str, str, int] = (
+            proxy_server.scheme,
+            proxy_server.host,
+            proxy_server.port,
+        )
+        failures: int = self.failures.get(key, 0) + 1
+        log.debug(f"上游失败\t{proxy_server}\t{error.__class__}\t次数:{failures}")
+        if failures < self.max_failures:
+            self.failures[key] = failures
+            return
+        self.failures.pop(key, None)
+        self.demoted[key] = time.time()
+        log.info(f"降级代理\t{ProxyAddress.__str__(proxy_server)}")
+        proxy_address: ProxyAddress = ProxyAddress(
+            scheme=proxy_server.scheme,
+            host=proxy_server.host,
+            port=proxy_server.port,
+            source=proxy_server.source,
+        )
+        for observer in self.observers:
+            observer(proxy_address, None, None)
+
+    async def _acquire(self, proxy_server: ProxyServer) -> tuple[_Upstream, bool]:
+        pool: list[_Upstream] = self._pools.get(
+            (proxy_server.host, proxy_server.port), []
+        )
+        while pool:
+            upstream: _Upstream = pool.pop()
+            if upstream.usable(self.idle_timeout):
+                return upstream, True
+            upstream.writer.close()
+        reader, writer = await asyncio.open_connection(
+            proxy_server.host, proxy_server.port
+        )
+        return _Upstream(reader, writer), False
+
+    def _release(self, proxy_server: ProxyServer, upstream: _Upstream) -> None:
+        pool: list[_Upstream] = self._pools.setdefault(
+            (proxy_server.host, proxy_server.port), []
+        )
+        if len(pool) >= self.pool_size:
+            upstream.writer.close()
+            return
+        upstream.idle_since = time.monotonic()
+        pool.append(upstream)
+
+    def _reject_body(self, head: _Head) -> bytes | None:
+        # 请求体要先读完才能失败重试, 分块编码和过大的请求体直接拒绝
+        if "chunked" in head.headers.get("Transfer-Encoding", "").lower():
+            return b"HTTP/1.1 411 Length Required\r\nContent-Length: 0\r\n\r\n"
+        length: str = head.headers.get("Content-Length", "0")
+        if not length.isdigit() or int(length) > self.max_body:
+            return b"HTTP/1.1 413 Payload Too Large\r\nContent-Length: 0\r\n\r\n"
+        return None
+
+    async def _forward(
+        self,
+        proxy_server: ProxyServer,
+        upstream: _Upstream,
+        request: bytes,
+    ) -> _Head:
+        upstream.writer.write(request)
+        await upstream.writer.drain()
+        head: _Head | None = await _read_head(upstream.reader)
+        if head is None:
+            raise ProxyError("上游连接被关闭")
+        return head
+
+    async def _relay_response(
+        self,
+        method: str,
+        head: _Head,
+        upstream: _Upstream,
+        client_writer: asyncio.StreamWriter,
+    ) -> bool:
+        # 返回上游连接能否复用
+        parts: list[str] = head.line.split(" ", 2)
+        status: int = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+        reusable: bool = _keep_alive(head, parts[0])
+        if "chunked" in head.headers.get("Transfer-Encoding", "").lower():
+            client_writer.write(head.encode("Connection: keep-alive\r\n"))
+            await _copy_chunked(upstream.reader, client_writer)
+            return reusable
+        if method == "HEAD" or status in (204, 304) or 100 <= status < 200:
+            client_writer.write(head.encode("Connection: keep-alive\r\n"))
+            await client_writer.drain()
+            return reusable
+        length: str | None = head.headers.get("Content-Length")
+        if length is not None and length.isdigit():
+            client_writer.write(head.encode("Connection: keep-alive\r\n"))
+            await _copy(upstream.reader, client_writer, int(length))
+            return reusable
+        # 没有长度的响应读到关闭为止, 客户端连接也随之关闭
+        client_writer.write(head.encode("Connection: close\r\n"))
+        await _copy(upstream.reader, client_writer, None)
+        return False
+
+    async def _handle_http(
+        self,
+        head: _Head,
+        client_reader: asyncio.StreamReader,
+        client_writer: asyncio.StreamWriter,
+    ) -> bool:
+        method: str = head.line.split(" ", 1)[0]
+        rejected: bytes | None = self._reject_body(head)
+        if rejected is not None:
+            client_writer.write(rejected)
+            await client_writer.drain()
+            return False
+        body: bytes = await client_reader.readexactly(
+            int(head.headers.get("Content-Length", "0"))
+        )
+        request: bytes = head.encode("Connection: keep-alive\r\n") + body
+        tried: set[tuple[str, str, int]] = set()
+        for _ in range(self.attempts):
+            proxy_server: ProxyServer | None = self._choose(HTTP_SCHEMES, tried)
+            if proxy_server is None:
+                break
+            tried.add((proxy_server.scheme, proxy_server.host, proxy_server.port))
+            started: float = time.perf_counter()
+            try:
+                async with asyncio.timeout(self.timeout):
+                    upstream, pooled = await self._acquire(proxy_server)
+                    try:
+                        response: _Head = await self._forward(
+                            proxy_server, upstream, request
+                        )
+                    except (OSError, ProxyError):
+                        if not pooled:
+                            raise
+                        # 复用的连接可能已被上游关闭, 换新连接再试一次
+                        upstream.writer.close()
+                        upstream, _ = await self._acquire(proxy_server)
+                        response = await self._forward(proxy_server, upstream, request)
+            except (OSError, TimeoutError, ProxyError) as e:
+                self._failed(proxy_server, e)
+                continue
+            self._succeeded(proxy_server, time.perf_counter() - started)
+            try:
+                reusable: bool = await self._relay_response(
+                    method, response, upstream, client_writer
+                )
+            except BaseException:
+                upstream.writer.close()
+                raise
+            if reusable:
+                self._release(proxy_server, upstream)
+            else:
+                upstream.writer.close()
+                return False
+            return True
+        client_writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+        await client_writer.drain()
+        return True
+
+    async def _open_tunnel(
+        self, proxy_server: ProxyServer, host: str, port: int
+    ) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        reader, writer = await asyncio.open_connection(
+            proxy_server.host, proxy_server.port
+        )
+        try:
+            if proxy_server.scheme in SOCKS_SCHEMES:
+                await socks_connect(reader, writer, proxy_server.scheme, host, port)
+                return reader, writer
+            writer.write(
+                f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n\r\n".encode()
+            )
+            head: _Head | None = await _read_head(reader)
+            if head is None or head.line.split(" ", 2)[1:2] != ["200"]:
+                raise ProxyError(f"CONNECT失败\t{head.line if head else ''}")
+            return reader, writer
+        except BaseException:
+            writer.close()
+            raise
+
+    async def _handle_connect(
+        self,
+        head: _Head,
+        client_reader: asyncio.StreamReader,
+        client_writer: asyncio.StreamWriter,
+    ) -> None:
+        host, _, port = head.line.split(" ")[1].rpartition(":")
+        tried: set[tuple[str, str, int]] = set()
+        for _ in range(self.attempts):
+            proxy_server: ProxyServer | None = self._choose(TUNNEL_SCHEMES, tried)
+            if proxy_server is None:
+                break
+            tried.add((proxy_server.scheme, proxy_server.host, proxy_server.port))
+            started: float = time.perf_counter()
+            try:
+                async with asyncio.timeout(self.timeout):
+                    reader, writer = await self._open_tunnel(
+                        proxy_server, host.strip("[]"), int(port or 443)
+                    )
+            except (OSError, TimeoutError, ProxyError) as e:
+                self._failed(proxy_server, e)
+                continue
+            self._succeeded(proxy_server, time.perf_counter() - started)
+            client_writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            try:
+                await asyncio.gather(
+                    self._pipe(client_reader, writer),
+                    self._pipe(reader, client_writer),
+                )
+            finally:
+                writer.close()
+            return
+        client_writer.write(b"HTTP/1.1 502 Bad Gateway\r\nContent-Length: 0\r\n\r\n")
+        await client_writer.drain()
+
+    @staticmethod
+    async def _pipe(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            await _copy(reader, writer, None)
+            if writer.can_write_eof():
+                writer.write_eof()
+        except OSError:
+            writer.close()
+
+    async def _handle(
+        self, client_reader: asyncio.StreamReader, client_writer: asyncio.StreamWriter
+    ) -> None:
+        try:
+            while (head := await _read_head(client_reader)) is not None:
+                parts: list[str] = head.line.split(" ")
+                if len(parts) != 3:
+                    client_writer.write(
+                        b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n"
+                    )
+                    break
+                if parts[0] == "CONNECT":
+                    await self._handle_connect(head, client_reader, client_writer)
+                    break
+                if not parts[1].startswith("http://"):
+                    client_writer.write(
+                        b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n"
+                    )
+                    break
+                if not await self._handle_http(head, client_reader, client_writer):
+                    break
+                if not _keep_alive(head, parts[2]):
+                    break
+        except (OSError, ProxyError, asyncio.IncompleteReadError) as e:
+            log.debug(f"网关请求失败\t{e.__class__}\t{e}")
+        except asyncio.LimitOverrunError:
+            pass
+        finally:
+            client_writer.close()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        log.info(f"转发代理\thttp://{self.host}:{self.port}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        for pool in self._pools.values():
+            for upstream in pool:
+                upstream.writer.close()
+        self._pools.clear()
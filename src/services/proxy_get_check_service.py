@@ -1,15 +1,39 @@
 import asyncio
+import dataclasses
 import logging
-from ssl import SSLError
+import random
+import socket
+import time
+from contextlib import aclosing
+from typing import AsyncIterable, AsyncIterator, Callable, Sequence
 
 import aiohttp
 
+from ..errors.error import ProxyError
+from ..models.check_deadlines import CheckDeadlines
+from ..models.check_result import CheckResult
+from ..models.check_timing import CheckTiming
+from ..models.failure_reason import FailureReason
 from ..models.proxy_address import ProxyAddress
 from ..models.proxy_check_target import ProxyCheckTarget
 from ..models.proxy_server import ProxyServer
+from ..models.raw_response import RawResponse
+from ..models.stage_stats import StageStats
+from .adaptive_limiter import AdaptiveLimiter
+from .adaptive_timeout import AdaptiveTimeout
+from .protocol_detector import ProtocolDetector
+from .proxy_health_store import ProxyHealthStore
+from .raw_check_engine import RawCheckEngine
+from .subnet_scheduler import SubnetScheduler
+from ..utils.socks import SOCKS_SCHEMES
+from ..utils.stats import Histogram
+from ..utils.stream import chain, iterate, worker_pool
 
 log = logging.getLogger("app")
 
+# 检测结束时的回调: (代理地址, 成功时的结果, 耗时)
+CheckObserver = Callable[[ProxyAddress, ProxyServer | None, float | None], None]
+
 
 class ProxyGetCheckService:
     def __init__(
@@ -18,76 +42,398 @@ class ProxyGetCheckService:
         client_timeout: aiohttp.ClientTimeout,
         headers: dict,
         proxy_check_target: ProxyCheckTarget,
+        workers: int | None = None,
+        prescreen: bool = True,
+        prescreen_workers: int = 500,
+        prescreen_timeout: float = 3,
+        health_store: ProxyHealthStore | None = None,
+        engine: str = "aiohttp",
+        limiter: AdaptiveLimiter | None = None,
+        deadlines: CheckDeadlines | None = None,
+        adaptive_timeout: AdaptiveTimeout | None = None,
+        detector: ProtocolDetector | None = None,
+        debug_sample: float = 0,
+        proxy_check_targets: Sequence[ProxyCheckTarget] = (),
+        scheduler: SubnetScheduler | None = None,
     ) -> None:
         self.session = session
         self.client_timeout = client_timeout
         self.headers = headers
         self.proxy_check_target = proxy_check_target
-        self.semaphore = asyncio.Semaphore(
+        # 主目标总是第一个检测, 其余目标按开销从小到大排在后面;
+        # target_bits 是每个目标在 capabilities 中的位
+        extra_targets: list[tuple[int, ProxyCheckTarget]] = sorted(
+            enumerate(proxy_check_targets, 1), key=lambda item: item[1].cost
+        )
+        self.check_targets: list[ProxyCheckTarget] = [proxy_check_target]
+        self.check_targets.extend(target for _, target in extra_targets)
+        self.target_bits: list[int] = [0]
+        self.target_bits.extend(bit for bit, _ in extra_targets)
+        self.semaphore: asyncio.Semaphore | AdaptiveLimiter = asyncio.Semaphore(
             self.session.connector.limit if self.session.connector else 1
         )
+        self.limiter = limiter
+        if limiter is not None:
+            self.semaphore = limiter
+        self.workers = workers or (
+            self.session.connector.limit if self.session.connector else 1
+        )
+        self.prescreen = prescreen
+        self.prescreen_workers = prescreen_workers
+        self.prescreen_timeout = prescreen_timeout
+        self.prescreen_stats = StageStats(name="tcp")
+        self.check_stats = StageStats(name="http")
+        # 运行中的计数, 供 CheckMetrics 读取; in_flight 只算拿到并发许可的检测
+        self.started: int = 0
+        self.in_flight: int = 0
+        self.check_duration: Histogram = Histogram((0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+        self.health_store = health_store
+        self.observers: list[CheckObserver] = []
+        self.engine = engine
+        # aiohttp 不支持 SOCKS 代理, SOCKS 地址总是交给 raw 引擎
+        self.raw_check_engine: RawCheckEngine = RawCheckEngine(
+            proxy_check_target=proxy_check_target,
+            headers=headers,
+            timeout=client_timeout.total or 5,
+        )
+        self.detector = detector
+        self.debug_sample = debug_sample
+        if health_store is not None:
+            self.observers.append(health_store.observe)
+        self.deadlines: CheckDeadlines = deadlines or CheckDeadlines(
+            total=client_timeout.total or 5
+        )
+        self.adaptive_timeout = adaptive_timeout
+        if adaptive_timeout is not None:
+            self.observers.append(adaptive_timeout.observe)
+        self.scheduler = scheduler
+        if scheduler is not None:
+            self.observers.append(scheduler.observe)
+        self._client_timeouts: dict[CheckDeadlines, aiohttp.ClientTimeout] = {}
 
     async def check_all_proxies(
         self, proxy_addresses: list[ProxyAddress]
     ) -> list[ProxyServer]:
-        tasks: list[asyncio.Task] = []
-        for proxy_address in proxy_addresses:
-            tasks.append(asyncio.create_task(self.check_proxy(proxy_address)))
-        results: list[object] = await asyncio.gather(*tasks, return_exceptions=True)
-        proxy_servers: list[ProxyServer] = []
-        for result in results:
-            if isinstance(result, ProxyServer):
-                proxy_servers.append(result)
-        return proxy_servers
-
-    async def check_proxy(self, proxy_address: ProxyAddress) -> ProxyServer:
+        return [
+            proxy_server
+            async for proxy_server in self.stream_check_proxies(
+                iterate(proxy_addresses)
+            )
+        ]
+
+    async def stream_check_proxies(
+        self, proxy_addresses: AsyncIterable[ProxyAddress]
+    ) -> AsyncIterator[ProxyServer]:
+        if self.health_store is not None:
+            proxy_addresses = self.health_store.filter_due(proxy_addresses)
+        if self.detector is not None:
+            # 先按 host:port 去重, 调度输出的每个地址都会有检测结果
+            proxy_addresses = self.detector.unique_endpoints(proxy_addresses)
+        if self.scheduler is not None:
+            proxy_addresses = self.scheduler.schedule(proxy_addresses)
+        if self.detector is not None:
+            # 协议识别已经连接过代理, 不再单独预筛选
+            proxy_addresses = chain(
+                worker_pool(proxy_addresses, self._detect_proxy, self.prescreen_workers)
+            )
+        elif self.prescreen:
+            proxy_addresses = worker_pool(
+                proxy_addresses, self._prescreen_proxy, self.prescreen_workers
+            )
+        async for proxy_server in worker_pool(
+            proxy_addresses, self._check_proxy_quietly, self.workers
+        ):
+            yield proxy_server
+        if self.detector is not None:
+            log.info(f"协议识别\t{self.detector.summary()}")
+        elif self.prescreen:
+            log.info(
+                f"预筛选\t{self.prescreen_stats}"
+                f"\t节省HTTP检测:{self.prescreen_stats.failed}"
+            )
+        log.info(f"检测\t{self.check_stats}")
+        if self.scheduler is not None:
+            log.info(f"子网调度\t{self.scheduler.summary()}")
+        if self.adaptive_timeout is not None:
+            log.info(f"自适应超时\t{self.adaptive_timeout.deadlines}")
+        if self.limiter is not None:
+            log.info(f"自适应并发\t最终上限:{self.limiter.limit}")
+            self.limiter.close()
+        if self.health_store is not None:
+            self.health_store.flush()
+
+    async def _prescreen_proxy(
+        self, proxy_address: ProxyAddress
+    ) -> ProxyAddress | None:
+        started: float = time.perf_counter()
+        ok: bool = await self.prescreen_proxy(proxy_address)
+        self.prescreen_stats.record(
+            ok, time.perf_counter() - started, None if ok else FailureReason.CONNECT
+        )
+        if not ok:
+            self._notify(proxy_address, None, None)
+        return proxy_address if ok else None
+
+    async def _detect_proxy(
+        self, proxy_address: ProxyAddress
+    ) -> list[ProxyAddress] | None:
+        started: float = time.perf_counter()
+        protocols: list[str] = await self.detector.detect(
+            proxy_address.host, proxy_address.port
+        )
+        self.detector.stats.record(
+            bool(protocols),
+            time.perf_counter() - started,
+            None if protocols else FailureReason.UNKNOWN_PROTOCOL,
+        )
+        self.detector.found.update(protocols)
+        if not protocols:
+            self._notify(proxy_address, None, None)
+            return None
+        return [
+            dataclasses.replace(proxy_address, scheme=protocol)
+            for protocol in protocols
+        ]
+
+    async def prescreen_proxy(self, proxy_address: ProxyAddress) -> bool:
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            await asyncio.wait_for(
+                loop.sock_connect(sock, (proxy_address.host, proxy_address.port)),
+                self.prescreen_timeout,
+            )
+            return True
+        except (OSError, TimeoutError):
+            return False
+        finally:
+            sock.close()
+
+    async def _check_proxy_quietly(
+        self, proxy_address: ProxyAddress
+    ) -> ProxyServer | None:
+        started: float = time.perf_counter()
+        result: CheckResult = await self.check_proxy(proxy_address)
+        elapsed: float = time.perf_counter() - started
+        self.check_stats.record(result.ok, elapsed, result.reason)
+        if self.limiter is not None:
+            self.limiter.record(
+                timeout=result.reason == FailureReason.TIMEOUT,
+                connect_error=result.reason == FailureReason.CONNECT,
+            )
+        self._notify(proxy_address, result.proxy_server, elapsed if result.ok else None)
+        return result.proxy_server
+
+    def _notify(
+        self,
+        proxy_address: ProxyAddress,
+        proxy_server: ProxyServer | None,
+        elapsed: float | None,
+    ) -> None:
+        for observer in self.observers:
+            observer(proxy_address, proxy_server, elapsed)
+
+    @staticmethod
+    def trace_config() -> aiohttp.TraceConfig:
+        # aiohttp 在建立连接时一并完成代理的 CONNECT 和 TLS 握手,
+        # 所以这里只能得到合计的连接耗时
+        async def on_dns_start(session, context, params) -> None:
+            context.dns_started = time.perf_counter()
+
+        async def on_dns_end(session, context, params) -> None:
+            timing: CheckTiming | None = context.trace_request_ctx
+            if isinstance(timing, CheckTiming):
+                timing.dns = timing.elapsed(context.dns_started)
+
+        async def on_connection_start(session, context, params) -> None:
+            context.connection_started = time.perf_counter()
+
+        async def on_connection_end(session, context, params) -> None:
+            timing: CheckTiming | None = context.trace_request_ctx
+            if isinstance(timing, CheckTiming):
+                timing.connect = timing.elapsed(context.connection_started)
+
+        async def on_request_end(session, context, params) -> None:
+            timing: CheckTiming | None = context.trace_request_ctx
+            if isinstance(timing, CheckTiming):
+                timing.first_byte = timing.elapsed()
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_dns_resolvehost_start.append(on_dns_start)
+        trace_config.on_dns_resolvehost_end.append(on_dns_end)
+        trace_config.on_connection_create_start.append(on_connection_start)
+        trace_config.on_connection_create_end.append(on_connection_end)
+        trace_config.on_request_end.append(on_request_end)
+        return trace_config
+
+    @property
+    def in_flight_limit(self) -> int:
+        limit: int = (
+            self.limiter.limit
+            if self.limiter is not None
+            else self.session.connector.limit if self.session.connector else 1
+        )
+        return min(self.workers, limit)
+
+    def current_deadlines(self) -> CheckDeadlines:
+        if self.adaptive_timeout is not None:
+            return self.adaptive_timeout.deadlines
+        return self.deadlines
+
+    def _client_timeout(self, deadlines: CheckDeadlines) -> aiohttp.ClientTimeout:
+        # 首字节超时不用 sock_read (两次读取的间隔), 在 _fetch_targets 中单独计时
+        client_timeout: aiohttp.ClientTimeout | None = self._client_timeouts.get(
+            deadlines
+        )
+        if client_timeout is None:
+            client_timeout = aiohttp.ClientTimeout(
+                total=deadlines.total,
+                sock_connect=deadlines.connect,
+            )
+            self._client_timeouts[deadlines] = client_timeout
+        return client_timeout
+
+    def _url(self, proxy_check_target: ProxyCheckTarget, scheme: str) -> str:
+        return f"{proxy_check_target.scheme or scheme}://{proxy_check_target.website}"
+
+    async def _fetch_targets(
+        self,
+        proxy_address: ProxyAddress,
+        timing: CheckTiming,
+        deadlines: CheckDeadlines,
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        # 同一代理的连接由 aiohttp 的连接池复用, 响应需要读完才会放回连接池
+        proxy: str = str(proxy_address)
+        if self.detector is not None:
+            # 识别出的 https 表示支持 CONNECT 的 HTTP 代理
+            proxy = f"http://{proxy_address.host}:{proxy_address.port}"
+        for index, proxy_check_target in enumerate(self.check_targets):
+            # 首字节超时和 raw 引擎一样, 从发起请求 (含连接代理) 到收到响应头
+            async with asyncio.timeout(deadlines.first_byte):
+                response: aiohttp.ClientResponse = await self.session.get(
+                    self._url(proxy_check_target, proxy_address.scheme),
+                    headers=self.headers,
+                    timeout=self._client_timeout(deadlines),
+                    proxy=proxy,
+                    trace_request_ctx=timing if index == 0 else None,
+                )
+            async with response:
+                yield response
+
+    async def _check_targets(
+        self,
+        proxy_address: ProxyAddress,
+        timing: CheckTiming,
+        responses: AsyncIterator[aiohttp.ClientResponse | RawResponse],
+    ) -> ProxyServer | FailureReason:
+        # 主目标决定检测结果, 其余目标遇到第一个失败就停止, 只影响 capabilities
+        proxy_server: ProxyServer | None = None
+        index: int = 0
+        try:
+            async for response in responses:
+                checked: ProxyServer | FailureReason = await self.check_targets[
+                    index
+                ].check(response, proxy_address)
+                if proxy_server is None:
+                    if isinstance(checked, FailureReason):
+                        return checked
+                    proxy_server = checked
+                    timing.total = timing.elapsed()
+                elif isinstance(checked, FailureReason):
+                    break
+                proxy_server.capabilities |= 1 << self.target_bits[index]
+                index += 1
+        except Exception:
+            if proxy_server is None:
+                raise
+        if proxy_server is None:
+            raise ProxyError("没有响应")
+        return proxy_server
+
+    async def _check_once(
+        self, proxy_address: ProxyAddress, timing: CheckTiming
+    ) -> ProxyServer | FailureReason:
+        deadlines: CheckDeadlines = self.current_deadlines()
+        responses: AsyncIterator[aiohttp.ClientResponse | RawResponse]
+        if self.engine == "raw" or proxy_address.scheme in SOCKS_SCHEMES:
+            responses = self.raw_check_engine.fetch_targets(
+                proxy_address, self.check_targets, timing, deadlines
+            )
+        else:
+            responses = self._fetch_targets(proxy_address, timing, deadlines)
+        async with aclosing(responses):
+            return await self._check_targets(proxy_address, timing, responses)
+
+    @staticmethod
+    def _apply_timing(
+        proxy_server: ProxyServer, timing: CheckTiming, retry_count: int
+    ) -> ProxyServer:
+        proxy_server.response_time = round(timing.total or timing.elapsed())
+        proxy_server.retry_count = retry_count
+        proxy_server.dns_time = timing.dns
+        proxy_server.connect_time = timing.connect
+        proxy_server.tunnel_time = timing.tunnel
+        proxy_server.tls_time = timing.tls
+        proxy_server.first_byte_time = timing.first_byte
+        proxy_server.checked_at = time.time()
+        return proxy_server
+
+    def _failure(
+        self,
+        proxy_address: ProxyAddress,
+        reason: FailureReason,
+        error: Exception | None = None,
+    ) -> CheckResult:
+        result: CheckResult = CheckResult(proxy_address, reason=reason)
+        # 完整的异常只按比例采样记录, 其余失败只计数
+        if self.debug_sample and random.random() < self.debug_sample:
+            result.detail = reason.message
+            if error is not None:
+                result.detail += f"\t{error.__class__}\t{error}"
+            log.warning(
+                f"{result.detail}\tproxy_address:{proxy_address}", exc_info=error
+            )
+        return result
+
+    async def check_proxy(self, proxy_address: ProxyAddress) -> CheckResult:
         async with self.semaphore:
-            while True:
-                url: str = ""
-                if self.proxy_check_target.scheme == None:
-                    url = f"{proxy_address.scheme}://{self.proxy_check_target.website}"
-                else:
-                    url = f"{self.proxy_check_target.scheme}://{self.proxy_check_target.website}"
-                try:
-                    try:
-                        async with self.session.get(
-                            url,
-                            headers=self.headers,
-                            timeout=self.client_timeout,
-                            proxy=str(proxy_address),
-                        ) as response:
-                            proxy_server: ProxyServer = (
-                                await self.proxy_check_target.check(
-                                    response, proxy_address
-                                )
-                            )
-                            return proxy_server
-                    except SSLError as e:
-                        if proxy_address.scheme == "https":
-                            log.warning(f"使用http重试\tproxy_address:{proxy_address}")
-                            proxy_address.scheme = "http"
-                            continue
-                        else:
-                            raise
-                except Exception as e:
-                    err_msg: str = str(e)
-                    if isinstance(e, TimeoutError):
-                        err_msg = f"访问超时"
-                    elif isinstance(e, aiohttp.ClientOSError):
-                        err_msg = f"连接失败"
-                    elif len(str(e)) == 0:
-                        err_msg = f"未知错误"
-                    elif isinstance(e, aiohttp.ClientError):
-                        err_msg = f"无效的代理"
-                    else:
-                        err_msg = f"{e}"
-                    try:
-                        error = type(e)(
-                            f"{err_msg}\t{e.__class__}\tproxy_address:{proxy_address}"
-                        )
-                    except:
-                        error = Exception(
-                            f"{err_msg}\t{e.__class__}\tproxy_address:{proxy_address}"
-                        )
-                    log.warning(error)
-                    raise error from e
+            self.started += 1
+            self.in_flight += 1
+            # 拿到并发许可后才开始计时, 不含排队等待
+            started: float = time.perf_counter()
+            try:
+                return await self._check_with_retry(proxy_address)
+            finally:
+                self.in_flight -= 1
+                self.check_duration.observe(time.perf_counter() - started)
+
+    async def _check_with_retry(self, proxy_address: ProxyAddress) -> CheckResult:
+        retry_count: int = 0
+        started: float = time.perf_counter()
+        while True:
+            timing: CheckTiming = CheckTiming()
+            try:
+                checked: ProxyServer | FailureReason = await self._check_once(
+                    proxy_address, timing
+                )
+            except Exception as e:
+                reason: FailureReason = FailureReason.from_exception(e)
+                # 识别过协议时不再猜测
+                if (
+                    reason == FailureReason.SSL
+                    and proxy_address.scheme == "https"
+                    and self.detector is None
+                ):
+                    log.warning(f"使用http重试\tproxy_address:{proxy_address}")
+                    proxy_address = dataclasses.replace(proxy_address, scheme="http")
+                    retry_count += 1
+                    continue
+                return self._failure(proxy_address, reason, e)
+            if isinstance(checked, FailureReason):
+                return self._failure(proxy_address, checked)
+            # 总耗时只算到主目标通过, 重试时包含之前失败的尝试
+            timing.total += (timing.started - started) * 1000
+            return CheckResult(
+                proxy_address, self._apply_timing(checked, timing, retry_count)
+            )
@@ -0,0 +1,151 @@
+import logging
+import sqlite3
+import time
+from typing import AsyncIterable, AsyncIterator
+
+from ..models.proxy_address import ProxyAddress
+from ..models.proxy_health import ProxyHealth
+from ..models.proxy_server import ProxyServer
+
+log = logging.getLogger("app")
+
+
+class ProxyHealthStore:
+    def __init__(
+        self,
+        path: str,
+        good_interval: float = 600,
+        fail_interval: float = 1800,
+        max_interval: float = 7 * 24 * 3600,
+        flush_size: int = 1000,
+        by_endpoint: bool = False,
+    ) -> None:
+        self.path = path
+        self.good_interval = good_interval
+        self.fail_interval = fail_interval
+        self.max_interval = max_interval
+        self.flush_size = flush_size
+        # 识别协议时检测结果记在识别出的协议下, 和代理源给出的协议不一定相同,
+        # 这时按 host:port 记录, scheme 存为空字符串
+        self.by_endpoint = by_endpoint
+        self.opened_at: float = time.time()
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS proxy_health ("
+            "scheme TEXT NOT NULL, host TEXT NOT NULL, port INTEGER NOT NULL, "
+            "last_check REAL NOT NULL, ok INTEGER NOT NULL, latency REAL, "
+            "consecutive_failures INTEGER NOT NULL, next_check REAL NOT NULL, "
+            "PRIMARY KEY (scheme, host, port))"
+        )
+        self.records: dict[ProxyAddress, ProxyHealth] = {}
+        for row in self.connection.execute(
+            "SELECT scheme, host, port, last_check, ok, latency, "
+            "consecutive_failures, next_check FROM proxy_health"
+        ):
+            self.records[ProxyAddress(scheme=row[0], host=row[1], port=row[2])] = (
+                ProxyHealth(
+                    last_check=row[3],
+                    ok=bool(row[4]),
+                    latency=row[5],
+                    consecutive_failures=row[6],
+                    next_check=row[7],
+                )
+            )
+        self.pending: set[ProxyAddress] = set()
+
+    def _key(self, proxy_address: ProxyAddress) -> ProxyAddress:
+        if self.by_endpoint:
+            return ProxyAddress(
+                scheme="", host=proxy_address.host, port=proxy_address.port
+            )
+        return proxy_address
+
+    def get(self, proxy_address: ProxyAddress) -> ProxyHealth | None:
+        return self.records.get(self._key(proxy_address))
+
+    def is_due(self, proxy_address: ProxyAddress, now: float | None = None) -> bool:
+        proxy_health: ProxyHealth | None = self.records.get(self._key(proxy_address))
+        if proxy_health is None:
+            return True
+        return proxy_health.next_check <= (time.time() if now is None else now)
+
+    def record(
+        self, proxy_address: ProxyAddress, ok: bool, latency: float | None = None
+    ) -> ProxyHealth:
+        now: float = time.time()
+        proxy_address = self._key(proxy_address)
+        previous: ProxyHealth | None = self.records.get(proxy_address)
+        if (
+            self.by_endpoint
+            and previous is not None
+            and previous.last_check >= self.opened_at
+            and (previous.ok or not ok)
+        ):
+            # 同一端点的多个协议: 本次运行中有一个成功就算成功, 失败不重复计数
+            return previous
+        failures: int = 0
+        interval: float = self.good_interval
+        if not ok:
+            failures = previous.consecutive_failures + 1 if previous else 1
+            interval = min(self.fail_interval * 2 ** (failures - 1), self.max_interval)
+        proxy_health: ProxyHealth = ProxyHealth(
+            last_check=now,
+            ok=ok,
+            latency=latency,
+            consecutive_failures=failures,
+            next_check=now + interval,
+        )
+        self.records[proxy_address] = proxy_health
+        self.pending.add(proxy_address)
+        if len(self.pending) >= self.flush_size:
+            self.flush()
+        return proxy_health
+
+    def observe(
+        self,
+        proxy_address: ProxyAddress,
+        proxy_server: ProxyServer | None,
+        elapsed: float | None,
+    ) -> None:
+        self.record(proxy_address, proxy_server is not None, elapsed)
+
+    async def filter_due(
+        self, proxy_addresses: AsyncIterable[ProxyAddress]
+    ) -> AsyncIterator[ProxyAddress]:
+        skipped: int = 0
+        now: float = time.time()
+        async for proxy_address in proxy_addresses:
+            if self.is_due(proxy_address, now):
+                yield proxy_address
+            else:
+                skipped += 1
+        log.info(f"未到检测时间跳过数量:{skipped}")
+
+    def flush(self) -> None:
+        if not self.pending:
+            return
+        rows: list[tuple] = []
+        for proxy_address in self.pending:
+            proxy_health: ProxyHealth = self.records[proxy_address]
+            rows.append(
+                (
+                    proxy_address.scheme,
+                    proxy_address.host,
+                    proxy_address.port,
+                    proxy_health.last_check,
+                    int(proxy_health.ok),
+                    proxy_health.latency,
+                    proxy_health.consecutive_failures,
+                    proxy_health.next_check,
+                )
+            )
+        self.connection.executemany(
+            "INSERT OR REPLACE INTO proxy_health VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self.connection.commit()
+        self.pending.clear()
+
+    def close(self) -> None:
+        self.flush()
+        self.connection.close()
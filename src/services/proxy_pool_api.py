@@ -0,0 +1,98 @@
+import logging
+
+from aiohttp import web
+
+from .check_metrics import CheckMetrics
+from .proxy_pool_index import ProxyPoolIndex
+from ..models.proxy_address import ProxyAddress
+from ..models.proxy_server import ProxyServer
+
+log = logging.getLogger("app")
+
+
+# 本地查询接口:
+# GET /proxies?scheme=https&limit=10&max_age=300&max_latency=1000&format=text
+# GET /stats
+# GET /metrics  (Prometheus 文本格式, 需要传入 metrics)
+class ProxyPoolApi:
+    def __init__(
+        self,
+        proxy_pool_index: ProxyPoolIndex,
+        host: str = "127.0.0.1",
+        port: int = 8899,
+        max_limit: int = 1000,
+        metrics: CheckMetrics | None = None,
+    ) -> None:
+        self.proxy_pool_index = proxy_pool_index
+        self.host = host
+        self.port = port
+        self.max_limit = max_limit
+        self.metrics = metrics
+        self._runner: web.AppRunner | None = None
+
+    @staticmethod
+    def _number(request: web.Request, name: str) -> float | None:
+        value: str | None = request.query.get(name)
+        if value is None or value == "":
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            raise web.HTTPBadRequest(text=f"无效的参数\t{name}:{value}")
+
+    @staticmethod
+    def _to_json(proxy_server: ProxyServer) -> dict:
+        return {
+            "proxy": ProxyAddress.__str__(proxy_server),
+            "scheme": proxy_server.scheme,
+            "host": proxy_server.host,
+            "port": proxy_server.port,
+            "response_time": proxy_server.response_time,
+            "checked_at": proxy_server.checked_at,
+            "capabilities": proxy_server.capabilities,
+            "source": proxy_server.source,
+        }
+
+    async def proxies(self, request: web.Request) -> web.Response:
+        limit: float = self._number(request, "limit") or 10
+        proxy_servers: list[ProxyServer] = self.proxy_pool_index.query(
+            scheme=request.query.get("scheme", "http"),
+            limit=max(1, min(int(limit), self.max_limit)),
+            max_age=self._number(request, "max_age"),
+            max_latency=self._number(request, "max_latency"),
+        )
+        if request.query.get("format") == "text":
+            return web.Response(
+                text="".join(
+                    ProxyAddress.__str__(server) + "\n" for server in proxy_servers
+                )
+            )
+        return web.json_response([self._to_json(server) for server in proxy_servers])
+
+    async def stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"size": len(self.proxy_pool_index)})
+
+    async def render_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(
+            text=self.metrics.render(), content_type="text/plain", charset="utf-8"
+        )
+
+    def app(self) -> web.Application:
+        app: web.Application = web.Application()
+        app.router.add_get("/proxies", self.proxies)
+        app.router.add_get("/stats", self.stats)
+        if self.metrics is not None:
+            app.router.add_get("/metrics", self.render_metrics)
+        return app
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site: web.TCPSite = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        log.info(f"代理池接口\thttp://{self.host}:{self.port}/proxies")
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
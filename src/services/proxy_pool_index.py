@@ -0,0 +1,183 @@
+import heapq
+import itertools
+import logging
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from typing import Iterator
+
+from ..models.proxy_address import ProxyAddress
+from ..models.proxy_server import ProxyServer
+
+log = logging.getLogger("app")
+
+
+# 一个时间桶内按延迟排序的只读数据
+@dataclass(frozen=True, slots=True)
+class _Bucket:
+    latencies: array
+    servers: tuple[ProxyServer, ...]
+    oldest: float
+
+    def fresh(self, cutoff: float, max_latency: float | None) -> Iterator[ProxyServer]:
+        servers: Iterator[ProxyServer] = iter(self.servers)
+        if max_latency is not None:
+            servers = itertools.islice(
+                servers, bisect_right(self.latencies, max_latency)
+            )
+        if self.oldest >= cutoff:
+            return servers
+        return (server for server in servers if server.checked_at >= cutoff)
+
+
+# 只读快照: scheme -> 按时间桶编号排序的 (编号, 桶)
+@dataclass(frozen=True, slots=True)
+class _Snapshot:
+    ids: dict[str, array]
+    buckets: dict[str, tuple[_Bucket, ...]]
+    size: int
+    published_at: float
+
+
+# 检测结果按 scheme 和验证时间分桶, 桶内按延迟排序.
+# 写入只改动可变的工作区, 定期把改过的桶重新排序后整体替换快照,
+# 读取只访问当时的快照, 不会和检测互相等待
+class ProxyPoolIndex:
+    def __init__(
+        self,
+        bucket_width: float = 60,
+        retention: float = 3600,
+        publish_interval: float = 0.5,
+    ) -> None:
+        self.bucket_width = bucket_width
+        self.retention = retention
+        self.publish_interval = publish_interval
+        # (scheme, 桶编号) -> {(host, port): ProxyServer}
+        self._working: dict[tuple[str, int], dict[tuple[str, int], ProxyServer]] = {}
+        self._locations: dict[tuple[str, str, int], int] = {}
+        self._dirty: set[tuple[str, int]] = set()
+        self._built: dict[tuple[str, int], _Bucket] = {}
+        self._snapshot: _Snapshot = _Snapshot({}, {}, 0, time.monotonic())
+
+    def _bucket_id(self, checked_at: float) -> int:
+        return int(checked_at // self.bucket_width)
+
+    def _remove(self, key: tuple[str, str, int]) -> None:
+        bucket_id: int | None = self._locations.pop(key, None)
+        if bucket_id is None:
+            return
+        location: tuple[str, int] = (key[0], bucket_id)
+        del self._working[location][key[1:]]
+        self._dirty.add(location)
+
+    def add(self, proxy_server: ProxyServer) -> None:
+        if proxy_server.response_time is None:
+            return
+        if proxy_server.checked_at is None:
+            proxy_server.checked_at = time.time()
+        key: tuple[str, str, int] = (
+            proxy_server.scheme,
+            proxy_server.host,
+            proxy_server.port,
+        )
+        self._remove(key)
+        bucket_id: int = self._bucket_id(proxy_server.checked_at)
+        location: tuple[str, int] = (proxy_server.scheme, bucket_id)
+        self._working.setdefault(location, {})[key[1:]] = proxy_server
+        self._locations[key] = bucket_id
+        self._dirty.add(location)
+
+    def discard(self, proxy_address: ProxyAddress) -> None:
+        self._remove((proxy_address.scheme, proxy_address.host, proxy_address.port))
+
+    def observe(
+        self,
+        proxy_address: ProxyAddress,
+        proxy_server: ProxyServer | None,
+        elapsed: float | None,
+    ) -> None:
+        if proxy_server is None:
+            self.discard(proxy_address)
+        else:
+            # https 重试成 http 时, 原来的 https 记录已经不可用
+            if proxy_server.scheme != proxy_address.scheme:
+                self.discard(proxy_address)
+            self.add(proxy_server)
+        if time.monotonic() - self._snapshot.published_at >= self.publish_interval:
+            self.publish()
+
+    def _expire(self) -> None:
+        oldest: int = self._bucket_id(time.time() - self.retention)
+        for location in [loc for loc in self._working if loc[1] < oldest]:
+            for host, port in self._working.pop(location):
+                del self._locations[(location[0], host, port)]
+            self._dirty.add(location)
+
+    def publish(self) -> None:
+        self._expire()
+        for location in self._dirty:
+            servers: dict[tuple[str, int], ProxyServer] | None = self._working.get(
+                location
+            )
+            if not servers:
+                self._working.pop(location, None)
+                self._built.pop(location, None)
+                continue
+            ordered: list[ProxyServer] = sorted(
+                servers.values(), key=lambda server: server.response_time
+            )
+            self._built[location] = _Bucket(
+                latencies=array("d", (server.response_time for server in ordered)),
+                servers=tuple(ordered),
+                oldest=min(server.checked_at for server in ordered),
+            )
+        self._dirty.clear()
+        ids: dict[str, list[int]] = {}
+        for scheme, bucket_id in sorted(self._built):
+            ids.setdefault(scheme, []).append(bucket_id)
+        # 只替换引用, 正在读旧快照的请求不受影响
+        self._snapshot = _Snapshot(
+            ids={scheme: array("q", values) for scheme, values in ids.items()},
+            buckets={
+                scheme: tuple(self._built[(scheme, i)] for i in values)
+                for scheme, values in ids.items()
+            },
+            size=len(self._locations),
+            published_at=time.monotonic(),
+        )
+
+    def snapshot(self) -> _Snapshot:
+        if self._dirty and (
+            time.monotonic() - self._snapshot.published_at >= self.publish_interval
+        ):
+            self.publish()
+        return self._snapshot
+
+    def query(
+        self,
+        scheme: str,
+        limit: int = 10,
+        max_age: float | None = None,
+        max_latency: float | None = None,
+    ) -> list[ProxyServer]:
+        snapshot: _Snapshot = self.snapshot()
+        ids: array | None = snapshot.ids.get(scheme)
+        if not ids:
+            return []
+        cutoff: float = time.time() - max_age if max_age is not None else 0.0
+        buckets: tuple[_Bucket, ...] = snapshot.buckets[scheme]
+        # 跳过整个过期的桶, 再按延迟归并剩下的桶
+        start: int = bisect_left(ids, self._bucket_id(cutoff))
+        iterators: list[Iterator[ProxyServer]] = [
+            bucket.fresh(cutoff, max_latency) for bucket in buckets[start:]
+        ]
+        return list(
+            itertools.islice(
+                heapq.merge(*iterators, key=lambda server: server.response_time),
+                limit,
+            )
+        )
+
+    def __len__(self) -> int:
+        return self.snapshot().size
@@ -0,0 +1,76 @@
+import hashlib
+import json
+import os
+
+from ..models.cached_source import CachedSource
+from ..models.proxy_address import ProxyAddress
+
+
+class ProxySourceCache:
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url: str) -> str:
+        return os.path.join(
+            self.directory, f"{hashlib.sha1(url.encode()).hexdigest()}.json"
+        )
+
+    def load(self, url: str) -> CachedSource | None:
+        try:
+            with open(self._path(url), encoding="utf-8") as file:
+                data: dict = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        return CachedSource(
+            url=url,
+            etag=data.get("etag"),
+            last_modified=data.get("last_modified"),
+            proxy_addresses={
+                ProxyAddress(scheme=scheme, host=host, port=port)
+                for scheme, host, port in data.get("proxy_addresses", [])
+            },
+        )
+
+    def save(self, cached_source: CachedSource) -> None:
+        path: str = self._path(cached_source.url)
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "url": cached_source.url,
+                    "etag": cached_source.etag,
+                    "last_modified": cached_source.last_modified,
+                    "proxy_addresses": [
+                        [proxy_address.scheme, proxy_address.host, proxy_address.port]
+                        for proxy_address in cached_source.proxy_addresses
+                    ],
+                },
+                file,
+            )
+        os.replace(f"{path}.tmp", path)
+
+    def load_mirror_latency(self) -> dict[str, list[float]]:
+        try:
+            with open(
+                os.path.join(self.directory, "mirrors.json"), encoding="utf-8"
+            ) as file:
+                return json.load(file)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def save_mirror_latency(self, mirror_latency: dict[str, list[float]]) -> None:
+        path: str = os.path.join(self.directory, "mirrors.json")
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(mirror_latency, file)
+        os.replace(f"{path}.tmp", path)
+
+    @staticmethod
+    def conditional_headers(cached_source: CachedSource | None) -> dict:
+        headers: dict = {}
+        if cached_source is None:
+            return headers
+        if cached_source.etag is not None:
+            headers["If-None-Match"] = cached_source.etag
+        if cached_source.last_modified is not None:
+            headers["If-Modified-Since"] = cached_source.last_modified
+        return headers
@@ -1,10 +1,22 @@
 import asyncio
 import logging
+import time
+from typing import AsyncIterable, AsyncIterator
 
 import aiohttp
 
+from .proxy_source_cache import ProxySourceCache
+from ..errors.error import FailedError
+from ..models.cached_source import CachedSource
+from ..models.failure_reason import FailureReason
 from ..models.proxy_address import ProxyAddress
+from ..models.proxy_address_set import ProxyAddressSet
 from ..models.proxy_source import ProxySource
+from ..models.source_delta import SourceDelta
+from ..models.source_yield import SourceYield
+from ..models.stage_stats import StageStats
+from ..utils.stats import LatencyWindow
+from ..utils.stream import merge
 
 log = logging.getLogger("app")
 
@@ -15,49 +27,221 @@ class ProxySourceService:
         session: aiohttp.ClientSession,
         client_timeout: aiohttp.ClientTimeout,
         headers: dict,
+        source_cache: ProxySourceCache | None = None,
+        only_new: bool = False,
+        hedge_percentile: float = 90,
+        hedge_delay: float = 1,
     ) -> None:
         self.session = session
         self.client_timeout = client_timeout
         self.headers = headers
+        self.source_cache = source_cache
+        self.only_new = only_new
+        self.deltas: dict[str, SourceDelta] = {}
+        self.source_stats = StageStats(name="source")
+        self.source_yield: dict[str, SourceYield] = {}
+        self.hedge_percentile = hedge_percentile
+        self.hedge_delay = hedge_delay
+        self.mirror_latency: dict[str, LatencyWindow] = {}
+        if self.source_cache is not None:
+            for mirror, samples in self.source_cache.load_mirror_latency().items():
+                self.mirror_latency[mirror] = LatencyWindow(samples=samples)
 
     async def fetch_all_sources(self, sources: list[ProxySource]) -> list[ProxyAddress]:
-        tasks: list[asyncio.Task] = []
-        for source in sources:
-            tasks.append(asyncio.create_task(self.fetch_source(source)))
-        results: list[object] = await asyncio.gather(*tasks, return_exceptions=True)
-        proxy_addresses: list[ProxyAddress] = []
-        for result in results:
-            if isinstance(result, list):
-                proxy_addresses.extend(result)
-        proxy_addresses = list(set(proxy_addresses))
-        return proxy_addresses
+        return [
+            proxy_address async for proxy_address in self.stream_all_sources(sources)
+        ]
 
     async def fetch_source(self, proxy_source: ProxySource) -> list[ProxyAddress]:
+        return [
+            proxy_address async for proxy_address in self.stream_source(proxy_source)
+        ]
+
+    async def stream_all_sources(
+        self, sources: list[ProxySource]
+    ) -> AsyncIterator[ProxyAddress]:
+        seen: ProxyAddressSet = ProxyAddressSet()
+        async for proxy_address in merge(
+            [self._stream_source_quietly(source) for source in sources]
+        ):
+            if seen.add(proxy_address):
+                source_yield: SourceYield | None = self.source_yield.get(
+                    proxy_address.source
+                )
+                if source_yield is not None:
+                    source_yield.unique += 1
+                yield proxy_address
+        log.info(f"代理源\t{self.source_stats}")
+        if self.source_cache is not None:
+            self.source_cache.save_mirror_latency(
+                {
+                    mirror: list(window.samples)
+                    for mirror, window in self.mirror_latency.items()
+                }
+            )
+
+    async def _stream_source_quietly(
+        self, proxy_source: ProxySource
+    ) -> AsyncIterator[ProxyAddress]:
+        started: float = time.perf_counter()
+        source_yield: SourceYield = self.source_yield.setdefault(
+            proxy_source.url, SourceYield(url=proxy_source.url)
+        )
+        try:
+            async for proxy_address in self.stream_source(proxy_source):
+                if proxy_address.source is None:
+                    proxy_address.source = proxy_source.url
+                source_yield.contributed += 1
+                yield proxy_address
+        except Exception as e:
+            reason: FailureReason = FailureReason.from_exception(e)
+            self.source_stats.record(False, time.perf_counter() - started, reason)
+            log.warning(
+                f"{reason.message}\t{e.__class__}\t{e}\tproxy_source:{proxy_source}"
+            )
+            return
+        self.source_stats.record(True, time.perf_counter() - started)
+
+    async def _parse(
+        self, response: aiohttp.ClientResponse, proxy_source: ProxySource
+    ) -> AsyncIterator[ProxyAddress]:
+        parsed = proxy_source.parse(response, proxy_source)
+        if isinstance(parsed, AsyncIterable):
+            async for proxy_address in parsed:
+                yield proxy_address
+        else:
+            for proxy_address in await parsed:
+                yield proxy_address
+
+    def _mirror_order(self, proxy_source: ProxySource) -> list[str]:
+        def expected(mirror: str) -> float:
+            window: LatencyWindow | None = self.mirror_latency.get(mirror)
+            median: float | None = window.percentile(50) if window else None
+            return self.hedge_delay if median is None else median
+
+        return sorted(proxy_source.mirrors, key=expected)
+
+    def _next_hedge_delay(self, mirror: str) -> float:
+        window: LatencyWindow | None = self.mirror_latency.get(mirror)
+        delay: float | None = (
+            window.percentile(self.hedge_percentile) if window else None
+        )
+        return max(0.1, self.hedge_delay if delay is None else delay)
+
+    async def _get(
+        self, proxy_source: ProxySource, mirror: str, headers: dict
+    ) -> aiohttp.ClientResponse:
+        window: LatencyWindow = self.mirror_latency.setdefault(mirror, LatencyWindow())
+        started: float = time.perf_counter()
         try:
-            async with self.session.get(
-                proxy_source.url,
-                headers=self.headers,
+            response: aiohttp.ClientResponse = await self.session.get(
+                proxy_source.mirror_url(mirror),
+                headers=headers,
                 timeout=self.client_timeout,
-            ) as response:
-                proxy_addresses: list[ProxyAddress] = await proxy_source.parse(
-                    response, proxy_source
+            )
+        except asyncio.CancelledError:
+            # 输掉对冲被取消, 记下已等待的时间作为下限, 否则一直慢的镜像没有样本
+            window.add(time.perf_counter() - started)
+            raise
+        except Exception:
+            window.add(self.client_timeout.total or self.hedge_delay * 5)
+            raise
+        if not response.ok and response.status != 304:
+            response.release()
+            window.add(self.client_timeout.total or self.hedge_delay * 5)
+            raise FailedError(
+                f"状态码无效\tstatus:{response.status}"
+                f"\turl:{proxy_source.mirror_url(mirror)}"
+            )
+        window.add(time.perf_counter() - started)
+        return response
+
+    async def _hedged_get(
+        self, proxy_source: ProxySource, headers: dict
+    ) -> aiohttp.ClientResponse:
+        mirrors: list[str] = self._mirror_order(proxy_source)
+        pending: set[asyncio.Task] = set()
+        winner: aiohttp.ClientResponse | None = None
+        error: BaseException | None = None
+        delay: float = 0
+        try:
+            while winner is None and (mirrors or pending):
+                if mirrors:
+                    mirror: str = mirrors.pop(0)
+                    delay = self._next_hedge_delay(mirror)
+                    pending.add(
+                        asyncio.create_task(self._get(proxy_source, mirror, headers))
+                    )
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=delay if mirrors else None,
+                    return_when=asyncio.FIRST_COMPLETED,
                 )
-                return proxy_addresses
-        except Exception as e:
-            err_msg: str = str(e)
-            if isinstance(e, TimeoutError):
-                err_msg = f"访问超时"
-            elif len(str(e)) == 0:
-                err_msg = f"未知错误"
-            else:
-                err_msg = f"{e}"
-            try:
-                error = type(e)(
-                    f"{err_msg}\t{e.__class__}\tproxy_source:{proxy_source}"
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif winner is None:
+                        winner = task.result()
+                    else:
+                        task.result().release()
+        finally:
+            for task in pending:
+                task.cancel()
+            for result in await asyncio.gather(*pending, return_exceptions=True):
+                if isinstance(result, aiohttp.ClientResponse):
+                    result.release()
+        if winner is None:
+            raise error or FailedError("没有可用的镜像")
+        return winner
+
+    async def stream_source(
+        self, proxy_source: ProxySource
+    ) -> AsyncIterator[ProxyAddress]:
+        cached_source: CachedSource | None = None
+        if self.source_cache is not None:
+            cached_source = self.source_cache.load(proxy_source.url)
+        async with await self._hedged_get(
+            proxy_source,
+            {
+                **self.headers,
+                **ProxySourceCache.conditional_headers(cached_source),
+            },
+        ) as response:
+            if response.status == 304 and cached_source is not None:
+                self.deltas[proxy_source.url] = SourceDelta(
+                    url=proxy_source.url, not_modified=True
                 )
-            except:
-                error = Exception(
-                    f"{err_msg}\t{e.__class__}\tproxy_source:{proxy_source}"
+                log.info(f"未修改,使用缓存\t{proxy_source}")
+                if not self.only_new:
+                    for proxy_address in cached_source.proxy_addresses:
+                        yield proxy_address
+                return
+            if self.source_cache is None:
+                async for proxy_address in self._parse(response, proxy_source):
+                    yield proxy_address
+                return
+            previous: set[ProxyAddress] = (
+                cached_source.proxy_addresses if cached_source else set()
+            )
+            current: set[ProxyAddress] = set()
+            async for proxy_address in self._parse(response, proxy_source):
+                if proxy_address in current:
+                    continue
+                current.add(proxy_address)
+                if not self.only_new or proxy_address not in previous:
+                    yield proxy_address
+            delta: SourceDelta = SourceDelta(
+                url=proxy_source.url,
+                added=list(current - previous),
+                removed=list(previous - current),
+            )
+            self.deltas[proxy_source.url] = delta
+            log.info(f"代理源变化\t{delta}")
+            self.source_cache.save(
+                CachedSource(
+                    url=proxy_source.url,
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified"),
+                    proxy_addresses=current,
                 )
-            log.warning(error)
-            raise error from e
+            )
@@ -0,0 +1,290 @@
+import asyncio
+import ssl
+from contextlib import aclosing
+from dataclasses import dataclass
+from typing import AsyncIterator, Sequence
+from urllib.parse import urlsplit
+
+from multidict import CIMultiDict
+
+from ..errors.error import ProxyError
+from ..models.check_rule import CheckMatcher
+from ..models.check_deadlines import CheckDeadlines
+from ..models.check_timing import CheckTiming
+from ..models.proxy_address import ProxyAddress
+from ..models.proxy_check_target import ProxyCheckTarget
+from ..models.raw_response import RawResponse
+from ..utils.socks import SOCKS_SCHEMES, socks_connect
+
+
+def _keep_alive(version: str, headers: CIMultiDict) -> bool:
+    # HTTP/1.0 默认不保持连接
+    connection: str = headers.get("Connection", "").lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+@dataclass(slots=True)
+class _Request:
+    host: str
+    port: int
+    connect: bytes | None
+    request: bytes
+    # 隧道建立后直接发给目标的请求
+    direct: bytes
+
+
+class RawCheckEngine:
+    def __init__(
+        self,
+        proxy_check_target: ProxyCheckTarget,
+        headers: dict,
+        timeout: float,
+        max_body: int = 64 * 1024,
+        ssl_context: ssl.SSLContext | None = None,
+    ) -> None:
+        self.proxy_check_target = proxy_check_target
+        self.headers = headers
+        self.timeout = timeout
+        self.max_body = max_body
+        if ssl_context is None:
+            ssl_context = ssl.create_default_context()
+            ssl_context.check_hostname = False
+            ssl_context.verify_mode = ssl.CERT_NONE
+        self.ssl_context = ssl_context
+        self._requests: dict[tuple[str, str, bool], _Request] = {}
+
+    def _request(
+        self, scheme: str, proxy_check_target: ProxyCheckTarget, keep_alive: bool
+    ) -> _Request:
+        # 每种请求只编码一次
+        key: tuple[str, str, bool] = (scheme, proxy_check_target.website, keep_alive)
+        request: _Request | None = self._requests.get(key)
+        if request is not None:
+            return request
+        url = urlsplit(f"{scheme}://{proxy_check_target.website}")
+        host: str = url.hostname or ""
+        port: int = url.port or (443 if scheme == "https" else 80)
+        path: str = url.path or "/"
+        if url.query:
+            path += f"?{url.query}"
+        authority: str = url.netloc
+        header_lines: str = "".join(
+            f"{key}: {value}\r\n" for key, value in self.headers.items()
+        )
+        connection: str = "keep-alive" if keep_alive else "close"
+        direct: bytes = (
+            f"GET {path} HTTP/1.1\r\nHost: {authority}\r\n{header_lines}"
+            f"Connection: {connection}\r\n\r\n".encode()
+        )
+        if scheme == "https":
+            request = _Request(
+                host,
+                port,
+                f"CONNECT {host}:{port} HTTP/1.1\r\nHost: {host}:{port}\r\n\r\n".encode(),
+                direct,
+                direct,
+            )
+        else:
+            request = _Request(
+                host,
+                port,
+                None,
+                f"GET {scheme}://{authority}{path} HTTP/1.1\r\nHost: {authority}\r\n"
+                f"{header_lines}Connection: {connection}\r\n\r\n".encode(),
+                direct,
+            )
+        self._requests[key] = request
+        return request
+
+    @staticmethod
+    async def _read_head(
+        reader: asyncio.StreamReader,
+    ) -> tuple[str, int, str, CIMultiDict]:
+        try:
+            head: bytes = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as e:
+            raise ProxyError(f"连接被关闭\tpartial:{e.partial[:64]!r}")
+        lines: list[str] = head.decode("latin-1").split("\r\n")
+        parts: list[str] = lines[0].split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+            raise ProxyError(f"无效的状态行\tline:{lines[0][:64]}")
+        headers: CIMultiDict = CIMultiDict()
+        for line in lines[1:]:
+            key, sep, value = line.partition(":")
+            if sep:
+                headers.add(key.strip(), value.strip())
+        return parts[0], int(parts[1]), parts[2] if len(parts) > 2 else "", headers
+
+    async def _read_body(
+        self, reader: asyncio.StreamReader, headers: CIMultiDict, max_body: int
+    ) -> tuple[bytes, bool]:
+        # 返回响应体和连接能否继续复用, 只有完整读完的响应才能复用
+        content_length: str | None = headers.get("Content-Length")
+        if content_length is not None and content_length.isdigit():
+            length: int = int(content_length)
+            body: bytes = await reader.readexactly(min(length, max_body))
+            return body, length <= max_body
+        if "chunked" in headers.get("Transfer-Encoding", "").lower():
+            chunks: bytearray = bytearray()
+            while len(chunks) < max_body:
+                size: int = int((await reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                if size == 0:
+                    while await reader.readuntil(b"\r\n") != b"\r\n":
+                        pass
+                    return bytes(chunks), True
+                chunks += await reader.readexactly(size)
+                await reader.readexactly(2)
+            return bytes(chunks[:max_body]), False
+        chunks = bytearray()
+        while len(chunks) < max_body:
+            chunk: bytes = await reader.read(max_body - len(chunks))
+            if not chunk:
+                break
+            chunks += chunk
+        return bytes(chunks), False
+
+    async def fetch(
+        self,
+        proxy_address: ProxyAddress,
+        timing: CheckTiming | None = None,
+        deadlines: CheckDeadlines | None = None,
+    ) -> RawResponse:
+        async with aclosing(
+            self.fetch_targets(
+                proxy_address, [self.proxy_check_target], timing, deadlines
+            )
+        ) as raw_responses:
+            async for raw_response in raw_responses:
+                return raw_response
+        raise ProxyError("没有响应")
+
+    async def fetch_targets(
+        self,
+        proxy_address: ProxyAddress,
+        proxy_check_targets: Sequence[ProxyCheckTarget],
+        timing: CheckTiming | None = None,
+        deadlines: CheckDeadlines | None = None,
+    ) -> AsyncIterator[RawResponse]:
+        # 依次请求每个目标, 能复用时沿用同一条代理连接或隧道;
+        # 调用方提前退出时关闭连接, 后面的目标不再请求.
+        # 每个目标单独计算超时, timing 只记录第一个目标
+        timing = timing or CheckTiming()
+        deadlines = deadlines or CheckDeadlines(total=self.timeout)
+        socks: bool = proxy_address.scheme in SOCKS_SCHEMES
+        loop = asyncio.get_running_loop()
+        reader: asyncio.StreamReader | None = None
+        writer: asyncio.StreamWriter | None = None
+        route: tuple | None = None
+        try:
+            for index, proxy_check_target in enumerate(proxy_check_targets):
+                first: bool = index == 0
+                scheme: str = proxy_check_target.scheme or (
+                    "http" if socks else proxy_address.scheme
+                )
+                request: _Request = self._request(
+                    scheme, proxy_check_target, index < len(proxy_check_targets) - 1
+                )
+                tunneled: bool = socks or request.connect is not None
+                # 隧道只通向一个目标, 普通转发的连接可以请求任意 http 目标
+                target_route: tuple = (
+                    (scheme, request.host, request.port) if tunneled else (scheme,)
+                )
+                if writer is not None and route != target_route:
+                    writer.close()
+                    writer = None
+                started: float = loop.time()
+                async with asyncio.timeout(deadlines.total):
+                    while True:
+                        connected: bool = writer is None
+                        if connected:
+                            async with asyncio.timeout(deadlines.connect):
+                                reader, writer = await asyncio.open_connection(
+                                    proxy_address.host, proxy_address.port
+                                )
+                            route = target_route
+                            if first:
+                                timing.connect = timing.elapsed()
+                        try:
+                            async with asyncio.timeout_at(
+                                started + deadlines.first_byte
+                                if deadlines.first_byte
+                                else None
+                            ):
+                                if connected:
+                                    await self._open_tunnel(
+                                        reader,
+                                        writer,
+                                        proxy_address,
+                                        scheme,
+                                        request,
+                                        timing if first else None,
+                                    )
+                                writer.write(
+                                    request.direct if tunneled else request.request
+                                )
+                                version, status, reason, headers = (
+                                    await self._read_head(reader)
+                                )
+                            break
+                        except TimeoutError:
+                            raise
+                        except (OSError, ProxyError):
+                            if connected:
+                                raise
+                            # 复用的连接可能已被代理关闭, 换新连接再试一次
+                            writer.close()
+                            writer = None
+                    if first:
+                        timing.first_byte = timing.elapsed()
+                    matcher: CheckMatcher | None = proxy_check_target.matcher
+                    if (
+                        matcher is not None
+                        and matcher.match_head(status, headers) is not None
+                    ):
+                        # 规则在响应头阶段就不通过, 不再读取响应体
+                        body, reusable = b"", False
+                    else:
+                        body, reusable = await self._read_body(
+                            reader,
+                            headers,
+                            matcher.max_body if matcher is not None else self.max_body,
+                        )
+                if not reusable or not _keep_alive(version, headers):
+                    writer.close()
+                    writer = None
+                yield RawResponse(
+                    status=status, reason=reason, headers=headers, body=body
+                )
+        finally:
+            if writer is not None:
+                writer.close()
+
+    async def _open_tunnel(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        proxy_address: ProxyAddress,
+        scheme: str,
+        request: _Request,
+        timing: CheckTiming | None,
+    ) -> None:
+        connected: float = timing.connect if timing is not None else 0
+        if proxy_address.scheme in SOCKS_SCHEMES:
+            await socks_connect(
+                reader, writer, proxy_address.scheme, request.host, request.port
+            )
+        elif request.connect is not None:
+            writer.write(request.connect)
+            _, status, reason, _ = await self._read_head(reader)
+            if status != 200:
+                raise ProxyError(f"CONNECT失败\tstatus:{status} {reason}")
+        else:
+            return
+        if timing is not None:
+            timing.tunnel = timing.elapsed() - connected
+        if scheme == "https":
+            await writer.start_tls(self.ssl_context, server_hostname=request.host)
+            if timing is not None:
+                timing.tls = timing.elapsed() - connected - timing.tunnel
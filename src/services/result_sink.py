@@ -0,0 +1,259 @@
+import csv
+import io
+import ipaddress
+import json
+import logging
+import mmap
+import os
+import queue
+import shutil
+import struct
+import threading
+import time
+from typing import Iterator
+
+from ..models.proxy_address import ProxyAddress
+from ..models.proxy_address_set import SCHEMES
+from ..models.proxy_server import ProxyServer
+
+log = logging.getLogger("app")
+
+_STOP = object()
+_SCHEME_CODES: dict[str, int] = {scheme: code for code, scheme in enumerate(SCHEMES)}
+
+FIELDS: tuple[str, ...] = (
+    "proxy",
+    "scheme",
+    "host",
+    "port",
+    "response_time",
+    "checked_at",
+    "capabilities",
+    "source",
+)
+
+# 二进制格式: 16 字节文件头, 之后是定长记录, 可以直接 mmap 按下标读取.
+# 地址统一存成 16 字节 IPv6 (IPv4 映射为 ::ffff:a.b.c.d), 不是 IP 的地址跳过;
+# response_time 为 0xFFFFFFFF 表示未知
+BINARY_MAGIC: bytes = b"PXRS"
+BINARY_VERSION: int = 1
+BINARY_HEADER: struct.Struct = struct.Struct("<4sHH8x")
+BINARY_RECORD: struct.Struct = struct.Struct("<16sHBxIId")
+_NO_TIME: int = 0xFFFFFFFF
+
+
+def _fields(proxy_server: ProxyServer) -> tuple:
+    return (
+        ProxyAddress.__str__(proxy_server),
+        proxy_server.scheme,
+        proxy_server.host,
+        proxy_server.port,
+        proxy_server.response_time,
+        proxy_server.checked_at,
+        proxy_server.capabilities,
+        proxy_server.source,
+    )
+
+
+class NdjsonFormat:
+    suffixes: tuple[str, ...] = (".ndjson", ".jsonl")
+
+    def header(self) -> bytes:
+        return b""
+
+    def encode(self, proxy_servers: list[ProxyServer]) -> bytes:
+        return "".join(
+            json.dumps(dict(zip(FIELDS, _fields(proxy_server))), ensure_ascii=False)
+            + "\n"
+            for proxy_server in proxy_servers
+        ).encode()
+
+
+class CsvFormat:
+    suffixes: tuple[str, ...] = (".csv",)
+
+    def header(self) -> bytes:
+        return (",".join(FIELDS) + "\r\n").encode()
+
+    def encode(self, proxy_servers: list[ProxyServer]) -> bytes:
+        buffer: io.StringIO = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerows(_fields(proxy_server) for proxy_server in proxy_servers)
+        return buffer.getvalue().encode()
+
+
+class BinaryFormat:
+    suffixes: tuple[str, ...] = (".bin",)
+
+    def header(self) -> bytes:
+        return BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, BINARY_RECORD.size)
+
+    def encode(self, proxy_servers: list[ProxyServer]) -> bytes:
+        records: bytearray = bytearray()
+        for proxy_server in proxy_servers:
+            code: int | None = _SCHEME_CODES.get(proxy_server.scheme)
+            try:
+                ip = ipaddress.ip_address(proxy_server.host)
+            except ValueError:
+                continue
+            if code is None:
+                continue
+            if ip.version == 4:
+                ip = ipaddress.IPv6Address(f"::ffff:{ip}")
+            records += BINARY_RECORD.pack(
+                ip.packed,
+                proxy_server.port,
+                code,
+                (
+                    _NO_TIME
+                    if proxy_server.response_time is None
+                    else min(proxy_server.response_time, _NO_TIME - 1)
+                ),
+                proxy_server.capabilities,
+                proxy_server.checked_at or 0.0,
+            )
+        return bytes(records)
+
+
+ResultFormat = NdjsonFormat | CsvFormat | BinaryFormat
+FORMATS: tuple[type, ...] = (NdjsonFormat, CsvFormat, BinaryFormat)
+
+
+def format_for(path: str) -> ResultFormat:
+    suffix: str = os.path.splitext(path)[1].lower()
+    for format_type in FORMATS:
+        if suffix in format_type.suffixes:
+            return format_type()
+    raise ValueError(f"不支持的结果文件格式\t{path}")
+
+
+def read_binary(path: str) -> Iterator[ProxyServer]:
+    # 写入中的 .partial 文件也可以读, 末尾不完整的记录会被忽略
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size < BINARY_HEADER.size:
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            magic, version, record_size = BINARY_HEADER.unpack_from(data)
+            if magic != BINARY_MAGIC or record_size != BINARY_RECORD.size:
+                raise ValueError(f"无效的结果文件\t{path}")
+            count: int = (len(data) - BINARY_HEADER.size) // record_size
+            for offset in range(
+                BINARY_HEADER.size,
+                BINARY_HEADER.size + count * record_size,
+                record_size,
+            ):
+                packed, port, code, response_time, capabilities, checked_at = (
+                    BINARY_RECORD.unpack_from(data, offset)
+                )
+                ip = ipaddress.IPv6Address(packed)
+                yield ProxyServer(
+                    scheme=SCHEMES[code],
+                    host=str(ip.ipv4_mapped or ip),
+                    port=port,
+                    response_time=None if response_time == _NO_TIME else response_time,
+                    checked_at=checked_at or None,
+                    capabilities=capabilities,
+                )
+
+
+# 检测成功的结果按批追加到 <path>.partial, 读取方可以随时读取这个文件;
+# 每隔 snapshot_interval 把它复制一份并原子地替换 <path>, 结束时直接改名为 <path>.
+# 编码和写入都在后台线程, 事件循环只负责入队
+class ResultSink:
+    def __init__(
+        self,
+        path: str,
+        result_format: ResultFormat | None = None,
+        batch_size: int = 1000,
+        snapshot_interval: float = 10,
+    ) -> None:
+        self.path = path
+        self.partial_path: str = f"{path}.partial"
+        self.result_format: ResultFormat = result_format or format_for(path)
+        self.batch_size = batch_size
+        self.snapshot_interval = snapshot_interval
+        self.written: int = 0
+        self._queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._file = open(self.partial_path, "wb")
+        self._file.write(self.result_format.header())
+        self._file.flush()
+        self._thread: threading.Thread = threading.Thread(
+            target=self._run, name=f"result-sink:{path}", daemon=True
+        )
+        self._thread.start()
+
+    def observe(
+        self,
+        proxy_address: ProxyAddress,
+        proxy_server: ProxyServer | None,
+        elapsed: float | None,
+    ) -> None:
+        if proxy_server is not None:
+            self._queue.put(proxy_server)
+
+    def _snapshot(self) -> None:
+        shutil.copyfile(self.partial_path, f"{self.path}.tmp")
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def _encode(self, batch: list[ProxyServer]) -> tuple[bytes, int]:
+        # 返回编码结果和写入的数量; 整批编码失败时逐条编码, 跳过出错的记录
+        try:
+            return self.result_format.encode(batch), len(batch)
+        except Exception:
+            pass
+        chunks: list[bytes] = []
+        for proxy_server in batch:
+            try:
+                chunks.append(self.result_format.encode([proxy_server]))
+            except Exception as e:
+                log.error(f"编码结果失败\t{proxy_server}\t{e!r}")
+        return b"".join(chunks), len(chunks)
+
+    def _run(self) -> None:
+        snapshot_at: float = time.monotonic() + self.snapshot_interval
+        dirty: bool = False
+        stopping: bool = False
+        while not stopping:
+            try:
+                item = self._queue.get(
+                    timeout=max(0.0, snapshot_at - time.monotonic()) if dirty else None
+                )
+            except queue.Empty:
+                item = None
+            batch: list[ProxyServer] = []
+            while item is not None:
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            if batch:
+                data, count = self._encode(batch)
+                try:
+                    self._file.write(data)
+                    self._file.flush()
+                    self.written += count
+                    dirty = True
+                except OSError as e:
+                    log.error(f"写入结果失败\t{self.partial_path}\t{e}")
+            if dirty and not stopping and time.monotonic() >= snapshot_at:
+                try:
+                    self._snapshot()
+                except OSError as e:
+                    log.error(f"保存结果快照失败\t{self.path}\t{e}")
+                dirty = False
+                snapshot_at = time.monotonic() + self.snapshot_interval
+
+    def close(self) -> None:
+        if self._file.closed:
+            return
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._file.close()
+        os.replace(self.partial_path, self.path)
+        log.info(f"结果文件\t{self.path}\t数量:{self.written}")
@@ -0,0 +1,278 @@
+import asyncio
+import dataclasses
+import logging
+import logging.handlers
+import math
+import multiprocessing
+import queue
+import time
+from typing import AsyncIterable, AsyncIterator
+
+import aiohttp
+
+from .adaptive_limiter import AdaptiveLimiter
+from .adaptive_timeout import AdaptiveTimeout
+from .config import Config
+from .protocol_detector import ProtocolDetector
+from .proxy_get_check_service import CheckObserver, ProxyGetCheckService
+from .proxy_health_store import ProxyHealthStore
+from .subnet_scheduler import SubnetScheduler
+from ..errors.error import FailedError
+from ..models.check_deadlines import CheckDeadlines
+from ..models.check_options import CheckOptions
+from ..models.proxy_address import ProxyAddress
+from ..models.proxy_server import ProxyServer
+from ..models.stage_stats import StageStats
+
+log = logging.getLogger("app")
+
+
+def _run_shard(
+    options: CheckOptions,
+    inbox: multiprocessing.Queue,
+    outbox: multiprocessing.Queue,
+    log_queue: multiprocessing.Queue,
+) -> None:
+    # 子进程的日志交给父进程的 handler 输出
+    shard_log: logging.Logger = logging.getLogger("app")
+    shard_log.handlers.clear()
+    shard_log.setLevel(logging.DEBUG)
+    shard_log.addHandler(logging.handlers.QueueHandler(log_queue))
+    asyncio.run(_check_shard(options, inbox, outbox))
+
+
+async def _read_inbox(inbox: multiprocessing.Queue) -> AsyncIterator[ProxyAddress]:
+    loop = asyncio.get_running_loop()
+    while (batch := await loop.run_in_executor(None, inbox.get)) is not None:
+        for proxy_address in batch:
+            yield proxy_address
+
+
+async def _check_shard(
+    options: CheckOptions,
+    inbox: multiprocessing.Queue,
+    outbox: multiprocessing.Queue,
+    flush_interval: float = 0.5,
+) -> None:
+    script = Config.load_script(options.script_path, "script")
+    outcomes: list[tuple] = []
+
+    def flush() -> None:
+        if outcomes:
+            outbox.put(("outcomes", outcomes.copy()))
+            outcomes.clear()
+
+    def observe(
+        proxy_address: ProxyAddress,
+        proxy_server: ProxyServer | None,
+        elapsed: float | None,
+    ) -> None:
+        outcomes.append((proxy_address, proxy_server, elapsed))
+
+    async def flush_periodically() -> None:
+        while True:
+            await asyncio.sleep(flush_interval)
+            flush()
+
+    deadlines: CheckDeadlines = CheckDeadlines(
+        total=options.total_timeout,
+        connect=options.connect_timeout,
+        first_byte=options.first_byte_timeout,
+    )
+    tcp_connector = aiohttp.TCPConnector(limit=options.workers, ssl=False)
+    async with aiohttp.ClientSession(
+        connector=tcp_connector,
+        trace_configs=[ProxyGetCheckService.trace_config()],
+    ) as session:
+        proxy_get_check_service: ProxyGetCheckService = ProxyGetCheckService(
+            session=session,
+            headers=options.headers,
+            client_timeout=aiohttp.ClientTimeout(total=options.total_timeout),
+            proxy_check_target=script.proxy_check_target,
+            workers=options.workers,
+            prescreen=options.prescreen,
+            prescreen_workers=options.prescreen_workers,
+            prescreen_timeout=options.prescreen_timeout,
+            engine=options.engine,
+            limiter=(
+                AdaptiveLimiter(maximum=options.workers) if options.adaptive else None
+            ),
+            deadlines=deadlines,
+            adaptive_timeout=(
+                AdaptiveTimeout(deadlines, factor=options.timeout_factor)
+                if options.adaptive_timeout
+                else None
+            ),
+            detector=(
+                ProtocolDetector.for_target(
+                    script.proxy_check_target, options.prescreen_timeout
+                )
+                if options.detect_protocols
+                else None
+            ),
+            debug_sample=options.debug_sample,
+            proxy_check_targets=script.proxy_check_targets,
+        )
+        proxy_get_check_service.observers.append(observe)
+        flusher: asyncio.Task = asyncio.create_task(flush_periodically())
+        try:
+            async for _ in proxy_get_check_service.stream_check_proxies(
+                _read_inbox(inbox)
+            ):
+                pass
+        finally:
+            flusher.cancel()
+        flush()
+        outbox.put(
+            (
+                "done",
+                proxy_get_check_service.prescreen_stats,
+                proxy_get_check_service.check_stats,
+            )
+        )
+
+
+class ShardedCheckService:
+    def __init__(
+        self,
+        options: CheckOptions,
+        processes: int,
+        health_store: ProxyHealthStore | None = None,
+        batch_size: int = 100,
+    ) -> None:
+        self.options = options
+        self.processes = processes
+        self.health_store = health_store
+        self.batch_size = batch_size
+        # 全局并发按进程数平分, 每个进程有自己的连接池和事件循环
+        self.shard_options: CheckOptions = dataclasses.replace(
+            options,
+            workers=math.ceil(options.workers / processes),
+            prescreen_workers=math.ceil(options.prescreen_workers / processes),
+        )
+        self.prescreen_stats = StageStats(name="tcp")
+        self.check_stats = StageStats(name="http")
+        self.observers: list[CheckObserver] = []
+        if health_store is not None:
+            self.observers.append(health_store.observe)
+        # 调度在父进程中进行, 子进程的检测结果通过 observers 反馈回来
+        self.scheduler: SubnetScheduler | None = None
+        if options.subnet_schedule:
+            self.scheduler = SubnetScheduler(sample_size=options.subnet_sample)
+            self.observers.append(self.scheduler.observe)
+        self._stopping = False
+
+    def _put(self, inbox: multiprocessing.Queue, batch: list | None) -> None:
+        while not self._stopping:
+            try:
+                inbox.put(batch, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    async def _feed(
+        self,
+        proxy_addresses: AsyncIterable[ProxyAddress],
+        inboxes: list[multiprocessing.Queue],
+    ) -> None:
+        loop = asyncio.get_running_loop()
+        batches: list[list[ProxyAddress]] = [[] for _ in inboxes]
+        index: int = 0
+        async for proxy_address in proxy_addresses:
+            batches[index].append(proxy_address)
+            if len(batches[index]) >= self.batch_size:
+                await loop.run_in_executor(
+                    None, self._put, inboxes[index], batches[index]
+                )
+                batches[index] = []
+                index = (index + 1) % len(inboxes)
+        for inbox, batch in zip(inboxes, batches):
+            if batch:
+                await loop.run_in_executor(None, self._put, inbox, batch)
+            await loop.run_in_executor(None, self._put, inbox, None)
+
+    async def stream_check_proxies(
+        self, proxy_addresses: AsyncIterable[ProxyAddress]
+    ) -> AsyncIterator[ProxyServer]:
+        if self.health_store is not None:
+            proxy_addresses = self.health_store.filter_due(proxy_addresses)
+        if self.options.detect_protocols:
+            # 去重要在分片和调度之前做, 否则同一端点可能落到不同进程,
+            # 调度器也会计入不会有结果的地址
+            proxy_addresses = ProtocolDetector.unique_endpoints(proxy_addresses)
+        if self.scheduler is not None:
+            proxy_addresses = self.scheduler.schedule(proxy_addresses)
+        loop = asyncio.get_running_loop()
+        context = multiprocessing.get_context("spawn")
+        inboxes: list[multiprocessing.Queue] = [
+            context.Queue(maxsize=4) for _ in range(self.processes)
+        ]
+        outbox: multiprocessing.Queue = context.Queue()
+        log_queue: multiprocessing.Queue = context.Queue()
+        listener = logging.handlers.QueueListener(
+            log_queue, *log.handlers, respect_handler_level=True
+        )
+        listener.start()
+        workers: list = [
+            context.Process(
+                target=_run_shard,
+                args=(self.shard_options, inbox, outbox, log_queue),
+                daemon=True,
+            )
+            for inbox in inboxes
+        ]
+        for worker in workers:
+            worker.start()
+        log.info(
+            f"多进程检测\t进程数:{self.processes}"
+            f"\t每进程并发:{self.shard_options.workers}"
+        )
+        self._stopping = False
+        feeder: asyncio.Task = asyncio.create_task(self._feed(proxy_addresses, inboxes))
+        running: int = self.processes
+        try:
+            while running:
+                try:
+                    message: tuple = await loop.run_in_executor(
+                        None, outbox.get, True, 1
+                    )
+                except queue.Empty:
+                    if feeder.done() and feeder.exception() is not None:
+                        raise feeder.exception()
+                    if not any(worker.is_alive() for worker in workers):
+                        raise FailedError("检测进程异常退出")
+                    continue
+                if message[0] == "outcomes":
+                    for proxy_address, proxy_server, elapsed in message[1]:
+                        for observer in self.observers:
+                            observer(proxy_address, proxy_server, elapsed)
+                        if proxy_server is not None:
+                            yield proxy_server
+                else:
+                    running -= 1
+                    self.prescreen_stats.merge(message[1])
+                    self.check_stats.merge(message[2])
+            await feeder
+        finally:
+            self._stopping = True
+            feeder.cancel()
+            await asyncio.gather(feeder, return_exceptions=True)
+            # 在线程中等待子进程退出, 不阻塞同一事件循环上的接口和转发代理
+            deadline: float = time.monotonic() + 5
+            for worker in workers:
+                await loop.run_in_executor(
+                    None, worker.join, max(0, deadline - time.monotonic())
+                )
+                if worker.is_alive():
+                    worker.terminate()
+            listener.stop()
+        if self.options.prescreen:
+            log.info(
+                f"预筛选\t{self.prescreen_stats}"
+                f"\t节省HTTP检测:{self.prescreen_stats.failed}"
+            )
+        log.info(f"检测\t{self.check_stats}")
+        if self.scheduler is not None:
+            log.info(f"子网调度\t{self.scheduler.summary()}")
+        if self.health_store is not None:
+            self.health_store.flush()
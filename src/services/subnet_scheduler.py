@@ -0,0 +1,227 @@
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator
+
+from ..models.proxy_address import ProxyAddress
+from ..models.proxy_server import ProxyServer
+
+
+@dataclass(slots=True, eq=False)
+class _Group:
+    pending: deque[ProxyAddress] = field(default_factory=deque)
+    sent: int = 0
+    done: int = 0
+    ok: int = 0
+    # 已输出但还没有结果的地址数, 按 host 计;
+    # 识别协议时一个地址可能有多个结果, 只有第一个计入 done
+    outstanding: dict[str, int] = field(default_factory=dict)
+    # 有过成功结果的 host, 后到的成功结果据此只计一次
+    valid: set[str] = field(default_factory=set)
+    # 每次入队加一, 队列中编号不一致的条目已经过期
+    ticket: int = 0
+
+
+def group_key(proxy_address: ProxyAddress) -> tuple[str, int]:
+    # IPv4 按 /24 和端口分组, 其他地址各自一组
+    prefix, _, last = proxy_address.host.rpartition(".")
+    if prefix.count(".") == 2 and last.isdigit():
+        return prefix, proxy_address.port
+    return proxy_address.host, proxy_address.port
+
+
+# 代理列表按网段高度聚集, 同一 /24 同一端口的代理往往一起可用或一起失效.
+# 每组先检测少量样本, 样本有成功的组优先检测其余地址, 全部失败的组推迟到最后;
+# 各组轮流输出, 不会连续检测同一个网段.
+# 样本结果未出时先等待, 距上次有组被提升超过 patience 才继续输出未定和推迟的组
+class SubnetScheduler:
+    def __init__(
+        self,
+        sample_size: int = 2,
+        min_rate: float = 0.05,
+        explore_every: int = 2,
+        max_inflight: int = 8,
+        patience: float = 1,
+    ) -> None:
+        self.sample_size = sample_size
+        self.min_rate = min_rate
+        # 每输出几个地址至少取一个未采样组的样本, 避免只检测已知可用的组
+        self.explore_every = explore_every
+        # 同一组同时检测的上限, 超过时先检测其他组
+        self.max_inflight = max_inflight
+        self.patience = patience
+        self.groups: dict[tuple[str, int], _Group] = {}
+        self._promoted: deque[tuple[int, _Group]] = deque()
+        self._sampling: deque[tuple[int, _Group]] = deque()
+        self._waiting: deque[tuple[int, _Group]] = deque()
+        self._deferred: deque[tuple[int, _Group]] = deque()
+        self._busy: deque[tuple[int, _Group]] = deque()
+        self._changed: asyncio.Event = asyncio.Event()
+        self._emitted: int = 0
+        self._pending: int = 0
+        self._source_done: bool = False
+        self._stalled: bool = False
+        self._promoted_at: float = 0
+
+    def _good(self, group: _Group) -> bool:
+        return group.ok > 0 and group.ok >= group.done * self.min_rate
+
+    def _tier(self, group: _Group) -> deque[tuple[int, _Group]] | None:
+        if not group.pending:
+            return None
+        if not self._stalled and group.sent - group.done >= self.max_inflight:
+            return self._busy
+        if self._good(group):
+            return self._promoted
+        if group.sent < self.sample_size:
+            return self._sampling
+        if group.done < self.sample_size:
+            # 样本还没有结果
+            return self._waiting
+        return self._deferred
+
+    def _enqueue(self, group: _Group) -> None:
+        tier: deque[tuple[int, _Group]] | None = self._tier(group)
+        if tier is not None:
+            group.ticket += 1
+            tier.append((group.ticket, group))
+            self._changed.set()
+
+    def _pop(self, tier: deque[tuple[int, _Group]]) -> ProxyAddress | None:
+        while tier:
+            ticket, group = tier.popleft()
+            if ticket != group.ticket:
+                continue
+            if self._tier(group) is not tier:
+                self._enqueue(group)
+                continue
+            proxy_address: ProxyAddress = group.pending.popleft()
+            group.sent += 1
+            group.outstanding[proxy_address.host] = (
+                group.outstanding.get(proxy_address.host, 0) + 1
+            )
+            self._pending -= 1
+            self._enqueue(group)
+            return proxy_address
+        return None
+
+    def _next(self) -> ProxyAddress | None:
+        self._emitted += 1
+        tiers: list[deque[tuple[int, _Group]]] = [self._promoted, self._sampling]
+        if self._stalled:
+            tiers.append(self._waiting)
+        if self._emitted % self.explore_every == 0:
+            tiers[0], tiers[1] = tiers[1], tiers[0]
+        if self._stalled and self._source_done:
+            tiers.append(self._deferred)
+        for tier in tiers:
+            proxy_address: ProxyAddress | None = self._pop(tier)
+            if proxy_address is not None:
+                return proxy_address
+        self._emitted -= 1
+        return None
+
+    def _stall(self) -> None:
+        # 不再限制每组的并发, 已满的组回到各自的队列
+        self._stalled = True
+        while self._busy:
+            ticket, group = self._busy.popleft()
+            if ticket == group.ticket:
+                self._enqueue(group)
+
+    def add(self, proxy_address: ProxyAddress) -> None:
+        key: tuple[str, int] = group_key(proxy_address)
+        group: _Group | None = self.groups.get(key)
+        if group is None:
+            group = self.groups[key] = _Group()
+        group.pending.append(proxy_address)
+        self._pending += 1
+        if len(group.pending) == 1:
+            self._enqueue(group)
+
+    def observe(
+        self,
+        proxy_address: ProxyAddress,
+        proxy_server: ProxyServer | None,
+        elapsed: float | None,
+    ) -> None:
+        group: _Group | None = self.groups.get(group_key(proxy_address))
+        if group is None:
+            return
+        host: str = proxy_address.host
+        count: int = group.outstanding.get(host, 0)
+        ok: bool = proxy_server is not None and host not in group.valid
+        if not count and not ok:
+            return
+        before: deque[tuple[int, _Group]] | None = self._tier(group)
+        good: bool = self._good(group)
+        if count:
+            group.done += 1
+            if count == 1:
+                del group.outstanding[host]
+            else:
+                group.outstanding[host] = count - 1
+        if proxy_server is not None:
+            group.ok += 1
+            group.valid.add(host)
+        if not good and self._good(group):
+            self._stalled = False
+            self._promoted_at = time.monotonic()
+        if self._tier(group) is not before:
+            self._enqueue(group)
+        self._changed.set()
+
+    async def schedule(
+        self, proxy_addresses: AsyncIterable[ProxyAddress]
+    ) -> AsyncIterator[ProxyAddress]:
+        errors: list[Exception] = []
+
+        async def intake() -> None:
+            try:
+                count: int = 0
+                async for proxy_address in proxy_addresses:
+                    self.add(proxy_address)
+                    count += 1
+                    # 源在内存中时不会让出事件循环, 定期让出以免耽误输出
+                    if count % 256 == 0:
+                        await asyncio.sleep(0)
+            except Exception as e:
+                errors.append(e)
+            self._source_done = True
+            self._changed.set()
+
+        task: asyncio.Task = asyncio.create_task(intake())
+        self._promoted_at = time.monotonic()
+        try:
+            while True:
+                proxy_address: ProxyAddress | None = self._next()
+                if proxy_address is not None:
+                    yield proxy_address
+                    continue
+                if self._source_done and not self._pending:
+                    break
+                remaining: float = self._promoted_at + self.patience - time.monotonic()
+                if remaining <= 0:
+                    self._stall()
+                    continue
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), remaining)
+                except TimeoutError:
+                    pass
+            if errors:
+                raise errors[0]
+        finally:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+    def summary(self) -> str:
+        sampled: list[_Group] = [
+            group for group in self.groups.values() if group.done >= self.sample_size
+        ]
+        promoted: int = sum(1 for group in sampled if self._good(group))
+        return (
+            f"分组:{len(self.groups)}\t已采样:{len(sampled)}"
+            f"\t优先:{promoted}\t推迟:{len(sampled) - promoted}"
+        )
@@ -0,0 +1,76 @@
+import json
+import logging
+import logging.handlers
+import time
+
+
+def message_type(record: logging.LogRecord) -> str:
+    # 日志消息的第一段是类型, 例如 "成功\thttp://..." 中的 "成功"
+    return str(record.msg).split("\t", 1)[0]
+
+
+# 只有一个 handler 时不需要复制 record, 也不在事件循环上格式化;
+# 异常信息原样交给后台线程格式化
+class LoopQueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+# 按 (级别, 消息类型) 限速的令牌桶, 被丢弃的条数附在下一条放行的日志后面
+class RateLimitFilter(logging.Filter):
+    def __init__(
+        self, rate: float = 20, burst: int = 100, max_level: int = logging.ERROR
+    ) -> None:
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.max_level = max_level
+        # key: (令牌数, 上次补充时间, 已丢弃条数)
+        self._buckets: dict[tuple[int, str], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= self.max_level:
+            return True
+        key: tuple[int, str] = (record.levelno, message_type(record))
+        now: float = time.monotonic()
+        bucket: list | None = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now, 0]
+        else:
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return False
+        bucket[0] -= 1
+        if bucket[2]:
+            record.msg = f"{record.msg}\t已省略:{bucket[2]}"
+            bucket[2] = 0
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        message: str = record.getMessage()
+        parts: list[str] = message.split("\t")
+        fields: dict[str, str] = {}
+        for part in parts[1:]:
+            key, sep, value = part.partition(":")
+            # 跳过 http://host:port 这类地址
+            if sep and key and not value.startswith("//") and " " not in key:
+                fields[key] = value
+        entry: dict = {
+            "time": record.created,
+            "level": record.levelname,
+            "type": parts[0],
+            "message": message,
+        }
+        if fields:
+            entry["fields"] = fields
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
@@ -0,0 +1,34 @@
+import asyncio
+import time
+
+
+class LoopLagMonitor:
+    def __init__(self, interval: float = 0.1) -> None:
+        self.interval = interval
+        self.lag: float = 0.0
+        self.max_lag: float = 0.0
+        self.samples: int = 0
+        self.total_lag: float = 0.0
+        self._task: asyncio.Task | None = None
+
+    async def _run(self) -> None:
+        while True:
+            started: float = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.max_lag = max(self.max_lag, self.lag)
+            self.total_lag += self.lag
+            self.samples += 1
+
+    @property
+    def average_lag(self) -> float:
+        return self.total_lag / self.samples if self.samples else 0.0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
@@ -0,0 +1,68 @@
+import asyncio
+import ipaddress
+
+from ..errors.error import ProxyError
+
+SOCKS_SCHEMES: frozenset[str] = frozenset({"socks4", "socks5"})
+
+# 只支持无认证方式
+SOCKS5_GREETING: bytes = b"\x05\x01\x00"
+
+
+def socks4_request(host: str, port: int) -> bytes:
+    # 域名使用 SOCKS4a 的 0.0.0.1 写法
+    try:
+        ip: bytes = ipaddress.IPv4Address(host).packed
+        domain: bytes = b""
+    except ValueError:
+        ip = b"\x00\x00\x00\x01"
+        domain = host.encode("idna") + b"\x00"
+    return b"\x04\x01" + port.to_bytes(2, "big") + ip + b"\x00" + domain
+
+
+def socks5_request(host: str, port: int) -> bytes:
+    try:
+        address: bytes = b"\x01" + ipaddress.IPv4Address(host).packed
+    except ValueError:
+        domain: bytes = host.encode("idna")
+        address = b"\x03" + bytes([len(domain)]) + domain
+    return b"\x05\x01\x00" + address + port.to_bytes(2, "big")
+
+
+async def _read(reader: asyncio.StreamReader, size: int) -> bytes:
+    try:
+        return await reader.readexactly(size)
+    except asyncio.IncompleteReadError as e:
+        raise ProxyError(f"连接被关闭\tpartial:{e.partial[:64]!r}")
+
+
+async def socks_connect(
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+    scheme: str,
+    host: str,
+    port: int,
+) -> None:
+    if scheme == "socks4":
+        writer.write(socks4_request(host, port))
+        reply: bytes = await _read(reader, 8)
+        if reply[0] != 0 or reply[1] != 0x5A:
+            raise ProxyError(f"SOCKS4连接失败\treply:{reply[:2]!r}")
+        return
+    writer.write(SOCKS5_GREETING)
+    reply = await _read(reader, 2)
+    if reply != b"\x05\x00":
+        raise ProxyError(f"SOCKS5认证失败\treply:{reply!r}")
+    writer.write(socks5_request(host, port))
+    reply = await _read(reader, 4)
+    if reply[0] != 5 or reply[1] != 0:
+        raise ProxyError(f"SOCKS5连接失败\treply:{reply[:2]!r}")
+    # 跳过代理返回的绑定地址
+    if reply[3] == 1:
+        await _read(reader, 4 + 2)
+    elif reply[3] == 3:
+        await _read(reader, (await _read(reader, 1))[0] + 2)
+    elif reply[3] == 4:
+        await _read(reader, 16 + 2)
+    else:
+        raise ProxyError(f"SOCKS5地址类型无效\tatyp:{reply[3]}")
@@ -0,0 +1,43 @@
+from bisect import bisect_left
+from collections import deque
+from itertools import accumulate
+from typing import Iterable
+
+
+def percentile(samples: Iterable[float], q: float) -> float | None:
+    ordered: list[float] = sorted(samples)
+    if not ordered:
+        return None
+    index: int = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class LatencyWindow:
+    def __init__(self, size: int = 100, samples: Iterable[float] = ()) -> None:
+        self.samples: deque[float] = deque(samples, maxlen=size)
+
+    def add(self, value: float) -> None:
+        self.samples.append(value)
+
+    def percentile(self, q: float) -> float | None:
+        return percentile(self.samples, q)
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+
+# 累计直方图, buckets 是各桶的上界 (含), 最后一个桶是 +Inf
+class Histogram:
+    def __init__(self, buckets: Iterable[float]) -> None:
+        self.buckets: tuple[float, ...] = tuple(buckets)
+        self.counts: list[int] = [0] * (len(self.buckets) + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> list[int]:
+        return list(accumulate(self.counts))
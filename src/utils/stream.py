@@ -0,0 +1,96 @@
+import asyncio
+from typing import AsyncIterable, AsyncIterator, Awaitable, Callable, Iterable, TypeVar
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_DONE = object()
+
+
+async def iterate(items: Iterable[T]) -> AsyncIterator[T]:
+    for item in items:
+        yield item
+
+
+async def merge(
+    sources: Iterable[AsyncIterable[T]], maxsize: int = 1000
+) -> AsyncIterator[T]:
+    queue: asyncio.Queue = asyncio.Queue(maxsize)
+    errors: list[Exception] = []
+
+    async def feed(source: AsyncIterable[T]) -> None:
+        try:
+            async for item in source:
+                await queue.put(item)
+        except Exception as e:
+            errors.append(e)
+        await queue.put(_DONE)
+
+    tasks: list[asyncio.Task] = [asyncio.create_task(feed(s)) for s in sources]
+    remaining: int = len(tasks)
+    try:
+        while remaining:
+            item = await queue.get()
+            if item is _DONE:
+                remaining -= 1
+                continue
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def worker_pool(
+    source: AsyncIterable[T],
+    func: Callable[[T], Awaitable[R | None]],
+    workers: int,
+    maxsize: int | None = None,
+) -> AsyncIterator[R]:
+    inbox: asyncio.Queue = asyncio.Queue(maxsize or workers)
+    outbox: asyncio.Queue = asyncio.Queue(maxsize or workers)
+    errors: list[Exception] = []
+
+    async def feed() -> None:
+        try:
+            async for item in source:
+                await inbox.put(item)
+        except Exception as e:
+            errors.append(e)
+        for _ in range(workers):
+            await inbox.put(_DONE)
+
+    async def work() -> None:
+        try:
+            while (item := await inbox.get()) is not _DONE:
+                result = await func(item)
+                if result is not None:
+                    await outbox.put(result)
+        except Exception as e:
+            errors.append(e)
+        await outbox.put(_DONE)
+
+    tasks: list[asyncio.Task] = [asyncio.create_task(feed())]
+    tasks.extend(asyncio.create_task(work()) for _ in range(workers))
+    remaining: int = workers
+    try:
+        while remaining:
+            result = await outbox.get()
+            if result is _DONE:
+                remaining -= 1
+                continue
+            yield result
+        if errors:
+            raise errors[0]
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def chain(source: AsyncIterable[Iterable[T]]) -> AsyncIterator[T]:
+    async for items in source:
+        for item in items:
+            yield item
@@ -0,0 +1,71 @@
+import asyncio
+import socket
+import unittest
+from typing import Awaitable, Callable
+
+import aiohttp
+from aiohttp import web
+
+from src.models.failure_reason import FailureReason
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_server import ProxyServer
+
+# 测试共用的本地服务器和检测函数
+
+
+def free_port() -> int:
+    # 绑定后立即释放, 得到一个没有监听的端口
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def start_server(
+    test: unittest.IsolatedAsyncioTestCase,
+    handler: Callable[[asyncio.StreamReader, asyncio.StreamWriter], Awaitable[None]],
+) -> int:
+    # 测试结束时关闭
+    server = await asyncio.start_server(handler, "127.0.0.1", 0)
+    test.addAsyncCleanup(server.wait_closed)
+    test.addCleanup(server.close)
+    return server.sockets[0].getsockname()[1]
+
+
+async def serve_http(
+    test: unittest.IsolatedAsyncioTestCase,
+    body: bytes,
+    paths: dict[str, bytes] | None = None,
+) -> int:
+    # 每个连接应答一个请求后关闭; paths 中的路径返回对应内容, 其余返回 body
+    async def handle(reader, writer) -> None:
+        head: bytes = await reader.readuntil(b"\r\n\r\n")
+        path: str = head.split(b" ")[1].decode()
+        content: bytes = (paths or {}).get(path, body)
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nConnection: close\r\n"
+            b"Content-Length: %d\r\n\r\n%s" % (len(content), content)
+        )
+        await writer.drain()
+        writer.close()
+
+    return await start_server(test, handle)
+
+
+async def serve_app(
+    test: unittest.IsolatedAsyncioTestCase, app: web.Application
+) -> int:
+    runner = web.AppRunner(app)
+    await runner.setup()
+    test.addAsyncCleanup(runner.cleanup)
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner.addresses[0][1]
+
+
+async def check(
+    response: aiohttp.ClientResponse, proxy_address: ProxyAddress
+) -> ProxyServer | FailureReason:
+    # 响应内容为 ok 时检测通过
+    if await response.text() != "ok":
+        return FailureReason.INVALID_DATA
+    return ProxyServer.from_address(proxy_address)
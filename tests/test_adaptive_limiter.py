@@ -0,0 +1,57 @@
+import asyncio
+import unittest
+
+from src.services.adaptive_limiter import AdaptiveLimiter
+
+
+class TestAdaptiveLimiter(unittest.IsolatedAsyncioTestCase):
+    async def test_limit_bounds_in_flight(self):
+        limiter = AdaptiveLimiter(initial=3, minimum=1, maximum=10)
+        peak: int = 0
+
+        async def task() -> None:
+            nonlocal peak
+            async with limiter:
+                peak = max(peak, limiter.in_flight)
+                await asyncio.sleep(0.001)
+
+        await asyncio.gather(*(task() for _ in range(20)))
+        self.assertEqual(peak, 3)
+        self.assertEqual(limiter.in_flight, 0)
+        limiter.close()
+
+    async def test_cancel_after_wake(self):
+        limiter = AdaptiveLimiter(initial=1, minimum=1, maximum=1)
+        await limiter.acquire()
+        first: asyncio.Task = asyncio.create_task(limiter.acquire())
+        second: asyncio.Task = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        # 唤醒 first 后它还没运行就被取消, 名额应转给 second
+        limiter.release()
+        first.cancel()
+        await asyncio.wait_for(second, 1)
+        self.assertTrue(first.cancelled())
+        self.assertEqual(limiter.in_flight, 1)
+        limiter.close()
+
+    async def test_aimd(self):
+        limiter = AdaptiveLimiter(
+            initial=50, minimum=10, maximum=100, window=10, increase=10
+        )
+        # 基准窗口: 一半超时
+        limiter.peak_in_flight = 50
+        for i in range(10):
+            limiter.record(timeout=i % 2 == 0)
+        self.assertEqual(limiter.limit, 60)
+
+        limiter.peak_in_flight = 60
+        for _ in range(10):
+            limiter.record(timeout=True)
+        self.assertEqual(limiter.limit, 42)
+
+        # 并发没有用满时不增加
+        limiter.peak_in_flight = 5
+        for i in range(10):
+            limiter.record(timeout=i % 2 == 0)
+        self.assertEqual(limiter.limit, 42)
+        limiter.close()
@@ -0,0 +1,120 @@
+import asyncio
+import unittest
+
+import aiohttp
+
+from src.models.check_deadlines import CheckDeadlines
+from src.models.check_result import CheckResult
+from src.models.check_rule import CheckRule
+from src.models.failure_reason import FailureReason
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_check_target import ProxyCheckTarget
+from src.models.proxy_server import ProxyServer
+from src.services.adaptive_timeout import AdaptiveTimeout
+from src.services.proxy_get_check_service import ProxyGetCheckService
+from src.services.raw_check_engine import RawCheckEngine
+from tests.helpers import start_server
+
+
+class TestAdaptiveTimeout(unittest.TestCase):
+    def observe(self, adaptive_timeout: AdaptiveTimeout, count: int) -> None:
+        proxy_address = ProxyAddress(scheme="http", host="127.0.0.1", port=8080)
+        for _ in range(count):
+            proxy_server = ProxyServer.from_address(proxy_address)
+            proxy_server.connect_time = 300
+            proxy_server.first_byte_time = 600
+            proxy_server.response_time = 800
+            adaptive_timeout.observe(proxy_address, proxy_server, 0.8)
+
+    def test_tightens_after_min_samples(self):
+        configured = CheckDeadlines(total=5, connect=3)
+        adaptive_timeout = AdaptiveTimeout(configured, min_samples=20, refresh=10)
+        self.observe(adaptive_timeout, 10)
+        self.assertEqual(adaptive_timeout.deadlines, configured)
+        self.observe(adaptive_timeout, 10)
+        self.assertEqual(
+            adaptive_timeout.deadlines,
+            CheckDeadlines(total=1.6, connect=0.6, first_byte=1.2),
+        )
+
+    def test_never_exceeds_configured(self):
+        configured = CheckDeadlines(total=1, connect=0.5, first_byte=1)
+        adaptive_timeout = AdaptiveTimeout(
+            configured, factor=10, min_samples=10, refresh=10
+        )
+        self.observe(adaptive_timeout, 10)
+        self.assertEqual(adaptive_timeout.deadlines, configured)
+
+
+class TestRawCheckEngineDeadlines(unittest.IsolatedAsyncioTestCase):
+    async def test_first_byte_deadline(self):
+        # 代理接受连接但从不响应
+        server = await asyncio.start_server(lambda reader, writer: None, "127.0.0.1", 0)
+        port: int = server.sockets[0].getsockname()[1]
+        engine = RawCheckEngine(
+            ProxyCheckTarget(website="example.com", rule=CheckRule()), {}, timeout=5
+        )
+        loop = asyncio.get_running_loop()
+        started: float = loop.time()
+        with self.assertRaises(TimeoutError):
+            await engine.fetch(
+                ProxyAddress(scheme="http", host="127.0.0.1", port=port),
+                deadlines=CheckDeadlines(total=5, first_byte=0.2),
+            )
+        self.assertLess(loop.time() - started, 1)
+        server.close()
+
+
+class TestCheckServiceDeadlines(unittest.IsolatedAsyncioTestCase):
+    async def test_uses_adaptive_deadlines(self):
+        configured = CheckDeadlines(total=5, connect=3)
+        adaptive_timeout = AdaptiveTimeout(configured)
+        async with aiohttp.ClientSession() as session:
+            service = ProxyGetCheckService(
+                session=session,
+                client_timeout=aiohttp.ClientTimeout(total=5),
+                headers={},
+                proxy_check_target=ProxyCheckTarget(
+                    website="example.com", rule=CheckRule()
+                ),
+                deadlines=configured,
+                adaptive_timeout=adaptive_timeout,
+            )
+            self.assertIn(adaptive_timeout.observe, service.observers)
+            adaptive_timeout.deadlines = CheckDeadlines(total=1, connect=0.5)
+            self.assertEqual(service.current_deadlines(), adaptive_timeout.deadlines)
+            client_timeout = service._client_timeout(service.current_deadlines())
+            self.assertEqual(client_timeout.sock_connect, 0.5)
+
+    async def test_first_byte_deadline_engines(self):
+        # 响应头逐字节慢慢发送: 每次读取的间隔很短, 但首字节超时从发起请求算起
+        async def drip(reader, writer) -> None:
+            await reader.readuntil(b"\r\n\r\n")
+            for byte in b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok":
+                writer.write(bytes([byte]))
+                await writer.drain()
+                await asyncio.sleep(0.05)
+            writer.close()
+
+        port: int = await start_server(self, drip)
+        for engine in ("aiohttp", "raw"):
+            with self.subTest(engine=engine):
+                async with aiohttp.ClientSession() as session:
+                    service = ProxyGetCheckService(
+                        session=session,
+                        client_timeout=aiohttp.ClientTimeout(total=5),
+                        headers={},
+                        proxy_check_target=ProxyCheckTarget(
+                            website="example.com", rule=CheckRule()
+                        ),
+                        deadlines=CheckDeadlines(total=5, first_byte=0.3),
+                        engine=engine,
+                        prescreen=False,
+                    )
+                    loop = asyncio.get_running_loop()
+                    started: float = loop.time()
+                    result: CheckResult = await service.check_proxy(
+                        ProxyAddress(scheme="http", host="127.0.0.1", port=port)
+                    )
+                self.assertEqual(result.reason, FailureReason.TIMEOUT)
+                self.assertLess(loop.time() - started, 1)
@@ -0,0 +1,146 @@
+import asyncio
+import unittest
+
+import aiohttp
+
+from src.models.failure_reason import FailureReason
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_check_target import ProxyCheckTarget
+from src.models.proxy_server import ProxyServer
+from src.models.proxy_source import ProxySource
+from src.services.check_metrics import CheckMetrics
+from src.services.proxy_get_check_service import ProxyGetCheckService
+from src.services.proxy_pool_api import ProxyPoolApi
+from src.services.proxy_pool_index import ProxyPoolIndex
+from src.services.proxy_source_service import ProxySourceService
+from src.utils.stats import Histogram
+from tests.helpers import check, free_port, serve_http
+
+
+async def parse(
+    response: aiohttp.ClientResponse, proxy_source: ProxySource
+) -> list[ProxyAddress]:
+    return [
+        ProxyAddress(scheme="http", host="127.0.0.1", port=int(port))
+        for port in (await response.text()).split()
+    ]
+
+
+class TestCheckMetrics(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        # 代理源也由 good 服务器提供, 每个源返回一行一个端口
+        self.sources: dict[str, bytes] = {}
+        self.good_port: int = await serve_http(self, b"ok", self.sources)
+        self.bad_port: int = await serve_http(self, b"no")
+        self.dead_port: int = free_port()
+        self.sources["/a"] = f"{self.good_port}\n{self.bad_port}".encode()
+        self.sources["/b"] = f"{self.good_port}\n{self.dead_port}".encode()
+
+    async def test_render(self):
+        async with aiohttp.ClientSession() as session:
+            proxy_source_service = ProxySourceService(
+                session=session,
+                client_timeout=aiohttp.ClientTimeout(total=2),
+                headers={},
+            )
+            service = ProxyGetCheckService(
+                session=session,
+                client_timeout=aiohttp.ClientTimeout(total=2),
+                headers={},
+                proxy_check_target=ProxyCheckTarget(
+                    website="example.com/", check=check
+                ),
+                prescreen=False,
+            )
+            metrics = CheckMetrics(service, proxy_source_service, session.connector)
+            metrics.start()
+            self.addCleanup(metrics.stop)
+            urls: list[str] = [
+                f"http://127.0.0.1:{self.good_port}{path}" for path in self.sources
+            ]
+            proxy_servers: list[ProxyServer] = [
+                proxy_server
+                async for proxy_server in service.stream_check_proxies(
+                    proxy_source_service.stream_all_sources(
+                        [ProxySource(parse=parse, url=url) for url in urls]
+                    )
+                )
+            ]
+            text: str = metrics.render()
+        self.assertEqual(len(proxy_servers), 1)
+        for line in (
+            'proxy_check_results_total{result="ok"} 1',
+            'proxy_check_results_total{result="failed"} 2',
+            'proxy_check_failures_total{stage="http",reason="connect"} 1',
+            'proxy_check_failures_total{stage="http",reason="invalid_data"} 1',
+            'proxy_check_stage_total{stage="source",result="ok"} 2',
+            "proxy_check_started_total 3",
+            "proxy_check_in_flight 0",
+            "proxy_check_duration_seconds_count 3",
+            f'proxy_source_addresses_total{{source="{urls[0]}"}} 2',
+            f'proxy_source_addresses_total{{source="{urls[1]}"}} 2',
+        ):
+            self.assertIn(line, text.splitlines())
+        source_yield = proxy_source_service.source_yield
+        # 重复的地址只记在先给出它的源上
+        self.assertEqual(sum(item.unique for item in source_yield.values()), 3)
+        self.assertEqual(sum(item.validated for item in source_yield.values()), 1)
+        self.assertEqual(source_yield[proxy_servers[0].source].validated, 1)
+        self.assertIn("并发:0/", str(metrics))
+
+    async def test_endpoint(self):
+        async with aiohttp.ClientSession() as session:
+            service = ProxyGetCheckService(
+                session=session,
+                client_timeout=aiohttp.ClientTimeout(total=2),
+                headers={},
+                proxy_check_target=ProxyCheckTarget(
+                    website="example.com/", check=check
+                ),
+            )
+            port: int = free_port()
+            api = ProxyPoolApi(
+                ProxyPoolIndex(), port=port, metrics=CheckMetrics(service)
+            )
+            await api.start()
+            self.addAsyncCleanup(api.stop)
+            async with session.get(f"http://127.0.0.1:{port}/metrics") as response:
+                self.assertEqual(response.status, 200)
+                self.assertIn(
+                    "# TYPE proxy_check_in_flight gauge", await response.text()
+                )
+
+    async def test_duration_excludes_queueing(self):
+        async with aiohttp.ClientSession() as session:
+            service = ProxyGetCheckService(
+                session=session,
+                client_timeout=aiohttp.ClientTimeout(total=2),
+                headers={},
+                proxy_check_target=ProxyCheckTarget(
+                    website="example.com/", check=check
+                ),
+            )
+            # 并发许可被占用时排队的时间不计入检测耗时
+            service.semaphore = asyncio.Semaphore(1)
+            await service.semaphore.acquire()
+            task: asyncio.Task = asyncio.create_task(
+                service.check_proxy(
+                    ProxyAddress(scheme="http", host="127.0.0.1", port=free_port())
+                )
+            )
+            await asyncio.sleep(0.5)
+            service.semaphore.release()
+            await task
+        self.assertEqual(service.check_duration.count, 1)
+        self.assertLess(service.check_duration.sum, 0.5)
+
+    def test_histogram(self):
+        histogram = Histogram((0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(value)
+        self.assertEqual(histogram.cumulative(), [2, 3, 4])
+        self.assertEqual(histogram.count, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
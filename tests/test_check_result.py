@@ -0,0 +1,116 @@
+import asyncio
+import pickle
+import ssl
+import unittest
+
+import aiohttp
+
+from src.errors.error import EmptyData
+from src.errors.error import TypeError as ContentTypeError
+from src.models.check_result import CheckResult
+from src.models.failure_reason import FailureReason
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_check_target import ProxyCheckTarget
+from src.models.proxy_server import ProxyServer
+from src.models.stage_stats import StageStats
+from src.services.proxy_get_check_service import ProxyGetCheckService
+from tests.helpers import start_server
+
+
+async def unavailable(reader, writer) -> None:
+    await reader.readuntil(b"\r\n\r\n")
+    writer.write(b"HTTP/1.1 503 Unavailable\r\nContent-Length: 0\r\n\r\n")
+    await writer.drain()
+    writer.close()
+
+
+async def check(response, proxy_address: ProxyAddress) -> ProxyServer | FailureReason:
+    if not response.ok:
+        return FailureReason.STATUS
+    return ProxyServer.from_address(proxy_address)
+
+
+class TestFailureReason(unittest.TestCase):
+    def test_from_exception(self):
+        cases = [
+            (TimeoutError(), FailureReason.TIMEOUT),
+            (ssl.SSLError(), FailureReason.SSL),
+            (ConnectionRefusedError(), FailureReason.CONNECT),
+            (aiohttp.ServerDisconnectedError(), FailureReason.PROXY),
+            (EmptyData("空"), FailureReason.EMPTY_DATA),
+            (ContentTypeError("text/html"), FailureReason.CONTENT_TYPE),
+            (ValueError("bad"), FailureReason.CHECK),
+            (ValueError(), FailureReason.UNKNOWN),
+        ]
+        for error, reason in cases:
+            with self.subTest(error=error):
+                self.assertEqual(FailureReason.from_exception(error), reason)
+
+    def test_stage_stats_failures(self):
+        stats = StageStats(name="http")
+        stats.record(False, 0.1, FailureReason.TIMEOUT)
+        stats.record(False, 0.1, FailureReason.TIMEOUT)
+        other = StageStats(name="http")
+        other.record(False, 0.1, FailureReason.CONNECT)
+        other.record(True, 0.1)
+        stats.merge(pickle.loads(pickle.dumps(other)))
+        self.assertEqual(
+            stats.failures, {FailureReason.TIMEOUT: 2, FailureReason.CONNECT: 1}
+        )
+        self.assertIn("访问超时:2", str(stats))
+
+
+class TestCheckResult(unittest.IsolatedAsyncioTestCase):
+    async def test_check_proxy_returns_reason(self):
+        server = await asyncio.start_server(unavailable, "127.0.0.1", 0)
+        port: int = server.sockets[0].getsockname()[1]
+        async with aiohttp.ClientSession() as session:
+            service = ProxyGetCheckService(
+                session=session,
+                client_timeout=aiohttp.ClientTimeout(total=2),
+                headers={},
+                proxy_check_target=ProxyCheckTarget(
+                    website="example.com/", check=check
+                ),
+                prescreen=False,
+            )
+            result: CheckResult = await service.check_proxy(
+                ProxyAddress(scheme="http", host="127.0.0.1", port=port)
+            )
+            self.assertFalse(result.ok)
+            self.assertEqual(result.reason, FailureReason.STATUS)
+            self.assertIsNone(result.detail)
+            server.close()
+            await server.wait_closed()
+            proxy_servers = await service.check_all_proxies(
+                [ProxyAddress(scheme="http", host="127.0.0.1", port=port)]
+            )
+            self.assertEqual(proxy_servers, [])
+            self.assertEqual(service.check_stats.failures, {FailureReason.CONNECT: 1})
+            # 调试采样时保留异常详情
+            service.debug_sample = 1
+            with self.assertLogs("app", "WARNING"):
+                result = await service.check_proxy(
+                    ProxyAddress(scheme="http", host="127.0.0.1", port=port)
+                )
+            self.assertTrue(result.detail.startswith("连接失败"))
+
+    async def test_sampled_reason_without_error(self):
+        port: int = await start_server(self, unavailable)
+        async with aiohttp.ClientSession() as session:
+            service = ProxyGetCheckService(
+                session=session,
+                client_timeout=aiohttp.ClientTimeout(total=2),
+                headers={},
+                proxy_check_target=ProxyCheckTarget(
+                    website="example.com/", check=check
+                ),
+                prescreen=False,
+                debug_sample=1,
+            )
+            with self.assertLogs("app", "WARNING"):
+                result: CheckResult = await service.check_proxy(
+                    ProxyAddress(scheme="http", host="127.0.0.1", port=port)
+                )
+        # 检测函数返回的失败原因没有异常, 不输出 NoneType
+        self.assertEqual(result.detail, FailureReason.STATUS.message)
@@ -0,0 +1,122 @@
+import asyncio
+import unittest
+
+from multidict import CIMultiDict
+
+from src.models.check_rule import CheckRule
+from src.models.failure_reason import FailureReason
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_check_target import ProxyCheckTarget
+from src.models.proxy_server import ProxyServer
+from src.models.raw_response import RawResponse
+from src.services.raw_check_engine import RawCheckEngine
+from tests.helpers import start_server
+
+PROXY_ADDRESS: ProxyAddress = ProxyAddress(scheme="http", host="127.0.0.1", port=1)
+BODY: bytes = "mb,1,安卓".encode()
+
+
+def response(
+    status: int = 200,
+    content_type: str = "text/html; charset=utf-8",
+    body: bytes = BODY,
+    **headers: str,
+) -> RawResponse:
+    return RawResponse(
+        status=status,
+        reason="",
+        headers=CIMultiDict(
+            {"Content-Type": content_type, "Content-Length": str(len(body))},
+            **headers,
+        ),
+        body=body,
+    )
+
+
+class TestCheckRule(unittest.IsolatedAsyncioTestCase):
+    async def test_matcher(self):
+        matcher = CheckRule(
+            content_type="text/html", content_length=11, contains=(BODY,)
+        ).compile()
+        cases = [
+            (response(), None),
+            (response(status=502), FailureReason.STATUS),
+            (response(content_type="text/plain"), FailureReason.CONTENT_TYPE),
+            (response(body=b"mb,1,x"), FailureReason.INVALID_DATA_LENGTH),
+            (response(body=b"x" * 11), FailureReason.INVALID_DATA),
+        ]
+        for raw_response, reason in cases:
+            with self.subTest(reason=reason):
+                checked = await matcher.check(raw_response, PROXY_ADDRESS)
+                if reason is None:
+                    self.assertIsInstance(checked, ProxyServer)
+                else:
+                    self.assertEqual(checked, reason)
+
+    async def test_statuses_headers_pattern(self):
+        matcher = CheckRule(
+            statuses=frozenset({204, 200}),
+            headers={"Server": r"^nginx"},
+            pattern=rb"mb,\d,",
+        ).compile()
+        self.assertIsNone(
+            matcher.match_head(204, CIMultiDict({"Server": "nginx/1.25"}))
+        )
+        self.assertEqual(
+            matcher.match_head(301, CIMultiDict({"Server": "nginx"})),
+            FailureReason.STATUS,
+        )
+        self.assertEqual(
+            matcher.match_head(200, CIMultiDict({"Server": "apache"})),
+            FailureReason.INVALID_DATA,
+        )
+        self.assertIsNone(matcher.match_body(BODY))
+        self.assertEqual(matcher.match_body(b""), FailureReason.EMPTY_DATA)
+
+    def test_target_uses_rule(self):
+        target = ProxyCheckTarget(website="example.com", rule=CheckRule())
+        self.assertIsNotNone(target.matcher)
+        self.assertEqual(target.check, target.matcher.check)
+
+    def test_target_requires_check(self):
+        with self.assertRaises(ValueError):
+            ProxyCheckTarget(website="example.com")
+
+        async def check(response, proxy_address: ProxyAddress) -> ProxyServer:
+            return ProxyServer.from_address(proxy_address)
+
+        # 同时给出时只用 check, raw 引擎不再按规则预先过滤
+        target = ProxyCheckTarget(website="example.com", check=check, rule=CheckRule())
+        self.assertIs(target.check, check)
+        self.assertIsNone(target.matcher)
+
+    async def test_raw_engine_rejects_at_headers(self):
+        # 响应头之后不再发送数据, 规则在响应头阶段不通过时不应等待响应体
+        async def proxy(reader, writer) -> None:
+            await reader.readuntil(b"\r\n\r\n")
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n"
+                b"Content-Length: 1000\r\n\r\n"
+            )
+            await writer.drain()
+            await reader.read()
+            writer.close()
+
+        port: int = await start_server(self, proxy)
+        target = ProxyCheckTarget(
+            website="example.com/", rule=CheckRule(content_type="text/html")
+        )
+        engine = RawCheckEngine(target, {}, timeout=2)
+        raw_response: RawResponse = await asyncio.wait_for(
+            engine.fetch(ProxyAddress(scheme="http", host="127.0.0.1", port=port)),
+            1,
+        )
+        self.assertEqual(raw_response.body, b"")
+        self.assertEqual(
+            await target.check(raw_response, PROXY_ADDRESS),
+            FailureReason.CONTENT_TYPE,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+import aiohttp
+from aiohttp import web
+
+from src.errors.error import FailedError
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_source import ProxySource
+from src.services.proxy_source_cache import ProxySourceCache
+from src.services.proxy_source_service import ProxySourceService
+from tests.helpers import serve_app
+
+
+async def parse(
+    response: aiohttp.ClientResponse, proxy_source: ProxySource
+) -> list[ProxyAddress]:
+    return [
+        ProxyAddress(scheme="http", host="1.2.3.4", port=int(port))
+        for port in (await response.text()).split()
+    ]
+
+
+class TestHedgedFetch(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.requests: list[str] = []
+        self.finished: list[str] = []
+        # 慢镜像一直等到测试结束
+        self.slow_release: asyncio.Event = asyncio.Event()
+
+        async def handle(request: web.Request) -> web.Response:
+            mirror: str = request.match_info["mirror"]
+            self.requests.append(mirror)
+            if mirror == "slow":
+                await self.slow_release.wait()
+            elif mirror == "fail":
+                return web.Response(status=500)
+            self.finished.append(mirror)
+            return web.Response(text=f"80 {len(mirror)}")
+
+        app = web.Application()
+        app.router.add_get("/{mirror}/list", handle)
+        port: int = await serve_app(self, app)
+        self.addCleanup(self.slow_release.set)
+        self.base: str = f"http://127.0.0.1:{port}"
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.cache_path: str = os.path.join(directory.name, "cache")
+
+    def source(self, *mirrors: str) -> ProxySource:
+        return ProxySource(
+            parse=parse,
+            url="list",
+            mirrors=[f"{self.base}/{mirror}" for mirror in mirrors],
+        )
+
+    def service(
+        self, session: aiohttp.ClientSession, cache: bool = False
+    ) -> ProxySourceService:
+        return ProxySourceService(
+            session=session,
+            client_timeout=aiohttp.ClientTimeout(total=2),
+            headers={},
+            source_cache=ProxySourceCache(self.cache_path) if cache else None,
+            hedge_delay=0.1,
+        )
+
+    async def test_fast_mirror_needs_no_hedge(self):
+        async with aiohttp.ClientSession() as session:
+            service = self.service(session)
+            proxy_addresses = await service.fetch_source(self.source("fast", "slow"))
+        self.assertEqual([address.port for address in proxy_addresses], [80, 4])
+        self.assertEqual(self.requests, ["fast"])
+
+    async def test_hedge_cancels_slow_mirror(self):
+        async with aiohttp.ClientSession() as session:
+            service = self.service(session)
+            started: float = time.perf_counter()
+            proxy_addresses = await service.fetch_source(self.source("slow", "fast"))
+            self.assertLess(time.perf_counter() - started, 1)
+            # 输掉的请求被取消, 连接已释放
+            self.assertEqual(len(session.connector._acquired), 0)
+        self.assertEqual([address.port for address in proxy_addresses], [80, 4])
+        self.assertEqual(self.requests, ["slow", "fast"])
+        self.assertEqual(self.finished, ["fast"])
+        # 被取消的镜像记下至少对冲延迟的耗时
+        slow: list[float] = list(service.mirror_latency[f"{self.base}/slow"].samples)
+        self.assertEqual(len(slow), 1)
+        self.assertGreaterEqual(slow[0], 0.1)
+        self.assertEqual(len(service.mirror_latency[f"{self.base}/fast"]), 1)
+
+    async def test_failing_mirror(self):
+        async with aiohttp.ClientSession() as session:
+            service = self.service(session)
+            proxy_addresses = await service.fetch_source(self.source("fail", "fast"))
+            self.assertEqual([address.port for address in proxy_addresses], [80, 4])
+            # 失败立即换下一个镜像, 不等对冲延迟
+            self.assertEqual(self.requests, ["fail", "fast"])
+            self.assertEqual(
+                list(service.mirror_latency[f"{self.base}/fail"].samples), [2]
+            )
+            with self.assertRaises(FailedError):
+                await service.fetch_source(self.source("fail"))
+
+    async def test_persisted_order(self):
+        async with aiohttp.ClientSession() as session:
+            service = self.service(session, cache=True)
+            await service.fetch_all_sources(
+                [self.source("slow", "fast"), self.source("fail", "fast")]
+            )
+            # 新实例从缓存读取延迟, 快的排前面, 失败的排最后
+            restored = self.service(session, cache=True)
+            self.assertEqual(
+                restored._mirror_order(self.source("fail", "slow", "fast")),
+                [f"{self.base}/{mirror}" for mirror in ("fast", "slow", "fail")],
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
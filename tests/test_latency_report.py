@@ -0,0 +1,74 @@
+import unittest
+
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_server import ProxyServer
+from src.services.latency_report import LatencyReport
+
+
+def server(scheme: str, response_time: int | None, source: str | None) -> ProxyServer:
+    return ProxyServer(
+        scheme=scheme,
+        host="1.2.3.4",
+        port=80,
+        response_time=response_time,
+        source=source,
+    )
+
+
+class TestLatencyReport(unittest.TestCase):
+    def test_observe(self):
+        latency_report = LatencyReport()
+        latency_report.observe(server("http", 120, "a"), server("http", 120, "a"), 0.1)
+        latency_report.observe(
+            server("socks5", 80, None), server("socks5", 80, None), 0
+        )
+        # 失败和没有响应时间的结果不计入
+        latency_report.observe(server("http", 90, "a"), None, None)
+        latency_report.observe(server("http", None, "a"), server("http", None, "a"), 0)
+        self.assertEqual(latency_report.by_scheme, {"http": [120], "socks5": [80]})
+        self.assertEqual(latency_report.by_source, {"a": [120], "unknown": [80]})
+
+    def test_summary(self):
+        samples: list[float] = list(range(1, 101))
+        self.assertEqual(
+            LatencyReport.summary(samples), "数量:100\tp50:51ms\tp90:90ms\tp99:99ms"
+        )
+
+    def test_histogram(self):
+        # 上界包含在桶内, 超过 5000ms 的落在最后一个桶
+        samples: list[float] = [0, 100, 100.5, 200, 999, 5000, 5001, 60000]
+        self.assertEqual(LatencyReport.histogram(samples), [2, 2, 0, 1, 0, 0, 1, 2])
+        self.assertEqual(
+            LatencyReport.format_histogram([150]),
+            "<=100ms:0\t<=200ms:1\t<=500ms:0\t<=1000ms:0"
+            "\t<=2000ms:0\t<=3000ms:0\t<=5000ms:0\t>5000ms:0",
+        )
+
+    def test_log_summary_per_source(self):
+        latency_report = LatencyReport()
+        for response_time, source in ((50, "a"), (300, "a"), (4000, "b")):
+            proxy_server: ProxyServer = server("http", response_time, source)
+            latency_report.observe(
+                ProxyAddress(scheme="http", host="1.2.3.4", port=80), proxy_server, 0
+            )
+        with self.assertLogs("app", level="INFO") as logs:
+            latency_report.log_summary()
+        messages: list[str] = [record.getMessage() for record in logs.records]
+        self.assertIn(
+            "延迟\tsource:a\t数量:2\tp50:50ms\tp90:300ms\tp99:300ms", messages
+        )
+        self.assertIn(
+            "延迟分布\tsource:a\t<=100ms:1\t<=200ms:0\t<=500ms:1\t<=1000ms:0"
+            "\t<=2000ms:0\t<=3000ms:0\t<=5000ms:0\t>5000ms:0",
+            messages,
+        )
+        self.assertIn(
+            "延迟分布\tsource:b\t<=100ms:0\t<=200ms:0\t<=500ms:0\t<=1000ms:0"
+            "\t<=2000ms:0\t<=3000ms:0\t<=5000ms:1\t>5000ms:0",
+            messages,
+        )
+        self.assertEqual(len(messages), 6)
+
+
+if __name__ == "__main__":
+    unittest.main()
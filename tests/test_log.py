@@ -0,0 +1,60 @@
+import io
+import json
+import logging
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from src.services.config import Config
+from src.utils.log import JsonLinesFormatter, RateLimitFilter
+
+
+def make_record(msg: str, level: int = logging.INFO) -> logging.LogRecord:
+    return logging.LogRecord("app", level, __file__, 1, msg, None, None)
+
+
+class TestRateLimitFilter(unittest.TestCase):
+    def test_limit_per_type(self):
+        rate_limit = RateLimitFilter(rate=1, burst=2)
+        with mock.patch("src.utils.log.time.monotonic", return_value=100.0):
+            passed = [
+                rate_limit.filter(make_record(f"成功\thttp://1.2.3.4:{i}"))
+                for i in range(5)
+            ]
+            self.assertEqual(passed, [True, True, False, False, False])
+            # 其他类型和错误日志不受影响
+            self.assertTrue(rate_limit.filter(make_record("连接失败\tx")))
+            self.assertTrue(rate_limit.filter(make_record("成功\tx", logging.ERROR)))
+        with mock.patch("src.utils.log.time.monotonic", return_value=101.0):
+            record = make_record("成功\thttp://1.2.3.4:9")
+            self.assertTrue(rate_limit.filter(record))
+            self.assertTrue(record.msg.endswith("已省略:3"))
+
+
+class TestJsonLinesFormatter(unittest.TestCase):
+    def test_fields(self):
+        line: str = JsonLinesFormatter().format(
+            make_record("成功\thttp://1.2.3.4:80\ttime:120\tretry:0")
+        )
+        entry: dict = json.loads(line)
+        self.assertEqual(entry["type"], "成功")
+        self.assertEqual(entry["fields"], {"time": "120", "retry": "0"})
+
+
+class TestInitLog(unittest.TestCase):
+    def test_background_writer(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path: str = os.path.join(directory, "app.log")
+            log: logging.Logger = Config.init_log(
+                logging.getLogger("test.init_log"),
+                filename=path,
+                stream=io.StringIO(),
+                json_lines=True,
+            )
+            log.propagate = False
+            log.info("成功\thttp://1.2.3.4:80\ttime:1")
+            Config.stop_log()
+            self.assertEqual(log.handlers, [])
+            with open(path, encoding="utf-8") as f:
+                self.assertEqual(json.loads(f.readline())["type"], "成功")
@@ -0,0 +1,138 @@
+import asyncio
+import unittest
+
+import aiohttp
+
+from src.models.failure_reason import FailureReason
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_check_target import ProxyCheckTarget
+from src.models.proxy_server import ProxyServer
+from src.services.proxy_get_check_service import ProxyGetCheckService
+from tests.helpers import check, start_server
+
+
+class TestMultiTarget(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.paths: list[str] = []
+        self.connections: int = 0
+        self.version: bytes = b"HTTP/1.1"
+        # 每次应答后关闭连接, 不带 Connection: close
+        self.close_after: bool = False
+        self.port: int = await start_server(self, self.proxy)
+
+    async def proxy(self, reader, writer) -> None:
+        # 直接应答转发请求, /fail 返回错误内容
+        self.connections += 1
+        while True:
+            try:
+                head: bytes = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break
+            path: str = head.split(b" ")[1].decode().split("example.com", 1)[1]
+            self.paths.append(path)
+            body: bytes = b"no" if path == "/fail" else b"ok"
+            writer.write(
+                self.version + b" 200 OK\r\nContent-Type: text/plain\r\n"
+                b"Content-Length: 2\r\n\r\n" + body
+            )
+            await writer.drain()
+            if self.close_after:
+                break
+        writer.close()
+
+    async def test_short_circuit_and_capabilities(self):
+        for engine in ("aiohttp", "raw"):
+            with self.subTest(engine=engine):
+                self.paths.clear()
+                self.connections = 0
+                async with aiohttp.ClientSession() as session:
+                    service = ProxyGetCheckService(
+                        session=session,
+                        client_timeout=aiohttp.ClientTimeout(total=2),
+                        headers={},
+                        proxy_check_target=ProxyCheckTarget(
+                            website="example.com/main", check=check
+                        ),
+                        proxy_check_targets=[
+                            ProxyCheckTarget(
+                                website="example.com/slow", check=check, cost=5
+                            ),
+                            ProxyCheckTarget(
+                                website="example.com/fail", check=check, cost=1
+                            ),
+                            ProxyCheckTarget(website="example.com/cheap", check=check),
+                        ],
+                        engine=engine,
+                        prescreen=False,
+                    )
+                    proxy_servers = await service.check_all_proxies(
+                        [ProxyAddress(scheme="http", host="127.0.0.1", port=self.port)]
+                    )
+                # 开销大的目标排在最后, 失败之后不再检测
+                self.assertEqual(self.paths, ["/main", "/cheap", "/fail"])
+                self.assertEqual(self.connections, 1)
+                self.assertEqual(len(proxy_servers), 1)
+                self.assertEqual(proxy_servers[0].capabilities, 0b1001)
+                self.assertIsNotNone(proxy_servers[0].response_time)
+
+    async def check_closing_proxy(self) -> None:
+        for engine in ("aiohttp", "raw"):
+            with self.subTest(engine=engine):
+                self.paths.clear()
+                async with aiohttp.ClientSession() as session:
+                    service = ProxyGetCheckService(
+                        session=session,
+                        client_timeout=aiohttp.ClientTimeout(total=2),
+                        headers={},
+                        proxy_check_target=ProxyCheckTarget(
+                            website="example.com/main", check=check
+                        ),
+                        proxy_check_targets=[
+                            ProxyCheckTarget(website="example.com/other", check=check)
+                        ],
+                        engine=engine,
+                        prescreen=False,
+                    )
+                    proxy_servers = await service.check_all_proxies(
+                        [ProxyAddress(scheme="http", host="127.0.0.1", port=self.port)]
+                    )
+                self.assertEqual(self.paths, ["/main", "/other"])
+                self.assertEqual(len(proxy_servers), 1)
+                self.assertEqual(proxy_servers[0].capabilities, 0b11)
+
+    async def test_http10_proxy(self):
+        # HTTP/1.0 没有 keep-alive 时不能复用连接
+        self.version = b"HTTP/1.0"
+        self.close_after = True
+        await self.check_closing_proxy()
+
+    async def test_retry_dropped_connection(self):
+        # 复用的连接在状态行之前被关闭时换新连接重试
+        self.close_after = True
+        await self.check_closing_proxy()
+
+    async def test_primary_failure(self):
+        async with aiohttp.ClientSession() as session:
+            service = ProxyGetCheckService(
+                session=session,
+                client_timeout=aiohttp.ClientTimeout(total=2),
+                headers={},
+                proxy_check_target=ProxyCheckTarget(
+                    website="example.com/fail", check=check
+                ),
+                proxy_check_targets=[
+                    ProxyCheckTarget(website="example.com/other", check=check)
+                ],
+                engine="raw",
+                prescreen=False,
+            )
+            proxy_servers = await service.check_all_proxies(
+                [ProxyAddress(scheme="http", host="127.0.0.1", port=self.port)]
+            )
+        self.assertEqual(proxy_servers, [])
+        self.assertEqual(self.paths, ["/fail"])
+        self.assertEqual(service.check_stats.failures, {FailureReason.INVALID_DATA: 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
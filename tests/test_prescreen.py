@@ -0,0 +1,89 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+import aiohttp
+
+from src.models.failure_reason import FailureReason
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_check_target import ProxyCheckTarget
+from src.models.proxy_server import ProxyServer
+from src.services.proxy_get_check_service import ProxyGetCheckService
+from tests.helpers import check, free_port, serve_http
+
+
+def address(port: int) -> ProxyAddress:
+    return ProxyAddress(scheme="http", host="127.0.0.1", port=port)
+
+
+class TestPrescreen(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.live: int = await serve_http(self, b"ok")
+        self.refused: int = free_port()
+        # 连接这个端口时一直没有结果, 模拟被丢弃的 SYN
+        self.blackhole: int = free_port()
+        loop = asyncio.get_running_loop()
+        sock_connect = loop.sock_connect
+
+        async def connect(sock, address) -> None:
+            if address[1] == self.blackhole:
+                await asyncio.Event().wait()
+            await sock_connect(sock, address)
+
+        patcher = mock.patch.object(loop, "sock_connect", connect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def service(self, session: aiohttp.ClientSession) -> ProxyGetCheckService:
+        return ProxyGetCheckService(
+            session=session,
+            client_timeout=aiohttp.ClientTimeout(total=2),
+            headers={},
+            proxy_check_target=ProxyCheckTarget(website="example.com/", check=check),
+            prescreen_timeout=0.2,
+        )
+
+    async def test_prescreen_proxy(self):
+        async with aiohttp.ClientSession() as session:
+            service = self.service(session)
+            self.assertTrue(await service.prescreen_proxy(address(self.live)))
+            self.assertFalse(await service.prescreen_proxy(address(self.refused)))
+            started: float = time.perf_counter()
+            self.assertFalse(await service.prescreen_proxy(address(self.blackhole)))
+            self.assertLess(time.perf_counter() - started, 1)
+
+    async def test_drop_before_http_check(self):
+        outcomes: list[tuple[ProxyAddress, ProxyServer | None]] = []
+        async with aiohttp.ClientSession() as session:
+            service = self.service(session)
+            service.observers.append(
+                lambda proxy_address, proxy_server, elapsed: outcomes.append(
+                    (proxy_address, proxy_server)
+                )
+            )
+            proxy_servers: list[ProxyServer] = await service.check_all_proxies(
+                [address(self.refused), address(self.live), address(self.blackhole)]
+            )
+        self.assertEqual([server.port for server in proxy_servers], [self.live])
+        # 只有连接成功的地址进入 HTTP 检测
+        self.assertEqual(
+            (service.check_stats.passed, service.check_stats.failed), (1, 0)
+        )
+        self.assertEqual(
+            (service.prescreen_stats.passed, service.prescreen_stats.failed), (1, 2)
+        )
+        self.assertEqual(service.prescreen_stats.failures, {FailureReason.CONNECT: 2})
+        # 被筛掉的地址也通知观察者
+        self.assertCountEqual(
+            [
+                proxy_address.port
+                for proxy_address, server in outcomes
+                if server is None
+            ],
+            [self.refused, self.blackhole],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+import asyncio
+import unittest
+
+from src.models.check_rule import CheckRule
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_check_target import ProxyCheckTarget
+from src.services.protocol_detector import ProtocolDetector
+from src.services.raw_check_engine import RawCheckEngine
+from src.utils.stream import iterate
+from tests.helpers import start_server
+
+
+async def http_proxy(reader, writer, connect_status: bytes) -> None:
+    await reader.readuntil(b"\r\n\r\n")
+    writer.write(b"HTTP/1.1 " + connect_status + b" OK\r\n\r\n")
+    await writer.drain()
+    writer.close()
+
+
+async def socks_proxy(reader, writer) -> None:
+    # 同时支持 SOCKS4 和 SOCKS5, 其他协议直接断开
+    version: bytes = await reader.readexactly(1)
+    if version == b"\x05":
+        await reader.readexactly(2)
+        writer.write(b"\x05\x00")
+        atyp: int = (await reader.readexactly(4))[3]
+        if atyp == 1:
+            host: bytes = ".".join(map(str, await reader.readexactly(4))).encode()
+        else:
+            host = await reader.readexactly((await reader.readexactly(1))[0])
+        port: int = int.from_bytes(await reader.readexactly(2), "big")
+        writer.write(b"\x05\x00\x00\x01\x00\x00\x00\x00\x00\x00")
+    elif version == b"\x04":
+        await reader.readexactly(7)
+        await reader.readuntil(b"\x00")
+        host = (await reader.readuntil(b"\x00"))[:-1]
+        port = None
+        writer.write(b"\x00\x5a\x00\x00\x00\x00\x00\x00")
+    else:
+        writer.close()
+        return
+    await writer.drain()
+    if port is None:
+        writer.close()
+        return
+    # 把隧道转发到本地目标
+    target_reader, target_writer = await asyncio.open_connection(host.decode(), port)
+    target_writer.write(await reader.readuntil(b"\r\n\r\n"))
+    writer.write(await target_reader.read())
+    await writer.drain()
+    writer.close()
+    target_writer.close()
+
+
+async def target(reader, writer) -> None:
+    await reader.readuntil(b"\r\n\r\n")
+    writer.write(
+        b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\n"
+        b"Content-Length: 5\r\nConnection: close\r\n\r\nhello"
+    )
+    await writer.drain()
+    writer.close()
+
+
+class TestProtocolDetector(unittest.IsolatedAsyncioTestCase):
+    async def test_detect(self):
+        detector = ProtocolDetector("example.com", timeout=1)
+        connections: dict[str, int] = {}
+
+        async def counted(name: str, handler) -> int:
+            async def handle(reader, writer) -> None:
+                connections[name] = connections.get(name, 0) + 1
+                await handler(reader, writer)
+
+            return await start_server(self, handle)
+
+        async def socks5_only(reader, writer) -> None:
+            # 只支持 SOCKS5, 其他版本回应自己的版本号后断开
+            if await reader.readexactly(1) == b"\x05":
+                await reader.readexactly(2)
+                writer.write(b"\x05\x00")
+            else:
+                writer.write(b"\x05\xff")
+            await writer.drain()
+            writer.close()
+
+        async def closing(reader, writer) -> None:
+            writer.close()
+
+        tunnel: int = await counted("tunnel", lambda r, w: http_proxy(r, w, b"200"))
+        forward: int = await counted("forward", lambda r, w: http_proxy(r, w, b"405"))
+        socks: int = await counted("socks", socks_proxy)
+        socks5: int = await counted("socks5", socks5_only)
+        closed: int = await counted("closed", closing)
+        self.assertEqual(await detector.detect("127.0.0.1", tunnel), ["http", "https"])
+        self.assertEqual(await detector.detect("127.0.0.1", forward), ["http"])
+        self.assertEqual(
+            await detector.detect("127.0.0.1", socks), ["socks4", "socks5"]
+        )
+        self.assertEqual(await detector.detect("127.0.0.1", socks5), ["socks5"])
+        self.assertEqual(await detector.detect("127.0.0.1", closed), [])
+        # HTTP 代理只用一个连接; 回应版本号的 SOCKS 代理只多探测一个版本
+        self.assertEqual(
+            connections,
+            {"tunnel": 1, "forward": 1, "socks": 3, "socks5": 2, "closed": 3},
+        )
+
+    async def test_unique_endpoints(self):
+        proxy_addresses = [
+            ProxyAddress(scheme="https", host="1.2.3.4", port=80),
+            ProxyAddress(scheme="http", host="1.2.3.4", port=80),
+            ProxyAddress(scheme="http", host="1.2.3.4", port=81),
+        ]
+        unique = [
+            proxy_address
+            async for proxy_address in ProtocolDetector.unique_endpoints(
+                iterate(proxy_addresses)
+            )
+        ]
+        self.assertEqual(unique, [proxy_addresses[0], proxy_addresses[2]])
+
+    async def test_raw_engine_socks(self):
+        target_port: int = await start_server(self, target)
+        socks: int = await start_server(self, socks_proxy)
+        engine = RawCheckEngine(
+            ProxyCheckTarget(website=f"127.0.0.1:{target_port}/", rule=CheckRule()),
+            {},
+            timeout=2,
+        )
+        response = await engine.fetch(
+            ProxyAddress(scheme="socks5", host="127.0.0.1", port=socks)
+        )
+        self.assertEqual(response.status, 200)
+        self.assertEqual(await response.text(), "hello")
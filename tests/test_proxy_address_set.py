@@ -0,0 +1,42 @@
+import unittest
+from unittest import mock
+
+from src.models import proxy_address_set
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_address_set import ProxyAddressSet, pack, unpack
+
+
+class TestProxyAddressSet(unittest.TestCase):
+    def test_pack_roundtrip(self):
+        proxy_address = ProxyAddress("https", "255.1.0.254", 65535)
+        value: int | None = pack(proxy_address)
+        self.assertIsNotNone(value)
+        self.assertEqual(unpack(value), proxy_address)
+        self.assertIsNone(pack(ProxyAddress("http", "example.com", 80)))
+        self.assertIsNone(pack(ProxyAddress("http", "1.2.3.256", 80)))
+
+    def check_dedup(self) -> None:
+        proxy_addresses: list[ProxyAddress] = [
+            ProxyAddress(scheme, f"10.0.{i % 7}.{i % 5}", 80 + i % 3)
+            for i in range(200)
+            for scheme in ("http", "https")
+        ] + [ProxyAddress("http", "example.com", 80)] * 2
+        expected: set[ProxyAddress] = set(proxy_addresses)
+
+        incremental = ProxyAddressSet(merge_size=8)
+        added: int = sum(incremental.add(a) for a in proxy_addresses)
+        self.assertEqual(added, len(expected))
+        self.assertEqual(len(incremental), len(expected))
+        self.assertEqual(set(incremental), expected)
+        self.assertIn(ProxyAddress("https", "10.0.1.1", 81), incremental)
+        self.assertNotIn(ProxyAddress("https", "10.0.1.1", 90), incremental)
+
+        bulk = ProxyAddressSet(proxy_addresses)
+        self.assertEqual(set(bulk), expected)
+
+    def test_dedup(self):
+        self.check_dedup()
+
+    def test_dedup_without_numpy(self):
+        with mock.patch.object(proxy_address_set, "np", None):
+            self.check_dedup()
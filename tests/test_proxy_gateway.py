@@ -0,0 +1,154 @@
+import asyncio
+import time
+import unittest
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from src.models.proxy_server import ProxyServer
+from src.services.proxy_gateway import ProxyGateway
+from src.services.proxy_pool_index import ProxyPoolIndex
+from tests.helpers import start_server
+
+
+async def target(reader, writer) -> None:
+    # 保持连接, 每个请求返回请求路径
+    while True:
+        try:
+            head: bytes = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            break
+        path: bytes = head.split(b" ")[1]
+        writer.write(
+            b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n%s" % (len(path), path)
+        )
+        await writer.drain()
+    writer.close()
+
+
+async def pipe(reader, writer) -> None:
+    while chunk := await reader.read(65536):
+        writer.write(chunk)
+        await writer.drain()
+    writer.close()
+
+
+async def forward_proxy(reader, writer, connections: list) -> None:
+    connections.append(writer)
+    while True:
+        try:
+            head: bytes = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            break
+        method, uri, rest = head.split(b" ", 2)
+        if method == b"CONNECT":
+            host, _, port = uri.decode().rpartition(":")
+            target_reader, target_writer = await asyncio.open_connection(
+                host, int(port)
+            )
+            writer.write(b"HTTP/1.1 200 Connection established\r\n\r\n")
+            await asyncio.gather(
+                pipe(reader, target_writer), pipe(target_reader, writer)
+            )
+            return
+        url = urlsplit(uri.decode())
+        target_reader, target_writer = await asyncio.open_connection(
+            url.hostname, url.port
+        )
+        target_writer.write(method + b" " + url.path.encode() + b" " + rest)
+        response: bytes = await target_reader.readuntil(b"\r\n\r\n")
+        length: int = int(response.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+        writer.write(response + await target_reader.readexactly(length))
+        await writer.drain()
+        target_writer.close()
+    writer.close()
+
+
+class TestProxyGateway(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.target: int = await start_server(self, target)
+        self.connections: list = []
+        self.good: int = await start_server(
+            self, lambda r, w: forward_proxy(r, w, self.connections)
+        )
+        self.bad: int = await start_server(self, lambda r, w: w.close())
+        self.index = ProxyPoolIndex(publish_interval=0)
+        for scheme in ("http", "https"):
+            # 坏代理的检测延迟更低, 会被优先选中
+            for port, response_time in [(self.good, 1000), (self.bad, 1)]:
+                self.index.add(
+                    ProxyServer(
+                        scheme=scheme,
+                        host="127.0.0.1",
+                        port=port,
+                        response_time=response_time,
+                        checked_at=time.time() - 1,
+                    )
+                )
+        self.index.publish()
+        self.demoted: list = []
+        self.gateway = ProxyGateway(self.index, port=0, timeout=2)
+        self.gateway.observers.append(self.index.observe)
+        self.gateway.observers.append(
+            lambda proxy_address, proxy_server, elapsed: self.demoted.append(
+                (proxy_address.scheme, proxy_address.port, proxy_server)
+            )
+        )
+        await self.gateway.start()
+        self.addAsyncCleanup(self.gateway.stop)
+        self.gateway_url: str = (
+            f"http://127.0.0.1:{self.gateway._server.sockets[0].getsockname()[1]}"
+        )
+
+    async def test_http_failover_and_demotion(self):
+        async with aiohttp.ClientSession() as session:
+            for i in range(10):
+                async with session.get(
+                    f"http://127.0.0.1:{self.target}/{i}", proxy=self.gateway_url
+                ) as response:
+                    self.assertEqual(response.status, 200)
+                    self.assertEqual(await response.text(), f"/{i}")
+        # 坏代理连续失败后被移出代理池, 上游连接被复用
+        self.assertEqual(self.demoted, [("http", self.bad, None)])
+        self.assertEqual(
+            [proxy_server.port for proxy_server in self.index.query("http")],
+            [self.good],
+        )
+        self.assertEqual(len(self.connections), 1)
+
+    async def test_connect(self):
+        port: int = self.gateway._server.sockets[0].getsockname()[1]
+        for _ in range(3):
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(f"CONNECT 127.0.0.1:{self.target} HTTP/1.1\r\n\r\n".encode())
+            head: bytes = await reader.readuntil(b"\r\n\r\n")
+            self.assertTrue(head.startswith(b"HTTP/1.1 200"))
+            writer.write(b"GET /tunnel HTTP/1.1\r\nHost: x\r\n\r\n")
+            response: bytes = await reader.readuntil(b"\r\n\r\n")
+            self.assertIn(b"Content-Length: 7", response)
+            self.assertEqual(await reader.readexactly(7), b"/tunnel")
+            writer.close()
+
+    async def test_no_upstream(self):
+        for proxy_server in self.index.query("http"):
+            self.index.discard(proxy_server)
+        self.index.publish()
+        async with aiohttp.ClientSession() as session:
+            async with session.get(
+                f"http://127.0.0.1:{self.target}/", proxy=self.gateway_url
+            ) as response:
+                self.assertEqual(response.status, 502)
+
+    async def test_reject_body(self):
+        self.gateway.max_body = 4
+        async with aiohttp.ClientSession() as session:
+            async with session.post(
+                f"http://127.0.0.1:{self.target}/",
+                data=b"too large",
+                proxy=self.gateway_url,
+            ) as response:
+                self.assertEqual(response.status, 413)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+
+from src.models.proxy_address import ProxyAddress
+from src.services.proxy_health_store import ProxyHealthStore
+from src.utils.stream import iterate
+
+
+class TestProxyHealthStore(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.path: str = os.path.join(self.directory.name, "health.db")
+
+    def tearDown(self) -> None:
+        self.directory.cleanup()
+
+    def test_backoff(self):
+        store = ProxyHealthStore(self.path, good_interval=10, fail_interval=60)
+        proxy_address = ProxyAddress(scheme="http", host="1.2.3.4", port=80)
+        self.assertTrue(store.is_due(proxy_address))
+        first = store.record(proxy_address, False)
+        second = store.record(proxy_address, False)
+        self.assertEqual(second.consecutive_failures, 2)
+        self.assertAlmostEqual(
+            second.next_check - second.last_check,
+            2 * (first.next_check - first.last_check),
+        )
+        ok = store.record(proxy_address, True, 0.5)
+        self.assertEqual(ok.consecutive_failures, 0)
+        self.assertFalse(store.is_due(proxy_address))
+        self.assertTrue(store.is_due(proxy_address, ok.next_check))
+        store.close()
+
+    async def test_persist_and_filter(self):
+        store = ProxyHealthStore(self.path)
+        dead = ProxyAddress(scheme="http", host="1.2.3.4", port=80)
+        store.record(dead, False)
+        store.close()
+
+        store = ProxyHealthStore(self.path)
+        fresh = ProxyAddress(scheme="http", host="1.2.3.5", port=80)
+        due: list[ProxyAddress] = [
+            proxy_address
+            async for proxy_address in store.filter_due(iterate([dead, fresh]))
+        ]
+        self.assertEqual(due, [fresh])
+        store.close()
+
+    async def test_by_endpoint(self):
+        # 代理源给的是 http, 识别出 socks5 和 https, 结果按端点记录
+        store = ProxyHealthStore(self.path, by_endpoint=True)
+        source = ProxyAddress(scheme="http", host="1.2.3.4", port=1080)
+        store.record(ProxyAddress(scheme="https", host="1.2.3.4", port=1080), False)
+        store.record(ProxyAddress(scheme="socks5", host="1.2.3.4", port=1080), False)
+        self.assertEqual(store.get(source).consecutive_failures, 1)
+        self.assertFalse(store.is_due(source))
+        # 同一次运行中有一个协议成功就算成功
+        store.record(ProxyAddress(scheme="socks4", host="1.2.3.4", port=1080), True)
+        store.record(ProxyAddress(scheme="https", host="1.2.3.4", port=1080), False)
+        self.assertTrue(store.get(source).ok)
+        store.close()
+        store = ProxyHealthStore(self.path, by_endpoint=True)
+        due: list[ProxyAddress] = [
+            proxy_address async for proxy_address in store.filter_due(iterate([source]))
+        ]
+        self.assertEqual(due, [])
+        store.close()
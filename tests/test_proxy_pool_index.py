@@ -0,0 +1,112 @@
+import time
+import unittest
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_server import ProxyServer
+from src.services.proxy_pool_api import ProxyPoolApi
+from src.services.proxy_pool_index import ProxyPoolIndex
+
+
+def server(
+    port: int, response_time: int, age: float = 0, scheme: str = "https"
+) -> ProxyServer:
+    return ProxyServer(
+        scheme=scheme,
+        host="10.0.0.1",
+        port=port,
+        response_time=response_time,
+        checked_at=time.time() - age,
+    )
+
+
+class TestProxyPoolIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = ProxyPoolIndex(bucket_width=60, publish_interval=0)
+        for port, response_time, age in [
+            (1, 300, 0),
+            (2, 100, 30),
+            (3, 200, 600),
+            (4, 50, 1200),
+            (5, 400, 10),
+        ]:
+            self.index.add(server(port, response_time, age))
+        self.index.add(server(6, 10, scheme="http"))
+        self.index.publish()
+
+    def ports(self, proxy_servers: list[ProxyServer]) -> list[int]:
+        return [proxy_server.port for proxy_server in proxy_servers]
+
+    def test_query(self):
+        self.assertEqual(self.ports(self.index.query("https", 3)), [4, 2, 3])
+        self.assertEqual(
+            self.ports(self.index.query("https", 10, max_age=120)), [2, 1, 5]
+        )
+        self.assertEqual(
+            self.ports(self.index.query("https", 10, max_age=900, max_latency=300)),
+            [2, 3, 1],
+        )
+        self.assertEqual(self.ports(self.index.query("http", 10)), [6])
+        self.assertEqual(self.index.query("socks5", 10), [])
+        self.assertEqual(len(self.index), 6)
+
+    def test_observe_replaces_and_discards(self):
+        snapshot = self.index.snapshot()
+        proxy_address = ProxyAddress(scheme="https", host="10.0.0.1", port=2)
+        self.index.observe(proxy_address, None, None)
+        # 重试成 http 的代理移出 https
+        self.index.observe(
+            ProxyAddress(scheme="https", host="10.0.0.1", port=4),
+            server(4, 60, scheme="http"),
+            0.06,
+        )
+        self.index.observe(
+            ProxyAddress(scheme="https", host="10.0.0.1", port=1),
+            server(1, 20),
+            0.02,
+        )
+        self.assertEqual(self.ports(self.index.query("https", 10)), [1, 3, 5])
+        self.assertEqual(self.ports(self.index.query("http", 10)), [6, 4])
+        # 旧快照不受影响
+        self.assertEqual(snapshot.size, 6)
+        self.assertEqual(
+            sorted(
+                proxy_server.port
+                for bucket in snapshot.buckets["https"]
+                for proxy_server in bucket.servers
+            ),
+            [1, 2, 3, 4, 5],
+        )
+
+    def test_expire(self):
+        index = ProxyPoolIndex(retention=300, publish_interval=0)
+        index.add(server(1, 100, age=1000))
+        index.add(server(2, 100))
+        index.publish()
+        self.assertEqual(self.ports(index.query("https")), [2])
+        self.assertEqual(len(index), 1)
+
+
+class TestProxyPoolApi(unittest.IsolatedAsyncioTestCase):
+    async def test_proxies(self):
+        index = ProxyPoolIndex(publish_interval=0)
+        index.add(server(1, 300))
+        index.add(server(2, 100))
+        api = ProxyPoolApi(index)
+        client = TestClient(TestServer(api.app()))
+        await client.start_server()
+        try:
+            response = await client.get("/proxies?scheme=https&limit=1")
+            data: list = await response.json()
+            self.assertEqual(data[0]["proxy"], "https://10.0.0.1:2")
+            response = await client.get("/proxies?scheme=https&format=text")
+            self.assertEqual(
+                await response.text(), "https://10.0.0.1:2\nhttps://10.0.0.1:1\n"
+            )
+            response = await client.get("/proxies?max_age=abc")
+            self.assertEqual(response.status, 400)
+            response = await client.get("/stats")
+            self.assertEqual((await response.json())["size"], 2)
+        finally:
+            await client.close()
@@ -0,0 +1,120 @@
+import os
+import tempfile
+import unittest
+
+import aiohttp
+from aiohttp import web
+
+from src.models.cached_source import CachedSource
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_source import ProxySource
+from src.services.proxy_source_cache import ProxySourceCache
+from src.services.proxy_source_service import ProxySourceService
+from tests.helpers import serve_app
+
+
+def address(port: int) -> ProxyAddress:
+    return ProxyAddress(scheme="http", host="1.2.3.4", port=port)
+
+
+async def parse(
+    response: aiohttp.ClientResponse, proxy_source: ProxySource
+) -> list[ProxyAddress]:
+    return [address(int(port)) for port in (await response.text()).split()]
+
+
+class TestProxySourceCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path: str = os.path.join(self.directory.name, "cache")
+
+    def test_persist(self):
+        cache = ProxySourceCache(self.path)
+        self.assertIsNone(cache.load("http://example.com/a"))
+        cache.save(
+            CachedSource(
+                url="http://example.com/a",
+                etag='"v1"',
+                last_modified=None,
+                proxy_addresses={address(80), address(81)},
+            )
+        )
+        # 新实例从磁盘读取
+        cached: CachedSource | None = ProxySourceCache(self.path).load(
+            "http://example.com/a"
+        )
+        self.assertEqual(cached.etag, '"v1"')
+        self.assertIsNone(cached.last_modified)
+        self.assertEqual(cached.proxy_addresses, {address(80), address(81)})
+        self.assertEqual(
+            ProxySourceCache.conditional_headers(cached), {"If-None-Match": '"v1"'}
+        )
+        self.assertEqual(ProxySourceCache.conditional_headers(None), {})
+        self.assertFalse(any(name.endswith(".tmp") for name in os.listdir(self.path)))
+
+    def test_corrupt_file(self):
+        cache = ProxySourceCache(self.path)
+        cache.save(CachedSource("http://example.com/a", None, None, set()))
+        (name,) = os.listdir(self.path)
+        with open(os.path.join(self.path, name), "w") as file:
+            file.write("{")
+        self.assertIsNone(cache.load("http://example.com/a"))
+
+    async def serve(self) -> str:
+        async def handle(request: web.Request) -> web.Response:
+            self.requests.append(request.headers.get("If-None-Match"))
+            etag: str = f'"{self.body}"'
+            if request.headers.get("If-None-Match") == etag:
+                return web.Response(status=304)
+            return web.Response(text=self.body, headers={"ETag": etag})
+
+        app = web.Application()
+        app.router.add_get("/list", handle)
+        return f"http://127.0.0.1:{await serve_app(self, app)}/list"
+
+    async def fetch(self, proxy_source: ProxySource, only_new: bool = False):
+        async with aiohttp.ClientSession() as session:
+            service = ProxySourceService(
+                session=session,
+                client_timeout=aiohttp.ClientTimeout(total=2),
+                headers={},
+                source_cache=ProxySourceCache(self.path),
+                only_new=only_new,
+            )
+            proxy_addresses: list[ProxyAddress] = await service.fetch_source(
+                proxy_source
+            )
+            return proxy_addresses, service.deltas[proxy_source.url]
+
+    async def test_not_modified_and_delta(self):
+        self.requests: list[str | None] = []
+        self.body: str = "80 81"
+        proxy_source = ProxySource(parse=parse, url=await self.serve())
+
+        proxy_addresses, delta = await self.fetch(proxy_source)
+        self.assertCountEqual(proxy_addresses, [address(80), address(81)])
+        self.assertCountEqual(delta.added, [address(80), address(81)])
+
+        # 内容没变: 带上 ETag, 304 时直接用缓存
+        proxy_addresses, delta = await self.fetch(proxy_source)
+        self.assertEqual(self.requests[-1], '"80 81"')
+        self.assertTrue(delta.not_modified)
+        self.assertCountEqual(proxy_addresses, [address(80), address(81)])
+        # only_new 时未修改的源不再输出
+        proxy_addresses, delta = await self.fetch(proxy_source, only_new=True)
+        self.assertEqual(proxy_addresses, [])
+
+        self.body = "81 82"
+        proxy_addresses, delta = await self.fetch(proxy_source, only_new=True)
+        self.assertEqual(proxy_addresses, [address(82)])
+        self.assertEqual(delta.added, [address(82)])
+        self.assertEqual(delta.removed, [address(80)])
+        self.assertEqual(
+            ProxySourceCache(self.path).load(proxy_source.url).proxy_addresses,
+            {address(81), address(82)},
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
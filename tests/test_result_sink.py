@@ -0,0 +1,139 @@
+import csv
+import json
+import os
+import tempfile
+import time
+import unittest
+
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_server import ProxyServer
+from src.services.result_sink import (
+    BINARY_HEADER,
+    BINARY_RECORD,
+    ResultSink,
+    read_binary,
+)
+
+
+def servers(count: int) -> list[ProxyServer]:
+    return [
+        ProxyServer(
+            scheme="http" if i % 2 else "socks5",
+            host=f"10.0.0.{i}",
+            port=8000 + i,
+            response_time=100 + i,
+            checked_at=1700000000.5 + i,
+            capabilities=i,
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def wait_for(predicate, timeout: float = 2) -> None:
+    deadline: float = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("超时")
+        time.sleep(0.01)
+
+
+class TestResultSink(unittest.TestCase):
+    def setUp(self) -> None:
+        self.directory = tempfile.TemporaryDirectory()
+        # 先于 sink 注册, 最后清理
+        self.addCleanup(self.directory.cleanup)
+
+    def sink(self, name: str, **kwargs) -> ResultSink:
+        result_sink = ResultSink(os.path.join(self.directory.name, name), **kwargs)
+        self.addCleanup(result_sink.close)
+        return result_sink
+
+    def feed(self, result_sink: ResultSink, proxy_servers: list[ProxyServer]) -> None:
+        for proxy_server in proxy_servers:
+            result_sink.observe(proxy_server, proxy_server, 0.1)
+        # 失败的检测不写入
+        result_sink.observe(
+            ProxyAddress(scheme="http", host="10.0.1.1", port=80), None, None
+        )
+
+    def test_ndjson(self):
+        result_sink = self.sink("result.ndjson")
+        self.feed(result_sink, servers(3))
+        result_sink.close()
+        self.assertFalse(os.path.exists(result_sink.partial_path))
+        with open(result_sink.path, encoding="utf-8") as file:
+            rows: list[dict] = [json.loads(line) for line in file]
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(rows[0]["proxy"], "http://10.0.0.1:8001")
+        self.assertEqual(rows[1]["capabilities"], 2)
+
+    def test_csv(self):
+        result_sink = self.sink("result.csv")
+        self.feed(result_sink, servers(3))
+        result_sink.close()
+        with open(result_sink.path, newline="") as file:
+            rows: list[dict] = list(csv.DictReader(file))
+        self.assertEqual([row["port"] for row in rows], ["8001", "8002", "8003"])
+        self.assertEqual(rows[2]["response_time"], "103")
+
+    def test_binary(self):
+        proxy_servers: list[ProxyServer] = servers(3)
+        proxy_servers[0].response_time = None
+        # 不是 IP 的地址不写入二进制文件
+        hostname = ProxyServer(scheme="http", host="example.com", port=80)
+        result_sink = self.sink("result.bin")
+        self.feed(result_sink, proxy_servers + [hostname])
+        result_sink.close()
+        self.assertEqual(
+            os.path.getsize(result_sink.path),
+            BINARY_HEADER.size + 3 * BINARY_RECORD.size,
+        )
+        restored: list[ProxyServer] = list(read_binary(result_sink.path))
+        self.assertEqual(restored, proxy_servers)
+        self.assertEqual(
+            [
+                (server.response_time, server.checked_at, server.capabilities)
+                for server in restored
+            ],
+            [
+                (server.response_time, server.checked_at, server.capabilities)
+                for server in proxy_servers
+            ],
+        )
+
+    def test_encode_error(self):
+        # 超出字段范围的记录被跳过, 写入线程继续运行
+        proxy_servers: list[ProxyServer] = servers(3)
+        proxy_servers[1].capabilities = 2**32
+        result_sink = self.sink("result.bin")
+        self.feed(result_sink, proxy_servers)
+        wait_for(lambda: result_sink.written == 2)
+        self.feed(result_sink, servers(1))
+        wait_for(lambda: result_sink.written == 3)
+        result_sink.close()
+        self.assertEqual(
+            list(read_binary(result_sink.path)),
+            [proxy_servers[0], proxy_servers[2]] + servers(1),
+        )
+
+    def test_partial_and_snapshot(self):
+        result_sink = self.sink("result.bin", snapshot_interval=0.05)
+        proxy_servers: list[ProxyServer] = servers(4)
+        self.feed(result_sink, proxy_servers[:2])
+        # 运行中可以读取 .partial 文件, 末尾不完整的记录被忽略
+        wait_for(lambda: result_sink.written == 2)
+        with open(result_sink.partial_path, "ab") as file:
+            file.write(b"\0" * 5)
+        self.assertEqual(list(read_binary(result_sink.partial_path)), proxy_servers[:2])
+        # 快照原子地替换结果文件
+        wait_for(lambda: os.path.exists(result_sink.path))
+        self.assertEqual(list(read_binary(result_sink.path))[:2], proxy_servers[:2])
+        self.assertFalse(os.path.exists(result_sink.path + ".tmp"))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            ResultSink(os.path.join(self.directory.name, "result.txt"))
+
+
+if __name__ == "__main__":
+    unittest.main()
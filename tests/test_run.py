@@ -0,0 +1,109 @@
+import os
+import socket
+import tempfile
+import unittest
+from unittest import mock
+
+import main
+from src.services.proxy_health_store import ProxyHealthStore
+from tests.helpers import free_port
+
+SCRIPT: str = """
+from src.models.check_rule import CheckRule
+from src.models.proxy_check_target import ProxyCheckTarget
+from src.models.script import Script
+
+script = Script(
+    proxy_sources=[],
+    proxy_check_target=ProxyCheckTarget(website="example.com/", rule=CheckRule()),
+)
+"""
+
+
+class TestRun(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory: str = directory.name
+        self.script_path: str = os.path.join(self.directory, "script.py")
+        with open(self.script_path, "w", encoding="utf-8") as file:
+            file.write(SCRIPT)
+
+    async def test_cleanup_on_start_failure(self):
+        # 转发代理端口被占用, 已启动的查询接口和结果文件也要关闭
+        busy = socket.socket()
+        self.addCleanup(busy.close)
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        api_port: int = free_port()
+        output: str = os.path.join(self.directory, "result.ndjson")
+        args = main.parse_args(
+            [
+                "--script",
+                self.script_path,
+                "--no-health-db",
+                "--no-source-cache",
+                "--output",
+                output,
+                "--api-port",
+                str(api_port),
+                "--gateway-port",
+                str(busy.getsockname()[1]),
+            ]
+        )
+        with self.assertRaises(OSError):
+            await main.run(args)
+        self.assertTrue(os.path.exists(output))
+        self.assertFalse(os.path.exists(f"{output}.partial"))
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", api_port))
+
+    async def test_health_store_closed_on_failure(self):
+        # 转发代理启动失败, 健康记录也要写入并关闭
+        busy = socket.socket()
+        self.addCleanup(busy.close)
+        busy.bind(("127.0.0.1", 0))
+        busy.listen()
+        closed: list[ProxyHealthStore] = []
+        close = ProxyHealthStore.close
+
+        def record_close(health_store: ProxyHealthStore) -> None:
+            closed.append(health_store)
+            close(health_store)
+
+        args = main.parse_args(
+            [
+                "--script",
+                self.script_path,
+                "--health-db",
+                os.path.join(self.directory, "health.db"),
+                "--no-source-cache",
+                "--gateway-port",
+                str(busy.getsockname()[1]),
+            ]
+        )
+        with mock.patch.object(ProxyHealthStore, "close", record_close):
+            with self.assertRaises(OSError):
+                await main.run(args)
+        self.assertEqual(len(closed), 1)
+
+    async def test_run(self):
+        output: str = os.path.join(self.directory, "result.csv")
+        args = main.parse_args(
+            [
+                "--script",
+                self.script_path,
+                "--no-health-db",
+                "--no-source-cache",
+                "--output",
+                output,
+                "--metrics-interval",
+                "1",
+            ]
+        )
+        self.assertEqual(await main.run(args), 0)
+        self.assertTrue(os.path.exists(output))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,133 @@
+import os
+import tempfile
+import unittest
+
+from src.models.check_options import CheckOptions
+from src.models.failure_reason import FailureReason
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_server import ProxyServer
+from src.models.stage_stats import StageStats
+from src.services.sharded_check_service import ShardedCheckService
+from src.utils.stream import iterate
+from tests.helpers import free_port, serve_http
+
+# 子进程通过 Config.load_script 加载这个脚本
+SCRIPT: str = """
+from src.models.check_rule import CheckRule
+from src.models.proxy_check_target import ProxyCheckTarget
+from src.models.script import Script
+
+script = Script(
+    proxy_sources=[],
+    proxy_check_target=ProxyCheckTarget(
+        website="example.com/", rule=CheckRule(contains=(b"ok",))
+    ),
+)
+"""
+
+
+class TestShardedCheckService(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.script_path: str = os.path.join(directory.name, "script.py")
+        with open(self.script_path, "w", encoding="utf-8") as file:
+            file.write(SCRIPT)
+
+    async def test_shards_merge_results(self):
+        good: list[int] = [await serve_http(self, b"ok") for _ in range(3)]
+        bad: list[int] = [await serve_http(self, b"no") for _ in range(2)]
+        dead: list[int] = [free_port() for _ in range(3)]
+        proxy_addresses: list[ProxyAddress] = [
+            ProxyAddress(scheme="http", host="127.0.0.1", port=port)
+            for port in good + bad + dead
+        ]
+        service = ShardedCheckService(
+            options=CheckOptions(
+                script_path=self.script_path,
+                total_timeout=2,
+                workers=4,
+                prescreen_workers=4,
+                prescreen_timeout=1,
+                engine="raw",
+            ),
+            processes=2,
+            batch_size=2,
+        )
+        outcomes: list[tuple[ProxyAddress, ProxyServer | None]] = []
+        service.observers.append(
+            lambda proxy_address, proxy_server, elapsed: outcomes.append(
+                (proxy_address, proxy_server)
+            )
+        )
+        proxy_servers: list[ProxyServer] = [
+            proxy_server
+            async for proxy_server in service.stream_check_proxies(
+                iterate(proxy_addresses)
+            )
+        ]
+        self.assertCountEqual(
+            [proxy_server.port for proxy_server in proxy_servers], good
+        )
+        # 每个地址在父进程中恰好反馈一次
+        self.assertCountEqual(
+            [proxy_address for proxy_address, _ in outcomes], proxy_addresses
+        )
+        # 两个子进程的统计合并到父进程
+        self.assertEqual(service.prescreen_stats.passed, 5)
+        self.assertEqual(service.prescreen_stats.failed, 3)
+        self.assertEqual(service.check_stats.passed, 3)
+        self.assertEqual(service.check_stats.failures, {FailureReason.INVALID_DATA: 2})
+
+    async def test_dedup_before_schedule(self):
+        # 同一端点的多个 scheme 先去重, 调度器只计入会有结果的地址
+        dead: list[int] = [free_port() for _ in range(3)]
+        proxy_addresses: list[ProxyAddress] = [
+            ProxyAddress(scheme=scheme, host="127.0.0.1", port=port)
+            for port in dead
+            for scheme in ("http", "socks5")
+        ]
+        service = ShardedCheckService(
+            options=CheckOptions(
+                script_path=self.script_path,
+                total_timeout=2,
+                prescreen_timeout=1,
+                detect_protocols=True,
+                subnet_schedule=True,
+            ),
+            processes=2,
+            batch_size=1,
+        )
+        proxy_servers: list[ProxyServer] = [
+            proxy_server
+            async for proxy_server in service.stream_check_proxies(
+                iterate(proxy_addresses)
+            )
+        ]
+        self.assertEqual(proxy_servers, [])
+        self.assertEqual(len(service.scheduler.groups), 3)
+        for group in service.scheduler.groups.values():
+            self.assertEqual((group.sent, group.done, group.outstanding), (1, 1, {}))
+
+    def test_stage_stats_merge(self):
+        first = StageStats(name="http")
+        first.record(True, 0.5)
+        first.record(False, 1, FailureReason.TIMEOUT)
+        second = StageStats(name="http")
+        second.record(False, 0.25, FailureReason.TIMEOUT)
+        second.record(False, 0.25, FailureReason.CONNECT)
+        merged = StageStats(name="http")
+        merged.merge(first)
+        merged.merge(second)
+        merged.merge(StageStats(name="http"))
+        self.assertEqual((merged.passed, merged.failed, merged.total), (1, 3, 4))
+        self.assertEqual(merged.busy_time, 2)
+        self.assertEqual(
+            merged.failures, {FailureReason.TIMEOUT: 2, FailureReason.CONNECT: 1}
+        )
+        self.assertEqual(merged.started_at, min(first.started_at, second.started_at))
+        self.assertEqual(merged.finished_at, max(first.finished_at, second.finished_at))
+
+
+if __name__ == "__main__":
+    unittest.main()
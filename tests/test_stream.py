@@ -0,0 +1,46 @@
+import asyncio
+import unittest
+
+from src.utils.stream import iterate, merge, worker_pool
+
+
+class TestStream(unittest.IsolatedAsyncioTestCase):
+    async def test_merge(self):
+        results: list[int] = [
+            item async for item in merge([iterate(range(3)), iterate(range(3, 6))])
+        ]
+        self.assertEqual(sorted(results), list(range(6)))
+
+    async def test_worker_pool_bounded(self):
+        running: int = 0
+        peak: int = 0
+
+        async def double(item: int) -> int | None:
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.001)
+            running -= 1
+            return None if item % 2 else item * 2
+
+        results: list[int] = [
+            item async for item in worker_pool(iterate(range(100)), double, workers=4)
+        ]
+        self.assertEqual(sorted(results), [i * 2 for i in range(0, 100, 2)])
+        self.assertLessEqual(peak, 4)
+
+    async def test_worker_pool_early_exit(self):
+        async def endless():
+            i: int = 0
+            while True:
+                yield i
+                i += 1
+
+        async def identity(item: int) -> int:
+            return item
+
+        pool = worker_pool(endless(), identity, workers=8)
+        async for item in pool:
+            if item > 10:
+                break
+        await pool.aclose()
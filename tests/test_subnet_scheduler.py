@@ -0,0 +1,88 @@
+import unittest
+
+from src.models.proxy_address import ProxyAddress
+from src.models.proxy_server import ProxyServer
+from src.services.subnet_scheduler import SubnetScheduler, group_key
+from src.utils.stream import iterate
+
+
+def addresses(prefix: str, count: int, port: int = 80) -> list[ProxyAddress]:
+    return [
+        ProxyAddress(scheme="http", host=f"{prefix}.{i}", port=port)
+        for i in range(1, count + 1)
+    ]
+
+
+class TestSubnetScheduler(unittest.IsolatedAsyncioTestCase):
+    def test_group_key(self):
+        self.assertEqual(
+            group_key(ProxyAddress(scheme="http", host="172.67.3.9", port=80)),
+            ("172.67.3", 80),
+        )
+        self.assertEqual(
+            group_key(ProxyAddress(scheme="http", host="example.com", port=80)),
+            ("example.com", 80),
+        )
+
+    async def test_promote_and_defer(self):
+        dead: list[ProxyAddress] = addresses("10.0.0", 6)
+        live: list[ProxyAddress] = addresses("10.0.1", 6)
+        other_port: list[ProxyAddress] = addresses("10.0.1", 2, port=8080)
+        scheduler = SubnetScheduler(sample_size=2, explore_every=100, max_inflight=100)
+        order: list[ProxyAddress] = []
+        async for proxy_address in scheduler.schedule(
+            iterate(dead + live + other_port)
+        ):
+            order.append(proxy_address)
+            # 立即反馈检测结果
+            scheduler.observe(
+                proxy_address,
+                (
+                    ProxyServer.from_address(proxy_address)
+                    if proxy_address in live
+                    else None
+                ),
+                None,
+            )
+        self.assertCountEqual(order, dead + live + other_port)
+        # 失效网段只检测了样本, 其余地址排在最后
+        self.assertEqual(order[-4:], dead[2:])
+        self.assertLess(order.index(live[-1]), order.index(dead[2]))
+        self.assertEqual(order[:2], [dead[0], live[0]])
+        self.assertIn("推迟:2", scheduler.summary())
+
+    async def test_interleave(self):
+        first: list[ProxyAddress] = addresses("10.0.0", 3)
+        second: list[ProxyAddress] = addresses("10.0.1", 3)
+        # 没有结果反馈时各组轮流输出
+        scheduler = SubnetScheduler(sample_size=1, max_inflight=1, patience=0.01)
+        order: list[ProxyAddress] = [
+            proxy_address
+            async for proxy_address in scheduler.schedule(iterate(first + second))
+        ]
+        self.assertEqual(
+            order,
+            [first[0], second[0], first[1], second[1], first[2], second[2]],
+        )
+
+    async def test_count_each_address_once(self):
+        # 识别协议时一个地址有多个结果, 先失败后成功的只计一次成功
+        proxy_addresses: list[ProxyAddress] = addresses("10.0.0", 4)
+        scheduler = SubnetScheduler(sample_size=2)
+        async for proxy_address in scheduler.schedule(iterate(proxy_addresses)):
+            socks5: ProxyAddress = ProxyAddress(
+                scheme="socks5", host=proxy_address.host, port=proxy_address.port
+            )
+            scheduler.observe(proxy_address, None, None)
+            if proxy_address.host.endswith((".1", ".2")):
+                scheduler.observe(socks5, ProxyServer.from_address(socks5), None)
+                scheduler.observe(socks5, ProxyServer.from_address(socks5), None)
+        # 没有输出过的地址的结果不计入
+        scheduler.observe(addresses("10.0.0", 5)[-1], None, None)
+        (group,) = scheduler.groups.values()
+        self.assertEqual((group.sent, group.done, group.ok), (4, 4, 2))
+        self.assertEqual(group.outstanding, {})
+
+
+if __name__ == "__main__":
+    unittest.main()